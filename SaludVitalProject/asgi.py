@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SaludVitalProject.settings')
+# Vistas de lectura asíncronas (ver LECTURA_ASINCRONA en settings.py).
+os.environ.setdefault('LECTURA_ASINCRONA', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # Búsqueda de texto completo y trigramas (pg_trgm)
     'api_vital', # la app
     'rest_framework', # DRF
     'django_filters', # Para filtros
@@ -50,6 +52,18 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # JSON con orjson (mismos bytes que el JSONRenderer de DRF) y MessagePack, elegidos por Accept / Content-Type.
+    'DEFAULT_RENDERER_CLASSES': (
+        'api_vital.renderers.ORJSONRenderer',
+        'api_vital.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api_vital.parsers.ORJSONParser',
+        'api_vital.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema', # Usar espectacular para el esquema
 }
 
@@ -62,6 +76,12 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    # Primero, para medir la solicitud completa (ver api_vital/metricas.py).
+    'api_vital.metricas.MetricasMiddleware',
+    # Registro opcional de consultas lentas (ver api_vital/consultas_lentas.py y CONSULTAS_LENTAS_* abajo).
+    'api_vital.consultas_lentas.ConsultasLentasMiddleware',
+    # Lecturas de la API y de los listados a las réplicas (ver api_vital/replicas.py y REPLICAS_* abajo).
+    'api_vital.replicas.ReplicasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,6 +127,49 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura (api_vital/replicas.py): cada réplica es un alias más de DATABASES, con
+# las credenciales de 'default' y 'TEST': {'MIRROR': 'default'} (en las pruebas lee la base de
+# prueba de 'default'). DB_REPLICAS="host1,host2:5433,localhost/salud_vital_replica" agrega
+# 'replica1', 'replica2'... (host[:puerto][/base]); sirve también para probar con dos bases locales.
+for _indice, _replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    _direccion, _, _nombre = _replica.strip().partition('/')
+    _host, _, _puerto = _direccion.partition(':')
+    DATABASES[f'replica{_indice}'] = {
+        **DATABASES['default'],
+        'HOST': _host or DATABASES['default']['HOST'],
+        'PORT': _puerto or DATABASES['default']['PORT'],
+        'NAME': _nombre or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Alias que reciben las lecturas, en ronda (repetir un alias le da más peso).
+REPLICAS_LECTURA = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api_vital.replicas.RouterReplicas']
+# Segundos que un cliente lee de la primaria después de escribir (margen del retraso de replicación).
+REPLICAS_PIN_SEGUNDOS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# 'respuestas' guarda respuestas ya renderizadas de los datos de referencia
+# (api_vital/cache.py). LocMemCache desaloja por LRU al llegar a MAX_ENTRIES.
+# Con varios procesos/servidores usar un backend compartido (Redis, Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'salud-vital-respuestas',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,3 +211,19 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Registro de consultas lentas (api_vital/consultas_lentas.py). Desactivado mientras el umbral sea None.
+CONSULTAS_LENTAS_UMBRAL_MS = None
+# Fracción de los SELECT lentos que se repiten con EXPLAIN (ANALYZE, BUFFERS), después de enviar la respuesta.
+CONSULTAS_LENTAS_MUESTREO_EXPLAIN = 0.1
+# Tamaño del buffer circular (filas de ConsultaLenta que se conservan).
+CONSULTAS_LENTAS_MAXIMO = 500
+
+# Lectura rápida con values_list() en list y export de pacientes y consultas (api_vital/lectura_rapida.py).
+# Desactivada por defecto: la salida es la del serializer; 'manage.py benchmark_serializacion' mide la diferencia.
+LECTURA_RAPIDA = False
+
+# Lectura asíncrona de pacientes, médicos, consultas y medicamentos (api_vital/asincrono.py).
+# SaludVitalProject/asgi.py la activa: bajo WSGI cada vista asíncrona pasa por async_to_sync,
+# que agrega latencia sin beneficio. LECTURA_ASINCRONA=0 la desactiva también bajo ASGI.
+LECTURA_ASINCRONA = os.environ.get('LECTURA_ASINCRONA') == '1'
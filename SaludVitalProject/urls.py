@@ -10,6 +10,8 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from api_vital.metricas import metricas
+
 urlpatterns = [
     # Ruta al administrador de Django
     path('admin/', admin.site.urls),
@@ -18,6 +20,9 @@ urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 
+    # Métricas por endpoint en formato Prometheus
+    path('metrics', metricas, name='metricas'),
+
     # Rutas para los ENDPOINT de la API (DRF)
     path('api/v1/', include('api_vital.urls')),
     
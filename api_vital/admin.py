@@ -1,3 +1,186 @@
+# api_vital/admin.py
+
+'''Bloque de Comentarios:
+Módulo de Administración (Django admin) para Salud Vital Ltda.
+Registra las nueve entidades del CRUD con listados pensados para tablas grandes:
+- ConteoEstimadoPaginator (api_vital/pagination.py) y sin el segundo COUNT(*)
+  del total sin filtrar (show_full_result_count = False);
+- list_select_related con las relaciones que leen las columnas y los __str__
+  (el admin usa el __str__ de cada fila en la casilla de acciones);
+- claves foráneas hacia tablas grandes con autocomplete_fields (pacientes,
+  médicos, medicamentos; buscan con los índices trigram) o raw_id_fields
+  (consultas, recetas): el formulario no lista todas las filas;
+- filtros sobre columnas con índice o tablas pequeñas y orden solo por
+  columnas indexadas (sortable_by);
+- jerarquía de fechas desde MIN / MAX del campo en vez de un DISTINCT sobre
+  la tabla (templates/admin/api_vital/change_list.html y
+  templatetags/admin_vital.py).
+Los conflictos de agenda y de stock que se detectan al guardar (HorarioOcupado,
+StockInsuficiente) se muestran como error del formulario, igual que en las
+vistas de gestión, en vez de un error 500.
+'''
+
 from django.contrib import admin
 
-# Register your models here.
+from .agenda import HorarioOcupado
+from .models import (
+    Especialidad, Paciente, Medico, HorarioAtencion, ConsultaMedica, Tratamiento,
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento
+)
+from .pagination import ConteoEstimadoPaginator
+from .stock import StockInsuficiente
+
+
+class VitalAdmin(admin.ModelAdmin):
+    '''Base de los ModelAdmin: conteo acotado en los listados.'''
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+
+class _ConflictoReserva(Exception):
+    '''Conflicto al guardar, con el campo del formulario donde se muestra.'''
+
+    def __init__(self, campo, mensaje):
+        self.campo = campo
+        self.mensaje = mensaje
+        super().__init__(mensaje)
+
+
+class ConflictoReservaAdminMixin:
+    '''Muestra un conflicto al guardar (sin stock, horario ocupado) como error del formulario en vez de un error 500.
+
+    El conflicto se detecta en save_model, dentro de la transacción de changeform_view: la excepción la
+    revierte y la vista se vuelve a mostrar con un formulario que agrega el error en clean().
+    '''
+    errores_reserva = {StockInsuficiente: 'cantidad', HorarioOcupado: 'fecha_hora'}
+
+    def save_model(self, request, obj, form, change):
+        try:
+            super().save_model(request, obj, form, change)
+        except tuple(self.errores_reserva) as error:
+            raise _ConflictoReserva(self.errores_reserva[type(error)], str(error)) from error
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except _ConflictoReserva as conflicto:
+            request._conflicto_reserva = conflicto
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def get_form(self, request, obj=None, change=False, **kwargs):
+        formulario = super().get_form(request, obj, change, **kwargs)
+        conflicto = getattr(request, '_conflicto_reserva', None)
+        if conflicto is None:
+            return formulario
+
+        class FormularioConConflicto(formulario):
+            def clean(self):
+                datos = super().clean()
+                self.add_error(conflicto.campo, conflicto.mensaje)
+                return datos
+
+        return FormularioConConflicto
+
+
+def columna_id(relacion, descripcion):
+    '''Columna de list_display con el ID de una clave foránea (sin cargar el objeto ni su __str__).'''
+    @admin.display(description=descripcion)
+    def columna(objeto):
+        return getattr(objeto, f'{relacion}_id')
+    return columna
+
+
+@admin.register(Especialidad)
+class EspecialidadAdmin(VitalAdmin):
+    list_display = ('nombre', 'updated_at')
+    search_fields = ('nombre',)
+
+
+@admin.register(TipoTratamiento)
+class TipoTratamientoAdmin(VitalAdmin):
+    list_display = ('nombre', 'updated_at')
+    search_fields = ('nombre',)
+
+
+@admin.register(Paciente)
+class PacienteAdmin(VitalAdmin):
+    list_display = ('rut', 'apellido', 'nombre', 'fecha_nacimiento', 'sexo')
+    list_filter = ('sexo',)
+    search_fields = ('rut', 'nombre', 'apellido')
+    # Orden total sobre el índice paciente_apellido_nombre_idx (el admin no agrega '-pk').
+    ordering = ('apellido', 'nombre', 'id')
+    sortable_by = ('rut',)
+
+
+class HorarioAtencionInline(admin.TabularInline):
+    model = HorarioAtencion
+    extra = 0
+
+
+@admin.register(Medico)
+class MedicoAdmin(VitalAdmin):
+    list_display = ('rut', 'apellido', 'nombre', 'especialidad', 'email')
+    list_select_related = ('especialidad',)
+    list_filter = ('especialidad',)
+    search_fields = ('rut', 'nombre', 'apellido')
+    ordering = ('apellido', 'nombre', 'id')
+    inlines = [HorarioAtencionInline]
+
+
+@admin.register(Medicamento)
+class MedicamentoAdmin(VitalAdmin):
+    list_display = ('nombre_comercial', 'principio_activo', 'presentacion', 'concentracion', 'stock')
+    search_fields = ('nombre_comercial', 'principio_activo')
+
+    def get_readonly_fields(self, request, obj=None):
+        # El stock inicial se fija al crear; al editar es de solo lectura: guardarlo desde el formulario
+        # pisaría las reservas concurrentes (api_vital/stock.py).
+        return ('stock',) if obj is not None else ()
+
+
+@admin.register(ConsultaMedica)
+class ConsultaMedicaAdmin(ConflictoReservaAdminMixin, VitalAdmin):
+    list_display = ('id', 'fecha_hora', 'paciente', 'medico', 'estado')
+    list_select_related = ConsultaMedica.relaciones_str
+    list_filter = ('estado', ('medico__especialidad', admin.RelatedFieldListFilter))
+    date_hierarchy = 'fecha_hora'
+    # El orden natural más el '-pk' que agrega el admin recorre consulta_fecha_id_idx.
+    sortable_by = ('id', 'fecha_hora')
+    autocomplete_fields = ('paciente', 'medico')
+    search_fields = ('paciente__rut',)
+    search_help_text = 'ID de la consulta o RUT exacto del paciente.'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Búsqueda por índice: la PK, o el RUT (único) y luego el índice (paciente, fecha) de las consultas.
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        if termino.isdigit():
+            return queryset.filter(pk=termino), False
+        return queryset.filter(paciente__in=Paciente.objects.filter(rut=termino).values('pk')), False
+
+
+@admin.register(Tratamiento)
+class TratamientoAdmin(VitalAdmin):
+    list_display = ('id', 'nombre', 'tipo', columna_id('consulta', 'Consulta'), 'fecha_inicio', 'fecha_fin')
+    list_select_related = ('tipo', *Tratamiento.relaciones_str)
+    list_filter = ('tipo',)
+    sortable_by = ('id', 'fecha_inicio')
+    raw_id_fields = ('consulta',)
+
+
+@admin.register(RecetaMedica)
+class RecetaMedicaAdmin(VitalAdmin):
+    list_display = ('id', columna_id('consulta', 'Consulta'), 'fecha_emision')
+    list_select_related = RecetaMedica.relaciones_str
+    sortable_by = ('id',)
+    raw_id_fields = ('consulta',)
+
+
+@admin.register(DetalleReceta)
+class DetalleRecetaAdmin(ConflictoReservaAdminMixin, VitalAdmin):
+    list_display = ('id', columna_id('receta', 'Receta'), 'medicamento', 'cantidad', 'dosis')
+    list_select_related = DetalleReceta.relaciones_str
+    sortable_by = ('id',)
+    raw_id_fields = ('receta',)
+    autocomplete_fields = ('medicamento',)
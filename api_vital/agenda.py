@@ -0,0 +1,137 @@
+# api_vital/agenda.py
+
+'''Bloque de Comentarios:
+Módulo de Agenda Médica para la API Salud Vital Ltda.
+- Disponibilidad: a partir de los horarios semanales de cada médico
+  (HorarioAtencion) y de la duración de sus citas, calcula los bloques libres en
+  un rango de fechas. Las citas de todos los médicos consultados se leen con una
+  sola consulta por rango sobre el índice (medico, fecha_hora), ordenadas, y se
+  recorren junto a los bloques de atención en un solo barrido (sin consultas por
+  día ni por médico).
+- Reserva: al guardar una consulta se bloquea la fila del médico (SELECT ... FOR
+  UPDATE) y se rechaza con HorarioOcupado si choca con otra cita vigente del mismo
+  médico; dos reservas simultáneas del mismo médico quedan serializadas.
+Las citas canceladas no ocupan la agenda.
+'''
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection
+from django.db.models import Prefetch
+from django.db.models.functions import Extract
+from django.utils import timezone
+
+from .models import ConsultaMedica, HorarioAtencion, Medico
+
+# Estado que libera el horario de una cita.
+ESTADO_CANCELADA = 'CANCELADA'
+
+
+class HorarioOcupado(Exception):
+    '''El médico ya tiene una cita que se superpone con la solicitada.'''
+
+    def __init__(self, consulta_id, fecha_hora):
+        self.consulta_id = consulta_id
+        self.fecha_hora = fecha_hora
+        super().__init__(f'El médico ya tiene una cita a las {timezone.localtime(fecha_hora):%Y-%m-%d %H:%M} (consulta {consulta_id}).')
+
+
+def verificar_disponibilidad(consulta):
+    '''Lanza HorarioOcupado si la consulta a guardar choca con otra cita del mismo médico.
+
+    Debe llamarse dentro de la transacción que guarda la consulta: el bloqueo de la
+    fila del médico se mantiene hasta confirmarla.
+    '''
+    if consulta.estado == ESTADO_CANCELADA:
+        return
+    if not consulta._state.adding and consulta.pk is not None:
+        anterior = ConsultaMedica.objects.filter(pk=consulta.pk).values_list('medico_id', 'fecha_hora', 'estado').first()
+        if anterior == (consulta.medico_id, consulta.fecha_hora, consulta.estado):
+            # Editar diagnóstico, motivo, etc. no cambia la agenda.
+            return
+    minutos = (
+        Medico.objects.select_for_update().filter(pk=consulta.medico_id)
+        .values_list('duracion_consulta', flat=True).first()
+    )
+    if minutos is None:
+        # Médico inexistente: lo rechaza la clave foránea al guardar.
+        return
+    duracion = timedelta(minutes=minutos)
+    choques = ConsultaMedica.objects.filter(
+        medico_id=consulta.medico_id,
+        fecha_hora__gt=consulta.fecha_hora - duracion,
+        fecha_hora__lt=consulta.fecha_hora + duracion,
+    ).exclude(estado=ESTADO_CANCELADA)
+    if consulta.pk is not None:
+        choques = choques.exclude(pk=consulta.pk)
+    choque = choques.values_list('pk', 'fecha_hora').first()
+    if choque:
+        raise HorarioOcupado(*choque)
+
+
+def _en_zona(dia, hora, zona):
+    return timezone.make_aware(datetime.combine(dia, hora), zona)
+
+
+def _barrer(medico, desde, hasta, citas, zona):
+    '''Bloques libres de un médico: recorre sus bloques de atención y sus citas (ordenadas) a la vez.
+
+    Trabaja en segundos desde 1970 ('citas' también) y convierte a datetime solo los bloques libres.
+    '''
+    duracion = medico.duracion_consulta * 60
+    horarios = defaultdict(list)
+    for horario in medico.horarios.all():
+        horarios[horario.dia_semana].append(horario)
+
+    libres, siguiente = [], 0
+    dia = desde
+    while dia <= hasta:
+        for horario in horarios.get(dia.weekday(), ()):
+            inicio = _en_zona(dia, horario.hora_inicio, zona).timestamp()
+            fin = _en_zona(dia, horario.hora_fin, zona).timestamp()
+            while inicio + duracion <= fin:
+                # Citas que terminan antes del bloque ya no pueden chocar con ningún bloque posterior.
+                while siguiente < len(citas) and citas[siguiente] + duracion <= inicio:
+                    siguiente += 1
+                if siguiente < len(citas) and citas[siguiente] < inicio + duracion:
+                    # Choque: el próximo bloque candidato empieza al terminar la cita.
+                    inicio = citas[siguiente] + duracion
+                    continue
+                libres.append(inicio)
+                inicio += duracion
+        dia += timedelta(days=1)
+    bloque = timedelta(seconds=duracion)
+    return [(inicio, inicio + bloque) for inicio in (datetime.fromtimestamp(segundos, zona) for segundos in libres)]
+
+
+def bloques_libres(medicos, desde, hasta):
+    '''Calcula los bloques libres de cada médico entre 'desde' y 'hasta' (fechas, ambas inclusive).
+
+    'medicos' es un queryset. Ejecuta tres consultas en total (médicos, horarios y citas)
+    y devuelve [(medico, [(inicio, fin), ...]), ...].
+    '''
+    zona = timezone.get_current_timezone()
+    medicos = list(medicos.select_related('especialidad').prefetch_related(
+        Prefetch('horarios', queryset=HorarioAtencion.objects.order_by('dia_semana', 'hora_inicio')),
+    ))
+    if not medicos:
+        return []
+
+    # Una cita que empezó antes del rango puede ocupar su primer bloque.
+    margen = timedelta(minutes=max(medico.duracion_consulta for medico in medicos))
+    citas = ConsultaMedica.objects.filter(
+        medico__in=[medico.pk for medico in medicos],
+        fecha_hora__gte=_en_zona(desde, time.min, zona) - margen,
+        fecha_hora__lt=_en_zona(hasta + timedelta(days=1), time.min, zona),
+    ).exclude(estado=ESTADO_CANCELADA).order_by('medico_id', 'fecha_hora')
+    ocupadas = defaultdict(list)
+    if connection.vendor == 'postgresql':
+        # EXTRACT(EPOCH ...) en la base de datos: evita construir un datetime por cita (lo más costoso del cálculo).
+        for medico_id, segundos in citas.values_list('medico_id', Extract('fecha_hora', 'epoch', tzinfo=dt_timezone.utc)):
+            ocupadas[medico_id].append(float(segundos))
+    else:
+        for medico_id, fecha_hora in citas.values_list('medico_id', 'fecha_hora'):
+            ocupadas[medico_id].append(fecha_hora.timestamp())
+
+    return [(medico, _barrer(medico, desde, hasta, ocupadas[medico.pk], zona)) for medico in medicos]
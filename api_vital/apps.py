@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiVitalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_vital'
+
+    def ready(self):
+        # Registra los receptores de señales (invalidación de cache).
+        from . import signals  # noqa: F401
@@ -0,0 +1,122 @@
+# api_vital/asincrono.py
+
+'''Bloque de Comentarios:
+Módulo de Lectura Asíncrona (ASGI) para los ViewSets de lectura intensiva.
+Con LECTURA_ASINCRONA (settings; la activa SaludVitalProject/asgi.py),
+LecturaAsincronaMixin hace que as_view() devuelva una vista 'async def' en las
+rutas cuyo GET es list o retrieve:
+- Un GET list / retrieve público (AllowAny, sin throttling) que no pide HTML
+  se atiende en el event loop con el ORM asíncrono (async for, aget), incluidos
+  el GET condicional y la cache de respuestas, que tienen su variante asíncrona
+  (alist / aretrieve en ConditionalGetMixin y CachedResponseMixin).
+- Todo lo demás (escrituras, API navegable, vistas con autenticación) se
+  delega a la vista síncrona de DRF con sync_to_async: el resultado es el mismo.
+Bajo ASGI (uvicorn SaludVitalProject.asgi:application) la solicitud no ocupa un
+hilo mientras espera; requiere que todos los middleware sean async_capable.
+Bajo WSGI se mantienen las vistas síncronas: Django ejecutaría la vista
+asíncrona con async_to_sync, que agrega alrededor de 1,5 ms por solicitud.
+En Django 5.2 el ORM asíncrono ejecuta cada consulta con sync_to_async; los
+pasos de DRF que consultan la base de forma síncrona (filtros ModelChoice de
+django-filter, paginación por cursor) se ejecutan del mismo modo.
+Medición frente a WSGI: 'manage.py benchmark_async'.
+'''
+
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+
+class LecturaAsincronaMixin:
+    '''Mixin para ViewSets: list y retrieve asíncronos. Debe ir después de ConditionalGetMixin y CachedResponseMixin.'''
+    acciones_asincronas = ('list', 'retrieve')
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        vista_sincrona = super().as_view(actions, **initkwargs)
+        if not getattr(settings, 'LECTURA_ASINCRONA', False) or actions.get('get') not in cls.acciones_asincronas:
+            return vista_sincrona
+        actions.setdefault('head', actions['get'])
+        delegar = sync_to_async(vista_sincrona)
+
+        async def vista(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.action_map = actions
+            response = await self.adispatch(request, *args, **kwargs)
+            if response is None:
+                return await delegar(request, *args, **kwargs)
+            return response
+
+        # Conserva cls, initkwargs, actions y csrf_exempt (los usan el router, el esquema y los middleware).
+        return update_wrapper(vista, vista_sincrona)
+
+    def admite_lectura_asincrona(self, request):
+        '''True si la solicitud no necesita autenticación, throttling ni la API navegable (HTML).'''
+        if request.method not in ('GET', 'HEAD') or self.throttle_classes:
+            return False
+        if not all(issubclass(permiso, AllowAny) for permiso in self.permission_classes):
+            return False
+        renderer, _ = self.perform_content_negotiation(request, force=True)
+        return renderer.media_type != 'text/html'
+
+    async def adispatch(self, request, *args, **kwargs):
+        '''Equivalente asíncrono de dispatch(); devuelve None si la solicitud debe atenderla la vista síncrona.'''
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        if not self.admite_lectura_asincrona(request):
+            return None
+
+        try:
+            # initial() sin autenticación ni throttling: la vista es pública (ver admite_lectura_asincrona).
+            request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+            request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+            self.check_permissions(request)
+            response = await getattr(self, 'a' + self.action)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def afilter_queryset(self, queryset):
+        # django-filter valida los ModelChoice contra la base: ese paso se ejecuta con sync_to_async.
+        if self.request.query_params and any(
+            issubclass(backend, DjangoFilterBackend) and backend().get_filterset_class(self, queryset)
+            for backend in self.filter_backends
+        ):
+            return await sync_to_async(self.filter_queryset)(queryset)
+        return self.filter_queryset(queryset)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            objeto = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, objeto)
+        return objeto
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            pagina = await sync_to_async(self.paginate_queryset)(queryset)
+            if pagina is not None:
+                return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+        # 'async for' evalúa el queryset (y sus prefetch) en un solo paso; aiterator() usaría un
+        # cursor del lado del servidor con más viajes a la base para listados de este tamaño.
+        objetos = [objeto async for objeto in queryset]
+        return Response(self.get_serializer(objetos, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
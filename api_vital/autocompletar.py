@@ -0,0 +1,128 @@
+# api_vital/autocompletar.py
+
+'''Bloque de Comentarios:
+Módulo de Autocompletado para los formularios de gestión (vistas HTML).
+Las claves foráneas hacia tablas grandes (pacientes, médicos, consultas,
+recetas, medicamentos) no se dibujan como un <select> con todas las filas:
+- AutocompletarSelect es un <select> que solo trae la opción elegida (una
+  consulta por PK, con las relaciones que lee su __str__) y que el script
+  api_vital/autocompletar.js completa mientras el usuario escribe.
+- AutocompletarView responde 'gestion/autocompletar/<fuente>/?q=' con a lo
+  sumo LIMITE resultados en JSON. Cada fuente busca con índices: trigramas
+  para nombres, RUT y medicamentos (api_vital/search.py), la PK para un
+  número y el índice (paciente, fecha) para las consultas y recetas de los
+  pacientes encontrados.
+El formulario valida la opción enviada con una consulta por PK, como cualquier
+ModelChoiceField.
+'''
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views import View
+
+from .models import ConsultaMedica, Medicamento, Medico, Paciente, RecetaMedica
+from .search import buscar_palabras, buscar_similares
+
+# Resultados por búsqueda y largo mínimo del texto (salvo un ID; con menos caracteres no se consulta la base).
+LIMITE = 20
+MINIMO_CARACTERES = 2
+
+
+def _personas(modelo, texto):
+    # Una palabra: búsqueda difusa por similitud. Varias ("ana araya"): cada una en el nombre, el apellido o el RUT.
+    if len(texto.split()) == 1:
+        return buscar_similares(modelo.objects.all(), texto, ('nombre', 'apellido'), ('rut',))
+    return buscar_palabras(modelo.objects.all(), texto, ('nombre', 'apellido', 'rut')).order_by('apellido', 'nombre', 'id')
+
+
+def _pacientes(texto):
+    return _personas(Paciente, texto)
+
+
+def _medicos(texto):
+    return _personas(Medico, texto)
+
+
+def _consultas(texto):
+    # Un número es el ID de la consulta; un texto, las más recientes de los pacientes que coinciden.
+    if texto.isdigit():
+        return ConsultaMedica.objects.filter(pk=texto)
+    pacientes = _pacientes(texto).values('pk')[:LIMITE]
+    return ConsultaMedica.objects.filter(paciente__in=pacientes).order_by('-fecha_hora', '-id')
+
+
+def _recetas(texto):
+    if texto.isdigit():
+        return RecetaMedica.objects.filter(pk=texto)
+    pacientes = _pacientes(texto).values('pk')[:LIMITE]
+    return RecetaMedica.objects.filter(consulta__paciente__in=pacientes).order_by('-fecha_emision', '-id')
+
+
+def _medicamentos(texto):
+    # Como _personas, sobre los índices trigram de nombre comercial y principio activo.
+    campos = ('nombre_comercial', 'principio_activo')
+    if len(texto.split()) == 1:
+        return buscar_similares(Medicamento.objects.all(), texto, campos)
+    return buscar_palabras(Medicamento.objects.all(), texto, campos).order_by('nombre_comercial')
+
+
+# {fuente: función texto -> queryset}; cada fuente tiene su ruta 'autocompletar_<fuente>'.
+FUENTES = {
+    'pacientes': _pacientes,
+    'medicos': _medicos,
+    'consultas': _consultas,
+    'recetas': _recetas,
+    'medicamentos': _medicamentos,
+}
+
+
+def con_relaciones_str(queryset):
+    '''select_related de las relaciones que lee el __str__ del modelo (ver 'relaciones_str' en models.py).'''
+    return queryset.select_related(*getattr(queryset.model, 'relaciones_str', ()))
+
+
+class AutocompletarView(View):
+    '''GET ?q=: {'resultados': [{'id', 'texto'}]} de la fuente, a lo sumo LIMITE.'''
+    fuente = None
+
+    def get(self, request):
+        texto = request.GET.get('q', '').strip()
+        objetos = []
+        if len(texto) >= MINIMO_CARACTERES or texto.isdigit():
+            objetos = con_relaciones_str(FUENTES[self.fuente](texto))[:LIMITE]
+        return JsonResponse({'resultados': [{'id': objeto.pk, 'texto': str(objeto)} for objeto in objetos]})
+
+
+class AutocompletarSelect(forms.Select):
+    '''<select> de una clave foránea que solo incluye la opción elegida; el resto llega por autocompletado.'''
+
+    class Media:
+        js = ('api_vital/autocompletar.js',)
+
+    def __init__(self, fuente, attrs=None):
+        super().__init__(attrs)
+        self.fuente = fuente
+
+    def get_context(self, name, value, attrs):
+        contexto = super().get_context(name, value, attrs)
+        contexto['widget']['attrs']['data-autocompletar'] = reverse(f'autocompletar_{self.fuente}')
+        return contexto
+
+    def optgroups(self, name, value, attrs=None):
+        # No se recorre self.choices (el queryset completo del campo): solo la opción vacía y las elegidas.
+        elegidos = [valor for valor in value if valor]
+        opciones = [('', '---------')]
+        if elegidos:
+            try:
+                opciones += [
+                    (objeto.pk, str(objeto))
+                    for objeto in con_relaciones_str(self.choices.queryset.filter(pk__in=elegidos))
+                ]
+            except (ValueError, ValidationError):
+                pass
+        return [
+            (None, [self.create_option(name, valor, etiqueta, str(valor) in value, indice, attrs=attrs)], indice)
+            for indice, (valor, etiqueta) in enumerate(opciones)
+        ]
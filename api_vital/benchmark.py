@@ -0,0 +1,229 @@
+# api_vital/benchmark.py
+
+'''Bloque de Comentarios:
+Módulo de Benchmark de la API Salud Vital Ltda. (usado por 'manage.py benchmark_api').
+- Siembra volúmenes realistas con el generador de datos (a escala 1: 100.000
+  pacientes, 1.000.000 de consultas y sus tratamientos, recetas y detalles).
+- Descubre los casos a medir: listado y detalle de cada ruta del router de la
+  API, algunas acciones con parámetros y todas las vistas 'gestion/'.
+- Mide cada caso en proceso (django.test.Client, sin red): percentiles de
+  latencia p50/p95/p99, throughput, consultas SQL y bytes de la respuesta.
+- Compara un reporte contra una línea base guardada para detectar regresiones.
+- Genera carga HTTP concurrente contra un servidor real (usado por
+  'manage.py benchmark_async' para comparar uvicorn/ASGI con WSGI).
+'''
+
+import asyncio
+import math
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+from .generador import generar, volumen
+from .models import (
+    Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento, Medicamento, RecetaMedica, DetalleReceta
+)
+
+API = '/api/v1/endpoints/'
+
+# Modelos cuyo tamaño se informa en el reporte.
+MODELOS_VOLUMEN = (Especialidad, Medico, Paciente, ConsultaMedica, Tratamiento, RecetaMedica, DetalleReceta, Medicamento)
+
+
+def sembrar(escala=0.002, semilla=1):
+    '''Carga datos sintéticos con el generador (ver api_vital/generador.py). Devuelve el volumen cargado.'''
+    cantidades = volumen(escala)
+    generar(cantidades, semilla)
+    return cantidades
+
+
+def casos():
+    '''Lista de (nombre, url) a medir: rutas del router, acciones con parámetros y vistas de gestión.'''
+    from .urls import router, urlpatterns
+
+    resultado = []
+    for prefijo, viewset, _ in router.registry:
+        resultado.append((f'api:{prefijo}:list', f'{API}{prefijo}/'))
+        primero = viewset.queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+        if primero is not None:
+            resultado.append((f'api:{prefijo}:detail', f'{API}{prefijo}/{primero}/'))
+
+    paciente = Paciente.objects.order_by('pk').first()
+    medico = Medico.objects.order_by('pk').first()
+    ultima = ConsultaMedica.objects.order_by('-fecha_hora').values_list('fecha_hora', flat=True).first()
+    if paciente and medico and ultima:
+        semana = timezone.localdate(ultima) - timedelta(days=6)
+        resultado += [
+            ('api:pacientes:buscar', f'{API}pacientes/buscar/?q={paciente.apellido}'),
+            ('api:medicos:buscar', f'{API}medicos/buscar/?q={medico.apellido}'),
+            ('api:pacientes:timeline', f'{API}pacientes/{paciente.pk}/timeline/'),
+            ('api:consultas-medicas:buscar', f'{API}consultas-medicas/buscar/?q=dolor'),
+            ('api:consultas-medicas:medico-semana',
+             f'{API}consultas-medicas/?medico={medico.pk}&fecha_desde={semana}'),
+            ('api:medicos:disponibilidad',
+             f'{API}medicos/disponibilidad/?especialidad={medico.especialidad_id}&desde={semana}'),
+            ('api:estadisticas/consultas:totales',
+             f'{API}estadisticas/consultas/totales/?hasta={timezone.localdate(ultima)}'),
+        ]
+
+    for patron in urlpatterns:
+        ruta = str(patron.pattern)
+        if not ruta.startswith('gestion/'):
+            continue
+        if '<int:pk>' in ruta:
+            primero = patron.callback.view_class.model.objects.order_by('pk').values_list('pk', flat=True).first()
+            if primero is None:
+                continue
+            ruta = ruta.replace('<int:pk>', str(primero))
+        resultado.append((f'gestion:{patron.name}', f'/{ruta}'))
+    return resultado
+
+
+def percentil(valores, p):
+    '''Percentil por rango más cercano de una lista ordenada.'''
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class _ContadorConsultas:
+    '''execute_wrapper que cuenta las consultas SQL (sin el límite de connection.queries).'''
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def medir(cliente, url, repeticiones=10, calentamiento=2, con_cache=False):
+    '''Ejecuta la solicitud 'calentamiento' + 'repeticiones' veces y resume latencias, consultas y bytes.'''
+    cache = caches['respuestas']
+    for _ in range(calentamiento):
+        cliente.get(url)
+
+    tiempos, consultas = [], None
+    for _ in range(repeticiones):
+        if not con_cache:
+            cache.clear()
+        contador = _ContadorConsultas()
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            contenido = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+            tiempos.append(time.perf_counter() - inicio)
+        consultas = contador.total
+
+    tiempos.sort()
+    return {
+        'estado': respuesta.status_code,
+        'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+        'p95_ms': round(percentil(tiempos, 95) * 1000, 3),
+        'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+        'media_ms': round(sum(tiempos) / len(tiempos) * 1000, 3),
+        'solicitudes_por_segundo': round(len(tiempos) / sum(tiempos), 1),
+        'consultas_sql': consultas,
+        'bytes': len(contenido),
+    }
+
+
+def comparar(reporte, linea_base, tolerancia=0.25, margen_ms=2.0):
+    '''Regresiones del reporte frente a la línea base.
+
+    Un caso empeora si su p95 supera el de la base en más de 'tolerancia' (fracción) y
+    'margen_ms' (para no reaccionar al ruido en casos de pocos milisegundos), si ejecuta
+    más consultas SQL o si cambia su código de estado.
+    '''
+    regresiones = []
+    for nombre, base in linea_base.get('resultados', {}).items():
+        actual = reporte['resultados'].get(nombre)
+        if actual is None:
+            continue
+        limite = max(base['p95_ms'] * (1 + tolerancia), base['p95_ms'] + margen_ms)
+        if actual['p95_ms'] > limite:
+            regresiones.append(f"{nombre}: p95 {actual['p95_ms']} ms > {limite:.3f} ms (base {base['p95_ms']} ms)")
+        if actual['consultas_sql'] > base['consultas_sql']:
+            regresiones.append(f"{nombre}: {actual['consultas_sql']} consultas SQL (base {base['consultas_sql']})")
+        if actual['estado'] != base['estado']:
+            regresiones.append(f"{nombre}: estado {actual['estado']} (base {base['estado']})")
+    return regresiones
+
+
+def casos_lectura():
+    '''Lista de (nombre, url) de las lecturas que atiende la vista asíncrona (api_vital/asincrono.py).'''
+    resultado = []
+    for prefijo, modelo in (('pacientes', Paciente), ('medicos', Medico),
+                            ('consultas-medicas', ConsultaMedica), ('medicamentos', Medicamento)):
+        primero = modelo.objects.order_by('pk').first()
+        if primero is None:
+            continue
+        resultado.append((f'api:{prefijo}:detail', f'{API}{prefijo}/{primero.pk}/'))
+        if prefijo == 'pacientes':
+            # Sin paginación: se acota con una búsqueda para no devolver la tabla completa.
+            resultado.append((f'api:{prefijo}:list', f'{API}{prefijo}/?{urlencode({"search": primero.apellido})}'))
+        else:
+            resultado.append((f'api:{prefijo}:list', f'{API}{prefijo}/'))
+    return resultado
+
+
+async def _solicitar(host, puerto, url):
+    # HTTP/1.1 mínimo con una conexión por solicitud: igual costo para ambos servidores.
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        escritor.write(
+            f'GET {url} HTTP/1.1\r\nHost: {host}:{puerto}\r\nAccept: application/json\r\n'
+            'Connection: close\r\n\r\n'.encode()
+        )
+        await escritor.drain()
+        datos = await lector.read()
+    finally:
+        escritor.close()
+    return int(datos.split(b' ', 2)[1])
+
+
+async def _carga(host, puerto, urls, concurrencia, duracion):
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + duracion
+    tiempos, errores = [], 0
+
+    async def cliente(indice):
+        nonlocal errores
+        while loop.time() < fin:
+            url = urls[indice % len(urls)]
+            indice += 1
+            inicio = time.perf_counter()
+            try:
+                estado = await _solicitar(host, puerto, url)
+            except (OSError, IndexError, ValueError):
+                estado = None
+            if estado != 200:
+                errores += 1
+                continue
+            tiempos.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(indice) for indice in range(concurrencia)))
+    return tiempos, errores, time.perf_counter() - inicio
+
+
+def carga_concurrente(host, puerto, urls, concurrencia=10, duracion=5.0):
+    '''Mantiene 'concurrencia' clientes pidiendo las urls en ronda durante 'duracion' segundos.
+
+    Devuelve el throughput (solicitudes exitosas por segundo), los percentiles de latencia y
+    la cantidad de errores (respuestas distintas de 200 o conexiones fallidas).
+    '''
+    tiempos, errores, transcurrido = asyncio.run(_carga(host, puerto, urls, concurrencia, duracion))
+    tiempos.sort()
+    if not tiempos:
+        return {'solicitudes': 0, 'errores': errores, 'solicitudes_por_segundo': 0.0}
+    return {
+        'solicitudes': len(tiempos),
+        'errores': errores,
+        'solicitudes_por_segundo': round(len(tiempos) / transcurrido, 1),
+        'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+        'p95_ms': round(percentil(tiempos, 95) * 1000, 3),
+        'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+    }
@@ -0,0 +1,184 @@
+# api_vital/bulk.py
+
+'''Bloque de Comentarios:
+Módulo de Carga Masiva (bulk create / update / upsert) para la API Salud Vital Ltda.
+Agrega la acción POST <recurso>/bulk/ a un ViewSet. La carga recibe una lista de
+objetos, los valida en lote (las restricciones UNIQUE y las claves foráneas se
+resuelven con una consulta por lote en vez de una por fila) y escribe con
+bulk_create (INSERT ... ON CONFLICT DO UPDATE para las actualizaciones cuando la
+base de datos lo soporta; si no, bulk_update). Los errores se informan por fila.
+Como bulk_create/bulk_update no emiten pre_save/post_save, el ViewSet que
+mantiene datos derivados de las filas actualizadas (los resúmenes por
+especialidad del médico) lo hace en antes_de_bulk / despues_de_bulk, dentro
+de la misma transacción que la escritura.
+'''
+
+from django.db import IntegrityError, connection, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+
+from django.utils import timezone
+
+from .cache import invalidar_modelo
+from .conditional import incrementar_version
+
+MODOS_BULK = ('create', 'update', 'upsert')
+
+
+class _PKEnLoteField(serializers.PrimaryKeyRelatedField):
+    '''Resuelve la clave foránea desde un mapa precargado (una consulta por lote).'''
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        objetos = self.context['bulk_relaciones'][self.field_name]
+        try:
+            return objetos[self.get_queryset().model._meta.pk.to_python(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, serializers.DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkUpsertMixin:
+    '''Mixin para ViewSets: POST <recurso>/bulk/?modo=create|update|upsert con una lista de objetos.
+
+    La clave natural del upsert es 'bulk_lookup_field' (un campo UNIQUE del modelo).
+    Cada fila es una representación completa del objeto (semántica de PUT), salvo los
+    campos de 'bulk_campos_solo_creacion', que se escriben en las filas nuevas y nunca
+    en las existentes.
+    '''
+    bulk_lookup_field = None
+    bulk_campos_solo_creacion = ()
+    bulk_batch_size = 1000
+    bulk_max_filas = 10000
+
+    def get_bulk_serializer(self, filas):
+        '''Serializer hijo sin validadores UNIQUE por fila y con FKs resueltas en lote.'''
+        serializer = self.get_serializer()
+        relaciones = {}
+        for nombre, campo in list(serializer.fields.items()):
+            campo.validators = [v for v in campo.validators if not isinstance(v, UniqueValidator)]
+            if isinstance(campo, serializers.PrimaryKeyRelatedField) and not campo.read_only:
+                pks = {fila.get(nombre) for fila in filas if isinstance(fila, dict)} - {None}
+                relaciones[nombre] = campo.get_queryset().in_bulk(
+                    [pk for pk in pks if isinstance(pk, (int, str)) and not isinstance(pk, bool)]
+                )
+                serializer.fields[nombre] = _PKEnLoteField(
+                    queryset=campo.get_queryset(), allow_null=campo.allow_null, required=campo.required,
+                )
+        serializer.context['bulk_relaciones'] = relaciones
+        return serializer
+
+    def antes_de_bulk(self, actualizados):
+        '''Dentro de la transacción, antes de escribir (equivale a pre_save). Lo que devuelve recibe despues_de_bulk.'''
+        return None
+
+    def despues_de_bulk(self, actualizados, anteriores):
+        '''Dentro de la transacción, después de escribir las filas 'actualizados' (equivale a post_save).'''
+
+    def _campos_unicos(self, modelo):
+        return [
+            campo.name for campo in modelo._meta.concrete_fields
+            if campo.unique and not campo.primary_key and campo.name != self.bulk_lookup_field
+        ]
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        modo = request.query_params.get('modo', 'upsert')
+        filas = request.data
+        if modo not in MODOS_BULK:
+            return Response({'detail': f"modo debe ser uno de: {', '.join(MODOS_BULK)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(filas, list):
+            return Response({'detail': 'Se esperaba una lista de objetos.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(filas) > self.bulk_max_filas:
+            return Response({'detail': f'Máximo {self.bulk_max_filas} filas por solicitud.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        modelo = self.get_queryset().model
+        clave = self.bulk_lookup_field
+        serializer = self.get_bulk_serializer(filas)
+        errores, validas = {}, []
+
+        # 1. Validación de campos fila a fila (sin consultas a la base de datos).
+        for indice, fila in enumerate(filas):
+            try:
+                validas.append((indice, serializer.run_validation(fila)))
+            except serializers.ValidationError as error:
+                errores[indice] = error.detail
+
+        # 2. Unicidad: duplicados dentro del lote y contra la base de datos (una consulta por campo).
+        existentes = modelo.objects.in_bulk([datos[clave] for _, datos in validas], field_name=clave)
+        vistos = {}
+        for campo in [clave] + self._campos_unicos(modelo):
+            valores = {datos[campo] for _, datos in validas if datos.get(campo) is not None}
+            duenos = dict(modelo.objects.filter(**{f'{campo}__in': valores}).values_list(campo, clave))
+            for indice, datos in validas:
+                valor = datos.get(campo)
+                if valor is None or indice in errores:
+                    continue
+                if (campo, valor) in vistos:
+                    errores[indice] = {campo: [f'Valor duplicado en el lote (fila {vistos[campo, valor]}).']}
+                    continue
+                vistos[campo, valor] = indice
+                if campo != clave and duenos.get(valor, datos[clave]) != datos[clave]:
+                    errores[indice] = {campo: [f'Ya existe un registro con este {campo}.']}
+
+        for indice, datos in validas:
+            if indice in errores:
+                continue
+            if modo == 'create' and datos[clave] in existentes:
+                errores[indice] = {clave: [f'Ya existe un registro con este {clave}.']}
+            elif modo == 'update' and datos[clave] not in existentes:
+                errores[indice] = {clave: [f'No existe un registro con este {clave}.']}
+
+        # 3. Escritura en lote.
+        nuevos, actualizados = [], []
+        for indice, datos in validas:
+            if indice not in errores:
+                (actualizados if datos[clave] in existentes else nuevos).append(modelo(**datos))
+
+        campos_escritos = sorted(
+            {campo for _, datos in validas for campo in datos} - {clave} - set(self.bulk_campos_solo_creacion)
+        )
+        # Campos auto_now (updated_at): bulk_create los completa, bulk_update no.
+        campos_auto = [campo.name for campo in modelo._meta.concrete_fields if getattr(campo, 'auto_now', False)]
+        ahora = timezone.now()
+        try:
+            with transaction.atomic():
+                anteriores = self.antes_de_bulk(actualizados)
+                if actualizados and connection.features.supports_update_conflicts_with_target:
+                    # INSERT ... ON CONFLICT (clave) DO UPDATE: mucho más rápido que bulk_update (CASE WHEN).
+                    modelo.objects.bulk_create(
+                        nuevos + actualizados, batch_size=self.bulk_batch_size, update_conflicts=True,
+                        unique_fields=[clave], update_fields=campos_escritos + campos_auto,
+                    )
+                else:
+                    modelo.objects.bulk_create(nuevos, batch_size=self.bulk_batch_size)
+                    for instancia in actualizados:
+                        instancia.pk = existentes[getattr(instancia, clave)].pk
+                        for campo in campos_auto:
+                            setattr(instancia, campo, ahora)
+                    if actualizados and campos_escritos:
+                        modelo.objects.bulk_update(
+                            actualizados, campos_escritos + campos_auto, batch_size=self.bulk_batch_size,
+                        )
+                self.despues_de_bulk(actualizados, anteriores)
+        except IntegrityError as error:
+            # Una escritura concurrente tomó alguna de las claves después de la verificación.
+            return Response({'detail': f'Conflicto de integridad: {error}'}, status=status.HTTP_409_CONFLICT)
+        if nuevos or actualizados:
+            # bulk_create/bulk_update no emiten post_save.
+            invalidar_modelo(modelo)
+            incrementar_version(modelo)
+
+        respuesta = {
+            'creados': len(nuevos),
+            'actualizados': len(actualizados),
+            'errores': [{'fila': indice, 'errores': errores[indice]} for indice in sorted(errores)],
+        }
+        sin_escrituras = not nuevos and not actualizados
+        return Response(respuesta, status=status.HTTP_400_BAD_REQUEST if errores and sin_escrituras else status.HTTP_200_OK)
@@ -0,0 +1,182 @@
+# api_vital/cache.py
+
+'''Bloque de Comentarios:
+Módulo de Cache de Respuestas para datos de referencia (Especialidad,
+TipoTratamiento, Medicamento), que se leen en casi todas las pantallas y
+cambian poco.
+- La clave es la URL con sus parámetros (ordenados), el formato negociado y
+  la "versión" de cada modelo del que depende la respuesta.
+- La versión de un modelo es un token aleatorio que se renueva en post_save /
+  post_delete (ver api_vital/signals.py): al cambiar, las claves antiguas dejan
+  de usarse y el backend las desaloja por LRU (LocMemCache con MAX_ENTRIES).
+- Un acierto devuelve los bytes ya renderizados: no consulta la base de datos
+  ni vuelve a serializar. Se guardan también ETag y Last-Modified, de modo que
+  un GET condicional que acierta responde 304 sin tocar la base de datos.
+- alist / aretrieve son las variantes para la lectura asíncrona
+  (api_vital/asincrono.py), con la API asíncrona de la cache.
+Con varios procesos conviene configurar un backend compartido (Redis/Memcached)
+en CACHES['respuestas'] para que la invalidación llegue a todos.
+'''
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .query_planner import planificar
+
+ALIAS_CACHE = getattr(settings, 'CACHE_RESPUESTAS_ALIAS', 'respuestas')
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _clave_version(modelo):
+    return f'version:{modelo._meta.label_lower}'
+
+
+def version_modelo(modelo):
+    '''Token de la versión actual del modelo (se crea si no existe o fue desalojado).'''
+    cache = _cache()
+    version = cache.get(_clave_version(modelo))
+    if version is None:
+        cache.add(_clave_version(modelo), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_clave_version(modelo))
+    return version
+
+
+async def aversion_modelo(modelo):
+    '''Variante asíncrona de version_modelo.'''
+    cache = _cache()
+    version = await cache.aget(_clave_version(modelo))
+    if version is None:
+        await cache.aadd(_clave_version(modelo), uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(_clave_version(modelo))
+    return version
+
+
+def invalidar_modelo(modelo):
+    '''Renueva la versión del modelo: todas sus respuestas en cache quedan obsoletas.
+
+    Se invalida de inmediato y otra vez al confirmar la transacción, para que una
+    lectura concurrente de datos aún no confirmados no quede guardada como vigente.
+    '''
+    def renovar():
+        _cache().set(_clave_version(modelo), uuid.uuid4().hex, timeout=None)
+
+    renovar()
+    transaction.on_commit(renovar)
+
+
+def _clave(request, formato, versiones):
+    firma = repr((request.path, sorted(request.GET.lists()), formato, versiones))
+    return 'respuesta:' + hashlib.sha256(firma.encode()).hexdigest()
+
+
+def clave_respuesta(request, modelos, formato=''):
+    '''Clave de cache: ruta + parámetros ordenados + formato + versiones de los modelos.'''
+    return _clave(request, formato, [version_modelo(modelo) for modelo in modelos])
+
+
+async def aclave_respuesta(request, modelos, formato=''):
+    '''Variante asíncrona de clave_respuesta.'''
+    return _clave(request, formato, [await aversion_modelo(modelo) for modelo in modelos])
+
+
+# Cabeceras que se guardan junto al contenido (validadores de GET condicional).
+CABECERAS_GUARDADAS = ('ETag', 'Last-Modified')
+
+
+def _respuesta_desde_cache(request, guardada):
+    contenido, tipo, cabeceras = guardada
+    ultimo_cambio = parse_http_date_safe(cabeceras.get('Last-Modified', ''))
+    response = None
+    if cabeceras:
+        response = get_conditional_response(request, etag=cabeceras.get('ETag'), last_modified=ultimo_cambio)
+    if response is None:
+        response = HttpResponse(contenido, content_type=tipo)
+    for nombre, valor in cabeceras.items():
+        response[nombre] = valor
+    return response
+
+
+def _guardar_respuesta(clave, contenido, response):
+    cabeceras = {nombre: response[nombre] for nombre in CABECERAS_GUARDADAS if nombre in response}
+    _cache().set(clave, (contenido, response['Content-Type'], cabeceras))
+
+
+class CachedResponseMixin:
+    '''Mixin para ViewSets: guarda en cache las respuestas de list/retrieve (no HTML).
+
+    Depende del modelo del ViewSet y de los modelos relacionados que carga su serializer.
+    '''
+    # Lo que se guarda en cache se lee de la primaria: una réplica atrasada dejaría datos
+    # viejos bajo la versión nueva (ver api_vital/replicas.py).
+    usar_replica = False
+
+    def modelos_cache(self):
+        return planificar(self.get_serializer()).modelos(self.get_queryset().model)
+
+    def _respuesta_cacheada(self, request, vista, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.media_type == 'text/html':
+            # La API navegable incluye datos de la sesión (usuario, token CSRF): no se guarda.
+            return vista(request, *args, **kwargs)
+        clave = clave_respuesta(request, self.modelos_cache(), renderer.media_type)
+        guardada = _cache().get(clave)
+        if guardada is not None:
+            return _respuesta_desde_cache(request, guardada)
+        request._clave_cache_respuesta = clave
+        return vista(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(request, super().retrieve, *args, **kwargs)
+
+    async def _arespuesta_cacheada(self, request, vista, *args, **kwargs):
+        # La lectura asíncrona solo atiende formatos que no son HTML (ver api_vital/asincrono.py).
+        clave = await aclave_respuesta(request, self.modelos_cache(), request.accepted_renderer.media_type)
+        guardada = await _cache().aget(clave)
+        if guardada is not None:
+            return _respuesta_desde_cache(request, guardada)
+        request._clave_cache_respuesta = clave
+        return await vista(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._arespuesta_cacheada(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._arespuesta_cacheada(request, super().aretrieve, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        clave = getattr(request, '_clave_cache_respuesta', None)
+        if clave and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            _guardar_respuesta(clave, response.rendered_content, response)
+        return response
+
+
+class CachedListViewMixin:
+    '''Mixin para ListView de gestión: guarda en cache el HTML renderizado del listado.'''
+    usar_replica = False
+
+    def get(self, request, *args, **kwargs):
+        clave = clave_respuesta(request, [self.model], 'text/html')
+        guardada = _cache().get(clave)
+        if guardada is not None:
+            return _respuesta_desde_cache(request, guardada)
+        response = super().get(request, *args, **kwargs)
+        response.render()
+        if response.status_code == 200:
+            _guardar_respuesta(clave, response.content, response)
+        return response
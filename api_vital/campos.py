@@ -0,0 +1,116 @@
+# api_vital/campos.py
+
+'''Bloque de Comentarios:
+Módulo de Campos Dinámicos (sparse fieldsets) para la API Salud Vital Ltda.
+En las lecturas (GET / HEAD) los serializers con CamposDinamicosMixin aceptan:
+- ?fields=id,fecha_hora     solo esos campos;
+- ?omit=diagnostico         todos los campos menos esos;
+- ?expand=paciente,medico   el id de la relación se reemplaza por el objeto
+  anidado (serializers declarados en 'expandibles'). Con puntos se expande más
+  de un nivel (?expand=consulta.paciente) y se eligen campos del objeto
+  anidado (?expand=paciente&fields=id,paciente.nombre&omit=paciente.direccion).
+Un nombre desconocido responde 400. Las escrituras ignoran estos parámetros.
+El planificador de consultas (api_vital/query_planner.py) parte de los campos
+resultantes: la relación expandida se carga con select_related y las columnas
+que no se serializan no se leen (only()), de modo que PostgreSQL no envía los
+TextField omitidos.
+'''
+
+from collections import namedtuple
+
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import SAFE_METHODS
+
+# solo: frozenset de campos o None (todos); omitir: frozenset; expandir: tupla ordenada de (campo, Seleccion).
+Seleccion = namedtuple('Seleccion', ['solo', 'omitir', 'expandir'])
+SIN_SELECCION = Seleccion(None, frozenset(), ())
+
+
+def _arbol(valor):
+    '''"a,b.c,b.d" -> {'a': {}, 'b': {'c': {}, 'd': {}}}'''
+    arbol = {}
+    for ruta in valor.split(','):
+        ruta = ruta.strip()
+        if not ruta:
+            continue
+        nodo = arbol
+        for nombre in ruta.split('.'):
+            nodo = nodo.setdefault(nombre, {})
+    return arbol
+
+
+def _seleccion(solo, omitir, expandir):
+    anidados = {nombre for arbol in (solo or {}, omitir) for nombre, hijos in arbol.items() if hijos}
+    sin_expandir = anidados - expandir.keys()
+    if sin_expandir:
+        raise ParseError(f"Para elegir campos de {', '.join(sorted(sin_expandir))} debe incluirlos en 'expand'.")
+    return Seleccion(
+        None if solo is None else frozenset(solo),
+        frozenset(nombre for nombre, hijos in omitir.items() if not hijos),
+        tuple(sorted(
+            (nombre, _seleccion((solo or {}).get(nombre) or None, omitir.get(nombre, {}), hijos))
+            for nombre, hijos in expandir.items()
+        )),
+    )
+
+
+def leer_seleccion(request):
+    '''Selección de campos de la solicitud (?fields=, ?omit=, ?expand=); se calcula una vez por solicitud.'''
+    if request is None or request.method not in SAFE_METHODS:
+        return SIN_SELECCION
+    seleccion = getattr(request, '_seleccion_campos', None)
+    if seleccion is None:
+        parametros = request.query_params
+        seleccion = SIN_SELECCION
+        if parametros.get('fields') or parametros.get('omit') or parametros.get('expand'):
+            seleccion = _seleccion(
+                _arbol(parametros['fields']) if parametros.get('fields') else None,
+                _arbol(parametros.get('omit', '')),
+                _arbol(parametros.get('expand', '')),
+            )
+        request._seleccion_campos = seleccion
+    return seleccion
+
+
+# Mixin para ModelSerializer: ?fields=, ?omit= y ?expand= en las lecturas. Sin docstring: drf-spectacular
+# lo publicaría como descripción de cada serializer del esquema.
+class CamposDinamicosMixin:
+    # {campo: serializer} de las relaciones que ?expand= reemplaza por el objeto anidado.
+    expandibles = {}
+
+    def __init__(self, *args, seleccion=None, **kwargs):
+        # Los serializers anidados por ?expand= reciben su parte de la selección; el raíz la lee de la solicitud.
+        self._seleccion = seleccion
+        super().__init__(*args, **kwargs)
+
+    @property
+    def seleccion(self):
+        if self._seleccion is None:
+            return leer_seleccion(self.context.get('request'))
+        return self._seleccion
+
+    def get_fields(self):
+        campos = super().get_fields()
+        seleccion = self.seleccion
+        if seleccion == SIN_SELECCION:
+            return campos
+
+        pedidos = set(seleccion.solo or ()) | seleccion.omitir | {nombre for nombre, _ in seleccion.expandir}
+        desconocidos = pedidos - campos.keys() - self.expandibles.keys()
+        if desconocidos:
+            raise ParseError(
+                f"Campos desconocidos: {', '.join(sorted(desconocidos))}. Disponibles: {', '.join(campos)}."
+            )
+        for nombre, anidada in seleccion.expandir:
+            if nombre not in self.expandibles:
+                raise ParseError(
+                    f"'{nombre}' no se puede expandir. Expandibles: {', '.join(self.expandibles) or 'ninguno'}."
+                )
+            campos[nombre] = self.expandibles[nombre](
+                read_only=True, allow_null=getattr(campos.get(nombre), 'allow_null', False), seleccion=anidada,
+            )
+        if seleccion.solo is not None:
+            campos = {nombre: campo for nombre, campo in campos.items() if nombre in seleccion.solo}
+        for nombre in seleccion.omitir:
+            campos.pop(nombre, None)
+        return campos
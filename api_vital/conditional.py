@@ -0,0 +1,145 @@
+# api_vital/conditional.py
+
+'''Bloque de Comentarios:
+Módulo de GET Condicional (ETag / Last-Modified) para la API Salud Vital Ltda.
+Los validadores salen de contadores de versión por tabla (modelo VersionTabla),
+no del cuerpo de la respuesta: una sola consulta indexada basta para responder
+304 Not Modified a If-None-Match / If-Modified-Since sin serializar nada.
+- Last-Modified tiene precisión de un segundo y los cambios se guardan en
+  microsegundos: se envía redondeado al segundo siguiente y solo cuando el
+  último cambio tiene al menos un segundo de antigüedad (mientras tanto
+  If-Modified-Since no responde 304). Así una escritura posterior a la
+  respuesta siempre cae en un segundo más nuevo, y dos escrituras en el mismo
+  segundo no dan un 304 con datos viejos. El ETag valida siempre.
+- post_save / post_delete (api_vital/signals.py) incrementan el contador al
+  confirmarse la transacción, sin bloquear la fila de versión mientras dura.
+- El ETag combina la ruta, los parámetros, el formato y las versiones de la
+  tabla del ViewSet y de las tablas relacionadas que carga su serializer.
+- alist / aretrieve son las variantes para la lectura asíncrona
+  (api_vital/asincrono.py): leen las versiones con el ORM asíncrono.
+'''
+
+import hashlib
+from datetime import datetime, timezone as tz
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import VersionTabla
+from .query_planner import planificar
+
+# Instante usado cuando una tabla todavía no registra cambios.
+_SIN_CAMBIOS = datetime(2000, 1, 1, tzinfo=tz.utc)
+
+
+def ultima_modificacion(ultimo_cambio):
+    '''Last-Modified en segundos enteros (redondeado hacia arriba), o None si el cambio tiene menos de un segundo.'''
+    segundos = int(ultimo_cambio.timestamp()) + 1
+    if timezone.now().timestamp() < segundos:
+        # Aún puede llegar otra escritura dentro del mismo segundo.
+        return None
+    return segundos
+
+
+def _incrementar(tabla):
+    if VersionTabla.objects.filter(tabla=tabla).update(version=F('version') + 1, modificado=Now()):
+        return
+    try:
+        with transaction.atomic():
+            VersionTabla.objects.create(tabla=tabla, version=1)
+    except IntegrityError:
+        # Otro proceso creó la fila al mismo tiempo.
+        VersionTabla.objects.filter(tabla=tabla).update(version=F('version') + 1, modificado=Now())
+
+
+def incrementar_version(modelo):
+    '''Registra un cambio en la tabla del modelo (al confirmar la transacción en curso).'''
+    tabla = modelo._meta.db_table
+    transaction.on_commit(lambda: _incrementar(tabla))
+
+
+def leer_versiones(modelos):
+    '''Devuelve {tabla: (version, modificado)} para los modelos indicados, en una sola consulta.'''
+    tablas = [modelo._meta.db_table for modelo in modelos]
+    encontradas = {
+        tabla: (version, modificado)
+        for tabla, version, modificado in VersionTabla.objects.filter(tabla__in=tablas)
+        .values_list('tabla', 'version', 'modificado')
+    }
+    return {tabla: encontradas.get(tabla, (0, _SIN_CAMBIOS)) for tabla in tablas}
+
+
+async def aleer_versiones(modelos):
+    '''Variante asíncrona de leer_versiones.'''
+    tablas = [modelo._meta.db_table for modelo in modelos]
+    encontradas = {
+        tabla: (version, modificado)
+        async for tabla, version, modificado in VersionTabla.objects.filter(tabla__in=tablas)
+        .values_list('tabla', 'version', 'modificado')
+    }
+    return {tabla: encontradas.get(tabla, (0, _SIN_CAMBIOS)) for tabla in tablas}
+
+
+class ConditionalGetMixin:
+    '''Mixin para ViewSets: ETag fuerte y Last-Modified en list/retrieve, y 304 a los GET condicionales.'''
+
+    def modelos_validadores(self):
+        return planificar(self.get_serializer()).modelos(self.get_queryset().model)
+
+    def validadores(self, request):
+        return self._firmar(request, leer_versiones(self.modelos_validadores()))
+
+    async def avalidadores(self, request):
+        return self._firmar(request, await aleer_versiones(self.modelos_validadores()))
+
+    def _firmar(self, request, versiones):
+        firma = repr((
+            request.path, sorted(request.GET.lists()), request.accepted_renderer.media_type,
+            sorted(versiones.items()),
+        ))
+        etag = quote_etag(hashlib.sha256(firma.encode()).hexdigest()[:32])
+        ultimo_cambio = max(modificado for _, modificado in versiones.values())
+        return etag, ultimo_cambio
+
+    def _no_modificado(self, request, etag, ultimo_cambio):
+        request._validadores_condicionales = (etag, ultimo_cambio)
+        return get_conditional_response(request, etag=etag, last_modified=ultima_modificacion(ultimo_cambio))
+
+    def _respuesta_condicional(self, request, vista, *args, **kwargs):
+        no_modificado = self._no_modificado(request, *self.validadores(request))
+        if no_modificado is not None:
+            return no_modificado
+        return vista(request, *args, **kwargs)
+
+    async def _arespuesta_condicional(self, request, vista, *args, **kwargs):
+        no_modificado = self._no_modificado(request, *await self.avalidadores(request))
+        if no_modificado is not None:
+            return no_modificado
+        return await vista(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_condicional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_condicional(request, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._arespuesta_condicional(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._arespuesta_condicional(request, super().aretrieve, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validadores = getattr(request, '_validadores_condicionales', None)
+        if validadores and response.status_code in (200, 304):
+            etag, ultimo_cambio = validadores
+            response['ETag'] = etag
+            segundos = ultima_modificacion(ultimo_cambio)
+            if segundos is not None:
+                response['Last-Modified'] = http_date(segundos)
+        return response
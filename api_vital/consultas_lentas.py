@@ -0,0 +1,179 @@
+# api_vital/consultas_lentas.py
+
+'''Bloque de Comentarios:
+Módulo de Registro de Consultas Lentas (opcional, desactivado por defecto).
+ConsultasLentasMiddleware instala un execute_wrapper en cada conexión durante
+la solicitud y anota toda sentencia que supere CONSULTAS_LENTAS_UMBRAL_MS,
+junto con la ruta, la vista resuelta y la acción del ViewSet que la originó.
+- Una muestra (CONSULTAS_LENTAS_MUESTREO_EXPLAIN, entre 0 y 1) de los SELECT
+  anotados se vuelve a ejecutar con EXPLAIN (ANALYZE, BUFFERS) en PostgreSQL.
+  Solo SELECT: ANALYZE ejecuta de verdad la sentencia. Los SELECT que bloquean
+  filas (FOR UPDATE / FOR SHARE) se explican sin ANALYZE.
+- El plan y el guardado no alargan la solicitud: se hacen en request_finished,
+  que Django emite después de enviar la respuesta (al cerrarla), fuera de la
+  transacción de la solicitud y sin el wrapper instalado. Se guardan en la
+  tabla ConsultaLenta, que funciona como buffer circular: se conservan las
+  últimas CONSULTAS_LENTAS_MAXIMO filas.
+- No se guardan los parámetros de la sentencia (pueden contener datos de
+  pacientes); el plan sí muestra los valores usados en los filtros.
+Funciona en modo síncrono (WSGI) y asíncrono (ASGI), como MetricasMiddleware.
+Se consulta en GET diagnostico/consultas-lentas/ (solo staff) y con
+'manage.py consultas_lentas'.
+'''
+
+import random
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, transaction
+
+from .metricas import ainstalar_wrapper, instalar_wrapper
+from .models import ConsultaLenta
+
+# Sentencias lentas anotadas como máximo por solicitud (una N+1 lenta no llena el buffer de golpe).
+MAXIMO_POR_SOLICITUD = 20
+# SELECT que toman bloqueos de fila: EXPLAIN ANALYZE los volvería a tomar.
+_BLOQUEO_FILAS = re.compile(r'\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+# Sentencias anotadas de la solicitud en curso, pendientes hasta request_finished.
+_PENDIENTES = ContextVar('consultas_lentas_pendientes', default=None)
+
+
+def _configuracion():
+    return (
+        getattr(settings, 'CONSULTAS_LENTAS_UMBRAL_MS', None),
+        getattr(settings, 'CONSULTAS_LENTAS_MUESTREO_EXPLAIN', 0.1),
+        getattr(settings, 'CONSULTAS_LENTAS_MAXIMO', 500),
+    )
+
+
+def explicar(alias, sql, params):
+    '''Plan real de un SELECT con EXPLAIN (ANALYZE, BUFFERS), o el estimado (EXPLAIN) si bloquea filas;
+    None si no aplica (otro motor o sentencia).'''
+    conexion = connections[alias]
+    if conexion.vendor != 'postgresql' or sql.lstrip()[:6].upper() != 'SELECT':
+        return None
+    explain = 'EXPLAIN ' if _BLOQUEO_FILAS.search(sql) else 'EXPLAIN (ANALYZE, BUFFERS) '
+    try:
+        # En un savepoint: si el plan falla no invalida una transacción externa.
+        with transaction.atomic(using=alias), conexion.cursor() as cursor:
+            cursor.execute(explain + sql, params)
+            return '\n'.join(fila[0] for fila in cursor.fetchall())
+    except DatabaseError as error:
+        return f'No se pudo obtener el plan: {error}'
+
+
+def guardar(anotadas, maximo):
+    '''Guarda las sentencias anotadas y descarta las más antiguas del buffer circular.'''
+    ConsultaLenta.objects.bulk_create(anotadas)
+    ultimo = ConsultaLenta.objects.order_by('-pk').values_list('pk', flat=True).first()
+    ConsultaLenta.objects.filter(pk__lte=ultimo - maximo).delete()
+
+
+class _Vigilante:
+    '''execute_wrapper que anota las sentencias lentas de una solicitud.'''
+
+    def __init__(self, umbral_ms):
+        self.umbral = umbral_ms / 1000
+        self.anotadas = []  # (alias, sql, params, many, duración en segundos)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            if duracion >= self.umbral and len(self.anotadas) < MAXIMO_POR_SOLICITUD:
+                self.anotadas.append((context['connection'].alias, sql, params, many, duracion))
+
+    def origen(self, request):
+        coincidencia = request.resolver_match
+        vista = getattr(coincidencia, 'func', None)
+        # ViewSets: as_view() guarda el mapa método -> acción; vistas basadas en clase: su nombre.
+        acciones = getattr(vista, 'actions', None)
+        if acciones:
+            accion = acciones.get(request.method.lower(), '')
+        elif hasattr(vista, 'view_class'):
+            accion = vista.view_class.__name__
+        else:
+            accion = ''
+        return {
+            'metodo': request.method,
+            'ruta': request.path[:255],
+            'vista': coincidencia.view_name if coincidencia else '',
+            'accion': accion,
+        }
+
+    def guardar(self, origen, muestreo, maximo):
+        guardar([
+            ConsultaLenta(
+                duracion_ms=duracion * 1000, sql=sql, base_datos=alias,
+                plan=explicar(alias, sql, params) if not many and random.random() < muestreo else None,
+                **origen,
+            )
+            for alias, sql, params, many, duracion in self.anotadas
+        ], maximo)
+
+
+def guardar_pendientes(sender, **kwargs):
+    '''request_finished: explica y guarda las sentencias lentas de la solicitud que terminó.'''
+    pendientes = _PENDIENTES.get()
+    if pendientes is None:
+        return
+    _PENDIENTES.set(None)
+    vigilante, origen, muestreo, maximo = pendientes
+    # close_old_connections (también en request_finished) puede haber cerrado las conexiones de la
+    # solicitud: las que se abran aquí se cierran al terminar.
+    abiertas = {alias for alias in connections if connections[alias].connection is not None}
+    try:
+        vigilante.guardar(origen, muestreo, maximo)
+    finally:
+        for alias in connections:
+            if alias not in abiertas:
+                connections[alias].close()
+
+
+request_finished.connect(guardar_pendientes, dispatch_uid='consultas-lentas-guardar')
+
+
+class ConsultasLentasMiddleware:
+    '''Anota y guarda las sentencias lentas de cada solicitud. Activo solo si CONSULTAS_LENTAS_UMBRAL_MS está definido.'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        umbral, muestreo, maximo = _configuracion()
+        if umbral is None:
+            return self.get_response(request)
+
+        vigilante = _Vigilante(umbral)
+        with ExitStack() as pila:
+            instalar_wrapper(pila, vigilante)
+            response = self.get_response(request)
+        if vigilante.anotadas:
+            _PENDIENTES.set((vigilante, vigilante.origen(request), muestreo, maximo))
+        return response
+
+    async def __acall__(self, request):
+        umbral, muestreo, maximo = _configuracion()
+        if umbral is None:
+            return await self.get_response(request)
+
+        vigilante = _Vigilante(umbral)
+        with ExitStack() as pila:
+            await ainstalar_wrapper(pila, vigilante)
+            response = await self.get_response(request)
+        if vigilante.anotadas:
+            _PENDIENTES.set((vigilante, vigilante.origen(request), muestreo, maximo))
+        return response
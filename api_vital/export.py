@@ -0,0 +1,67 @@
+# api_vital/export.py
+
+'''Bloque de Comentarios:
+Módulo de Exportación Masiva (streaming) para la API Salud Vital Ltda.
+Agrega la acción /export/ a un ViewSet: aplica los mismos filtros que el
+listado, lee las filas con .iterator() (cursor del lado del servidor en
+PostgreSQL) y las transmite como NDJSON o CSV a medida que se serializan,
+de modo que el uso de memoria no depende de la cantidad de filas.
+Bajo ASGI la respuesta recibe un iterador asíncrono (transmitir_async): con
+un iterador síncrono Django lo consumiría entero con sync_to_async(list)
+antes de enviar el primer byte.
+'''
+
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+
+from .renderers import NDJSONRenderer, CSVRenderer
+
+
+def _bloque(partes, tamano):
+    return list(islice(partes, tamano))
+
+
+async def transmitir_async(partes, tamano):
+    '''Iterador asíncrono sobre un generador síncrono: cada bloque de 'tamano' partes (lectura del cursor
+    y serialización) se produce con sync_to_async, en el hilo de la solicitud, y se envía antes de leer el siguiente.'''
+    siguiente = sync_to_async(_bloque)
+    try:
+        while bloque := await siguiente(partes, tamano):
+            for parte in bloque:
+                yield parte
+    finally:
+        # Cierra el cursor del servidor también si el cliente se desconecta a mitad de la descarga.
+        await sync_to_async(partes.close)()
+
+
+class ExportMixin:
+    '''Mixin para ViewSets: GET <recurso>/export/?format=ndjson|csv con los filtros del listado.'''
+    # Filas leídas por cada viaje al cursor del servidor.
+    export_chunk_size = 2000
+
+    def filas_exportacion(self, queryset):
+        '''Genera un dict por fila usando el serializer del ViewSet (una sola instancia reutilizada).'''
+        serializer = self.get_serializer()
+        for instancia in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield serializer.to_representation(instancia)
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        '''Exporta todas las filas filtradas en streaming (sin paginar).'''
+        queryset = self.filter_queryset(self.get_queryset())
+        renderer = request.accepted_renderer
+        campos = list(self.get_serializer().fields)
+        partes = renderer.filas(campos, self.filas_exportacion(queryset))
+        if isinstance(request._request, ASGIRequest):
+            partes = transmitir_async(partes, self.export_chunk_size)
+        respuesta = StreamingHttpResponse(
+            partes,
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        nombre = self.basename or queryset.model._meta.model_name
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.{renderer.format}"'
+        return respuesta
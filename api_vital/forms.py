@@ -4,9 +4,12 @@
 Módulo de Formularios de Django.
 Define los formularios (ModelForm) usados por las vistas basadas en Templates (HTML)
 para la captura de datos (Crear y Actualizar) de todas las entidades del modelo.
+Las claves foráneas hacia tablas grandes usan AutocompletarSelect
+(api_vital/autocompletar.py): el formulario no lista todas las filas.
 '''
 
 from django import forms
+from .autocompletar import AutocompletarSelect
 from .models import (
     Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento, 
     Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento
@@ -43,6 +46,13 @@ class MedicamentoForm(forms.ModelForm):
         model = Medicamento
         fields = '__all__'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            # El stock inicial se fija al crear; después se ajusta con POST medicamentos/<id>/ajustar-stock/
+            # (sin leer-modificar-escribir).
+            del self.fields['stock']
+
 # ----------------- ENTIDADES DE ATENCIÓN MÉDICA -----------------
 
 class ConsultaMedicaForm(forms.ModelForm):
@@ -52,6 +62,8 @@ class ConsultaMedicaForm(forms.ModelForm):
         widgets = {
             # Permite ingresar fecha y hora fácilmente
             'fecha_hora': forms.DateTimeInput(attrs={'type': 'datetime-local'}), 
+            'paciente': AutocompletarSelect('pacientes'),
+            'medico': AutocompletarSelect('medicos'),
         }
         
 class TratamientoForm(forms.ModelForm):
@@ -61,14 +73,22 @@ class TratamientoForm(forms.ModelForm):
         widgets = {
             'fecha_inicio': forms.DateInput(attrs={'type': 'date'}),
             'fecha_fin': forms.DateInput(attrs={'type': 'date'}),
+            'consulta': AutocompletarSelect('consultas'),
         }
 
 class RecetaMedicaForm(forms.ModelForm):
     class Meta:
         model = RecetaMedica
         fields = ['consulta', 'indicaciones_generales']
+        widgets = {
+            'consulta': AutocompletarSelect('consultas'),
+        }
         
 class DetalleRecetaForm(forms.ModelForm):
     class Meta:
         model = DetalleReceta
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        widgets = {
+            'receta': AutocompletarSelect('recetas'),
+            'medicamento': AutocompletarSelect('medicamentos'),
+        }
\ No newline at end of file
@@ -0,0 +1,441 @@
+# api_vital/generador.py
+
+'''Bloque de Comentarios:
+Módulo Generador de Datos Sintéticos (usado por 'manage.py generar_datos' y
+por el benchmark de la API).
+- Genera especialidades, tipos de tratamiento, medicamentos, médicos (con sus
+  horarios de atención), pacientes, consultas, tratamientos, recetas y
+  detalles de receta, coherentes entre sí.
+- Los RUT son únicos y tienen dígito verificador válido (módulo 11).
+- Cada médico atiende en bloques de 30 minutos ('duracion_consulta') dentro de su
+  horario (lunes a viernes, 08:00 a 17:00): sus citas nunca se superponen.
+- Es reproducible: la misma semilla y los mismos volúmenes producen los mismos datos.
+Las claves primarias se asignan aquí (a continuación de las existentes), de
+modo que las filas hijas se arman sin releer a las padres. En PostgreSQL
+(psycopg 3) se escribe con COPY; en otros motores, con bulk_create por lotes.
+Ninguna de las dos vías emite señales: al final se recalculan los resúmenes,
+se invalidan las caches y se ajustan las secuencias de las claves primarias.
+'''
+
+import random
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from itertools import accumulate
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.utils import timezone
+
+from .cache import invalidar_modelo
+from .conditional import incrementar_version
+from .models import (
+    Especialidad, Paciente, Medico, HorarioAtencion, ConsultaMedica, TipoTratamiento,
+    Tratamiento, Medicamento, RecetaMedica, DetalleReceta
+)
+from .resumenes import reconstruir_resumenes
+
+# Volumen a escala 1.
+VOLUMEN_REFERENCIA = {
+    'especialidades': 20,
+    'tipos_tratamiento': 8,
+    'medicamentos': 300,
+    'medicos': 500,
+    'pacientes': 100_000,
+    'consultas': 1_000_000,
+}
+# Mínimos para que todas las relaciones tengan datos a cualquier escala.
+VOLUMEN_MINIMO = {
+    'especialidades': 3,
+    'tipos_tratamiento': 3,
+    'medicamentos': 5,
+    'medicos': 5,
+    'pacientes': 10,
+    'consultas': 50,
+}
+# Fracción de consultas con tratamiento y con receta; medicamentos por receta (mín., máx.).
+PROPORCION_TRATAMIENTOS = 0.6
+PROPORCION_RECETAS = 0.5
+DETALLES_POR_RECETA = (1, 3)
+
+LOTE = 10_000
+
+# Trigger que mantiene ConsultaMedica.busqueda en PostgreSQL (ver migración 0003).
+TRIGGER_BUSQUEDA = 'api_vital_consulta_busqueda_trg'
+
+# Tablas que reciben el grueso de las filas: se cargan sin índices secundarios ni claves foráneas.
+MODELOS_MASIVOS = (Paciente, ConsultaMedica, Tratamiento, RecetaMedica, DetalleReceta)
+
+# Jornada de los médicos generados (lunes a viernes).
+DIAS_ATENCION = (0, 1, 2, 3, 4)
+INICIO_JORNADA = time(8)
+FIN_JORNADA = time(17)
+DURACION_CONSULTA = 30
+
+ESTADOS_PASADOS = (('REALIZADA', 85), ('CANCELADA', 15))
+ESTADOS_FUTUROS = (('PENDIENTE', 50), ('CONFIRMADA', 40), ('CANCELADA', 10))
+
+ESPECIALIDADES = (
+    'Medicina General', 'Cardiología', 'Pediatría', 'Dermatología', 'Traumatología', 'Ginecología',
+    'Neurología', 'Oftalmología', 'Otorrinolaringología', 'Psiquiatría', 'Endocrinología',
+    'Gastroenterología', 'Neumología', 'Urología', 'Nefrología', 'Reumatología', 'Oncología',
+    'Geriatría', 'Kinesiología', 'Nutrición',
+)
+TIPOS_TRATAMIENTO = (
+    'Farmacológico', 'Fisioterapia', 'Cirugía', 'Psicoterapia', 'Dieta', 'Control periódico',
+    'Rehabilitación', 'Terapia respiratoria',
+)
+PRINCIPIOS_ACTIVOS = (
+    ('Paracetamol', '500 mg'), ('Ibuprofeno', '400 mg'), ('Amoxicilina', '500 mg'), ('Losartán', '50 mg'),
+    ('Metformina', '850 mg'), ('Omeprazol', '20 mg'), ('Atorvastatina', '20 mg'), ('Salbutamol', '100 mcg'),
+    ('Loratadina', '10 mg'), ('Sertralina', '50 mg'), ('Enalapril', '10 mg'), ('Levotiroxina', '100 mcg'),
+)
+PRESENTACIONES = ('Comprimido', 'Cápsula', 'Jarabe', 'Inyectable', 'Inhalador', 'Crema')
+NOMBRES = {
+    'M': ('Juan', 'José', 'Luis', 'Carlos', 'Jorge', 'Pedro', 'Diego', 'Matías', 'Felipe', 'Tomás',
+          'Benjamín', 'Vicente', 'Cristóbal', 'Sebastián', 'Andrés', 'Manuel'),
+    'F': ('María', 'Ana', 'Carolina', 'Francisca', 'Camila', 'Javiera', 'Constanza', 'Valentina',
+          'Catalina', 'Fernanda', 'Daniela', 'Isidora', 'Josefa', 'Antonia', 'Paula', 'Sofía'),
+}
+APELLIDOS = (
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda',
+    'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza',
+    'Valenzuela', 'Castillo', 'Tapia', 'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez',
+    'Sánchez', 'Fernández', 'Ramírez', 'Carrasco', 'Gómez', 'Cortés', 'Herrera', 'Núñez',
+)
+CALLES = ('Av. Libertador Bernardo O\'Higgins', 'Av. Providencia', 'Av. Grecia', 'Los Carrera', 'Av. Matta',
+          'San Martín', 'Av. Colón', 'Prat', 'Freire', 'Av. Pedro de Valdivia')
+COMUNAS = ('Santiago', 'Providencia', 'Ñuñoa', 'Maipú', 'La Florida', 'Puente Alto', 'Valparaíso',
+           'Viña del Mar', 'Concepción', 'Temuco')
+MOTIVOS = (
+    'Dolor de cabeza persistente', 'Control de presión arterial', 'Dolor abdominal agudo', 'Tos y fiebre',
+    'Control de diabetes', 'Dolor lumbar', 'Chequeo preventivo anual', 'Dificultad para respirar',
+    'Erupción en la piel', 'Mareos frecuentes', 'Dolor de garganta', 'Control post operatorio',
+)
+DIAGNOSTICOS = (
+    'Migraña tensional', 'Hipertensión arterial controlada', 'Gastritis aguda', 'Infección respiratoria alta',
+    'Diabetes mellitus tipo 2', 'Lumbago mecánico', 'Paciente sano', 'Asma bronquial', 'Dermatitis de contacto',
+    'Vértigo posicional', 'Faringitis viral', 'Evolución favorable',
+)
+FRECUENCIAS = ('Cada 8 horas', 'Cada 12 horas', 'Cada 24 horas', 'Cada 6 horas')
+DURACIONES = ('5 días', '7 días', '10 días', '14 días', '30 días')
+
+
+def volumen(escala):
+    '''Cantidad de filas de cada entidad para la escala indicada (1 = VOLUMEN_REFERENCIA).'''
+    return {clave: max(VOLUMEN_MINIMO[clave], int(total * escala)) for clave, total in VOLUMEN_REFERENCIA.items()}
+
+
+def digito_verificador(numero):
+    '''Dígito verificador de un RUT chileno (módulo 11): '0'-'9' o 'K'.'''
+    suma, factor = 0, 2
+    while numero:
+        suma += numero % 10 * factor
+        numero //= 10
+        factor = 2 if factor == 7 else factor + 1
+    digito = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(digito, str(digito))
+
+
+def formatear_rut(numero):
+    '''RUT con puntos y dígito verificador (ej.: 18.123.456-7).'''
+    return f'{numero:,}'.replace(',', '.') + '-' + digito_verificador(numero)
+
+
+def _ruts(azar, cantidad, modelo, desde, hasta):
+    '''RUT únicos (y distintos de los ya registrados en 'modelo') tomados al azar de [desde, hasta).'''
+    existentes = set(modelo.objects.values_list('rut', flat=True))
+    ruts = [formatear_rut(numero) for numero in azar.sample(range(desde, hasta), cantidad + len(existentes))]
+    return [rut for rut in ruts if rut not in existentes][:cantidad]
+
+
+def _unicos(nombres, modelo, campo):
+    '''Agrega un sufijo numérico a los nombres que ya existen en 'modelo' o se repiten en la lista.'''
+    usados = set(modelo.objects.values_list(campo, flat=True))
+    resultado = []
+    for nombre in nombres:
+        candidato, sufijo = nombre, 2
+        while candidato in usados:
+            candidato, sufijo = f'{nombre} {sufijo}', sufijo + 1
+        usados.add(candidato)
+        resultado.append(candidato)
+    return resultado
+
+
+def _siguiente_pk(modelo):
+    ultimo = modelo.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (ultimo or 0) + 1
+
+
+class _Escritor:
+    '''Escribe filas (tuplas con la clave primaria ya asignada) con COPY o con bulk_create.'''
+
+    def __init__(self, usar_copy, lote):
+        self.usar_copy = usar_copy
+        self.lote = lote
+        self.filas = Counter()
+
+    def escribir(self, modelo, columnas, filas):
+        if not filas:
+            return
+        if self.usar_copy:
+            nombre = connection.ops.quote_name
+            sql = 'COPY {} ({}) FROM STDIN'.format(
+                nombre(modelo._meta.db_table),
+                ', '.join(nombre(modelo._meta.get_field(columna).column) for columna in columnas),
+            )
+            with connection.cursor() as cursor, cursor.copy(sql) as copia:
+                for fila in filas:
+                    copia.write_row(fila)
+        else:
+            # bulk_create completa por su cuenta los campos auto_now/auto_now_add.
+            modelo.objects.bulk_create(
+                [modelo(**dict(zip(columnas, fila))) for fila in filas], batch_size=self.lote,
+            )
+        self.filas[modelo] += len(filas)
+
+
+@contextmanager
+def _carga_masiva(modelos):
+    '''Quita los índices secundarios y las claves foráneas de las tablas y los recrea al salir (solo PostgreSQL).
+
+    Como en pg_restore: construir un índice sobre la tabla ya cargada y validar una clave
+    foránea con una sola consulta es mucho más rápido que mantenerlos fila a fila.
+    Los índices de PRIMARY KEY y UNIQUE se conservan.
+    '''
+    indices, claves_foraneas = [], []
+    if connection.vendor == 'postgresql':
+        tablas = [modelo._meta.db_table for modelo in modelos]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''SELECT indexname, indexdef FROM pg_indexes i
+                   WHERE schemaname = current_schema() AND tablename = ANY(%s)
+                   AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)''',
+                [tablas],
+            )
+            indices = cursor.fetchall()
+            cursor.execute(
+                '''SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint
+                   WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])''',
+                [tablas],
+            )
+            claves_foraneas = cursor.fetchall()
+            # Las claves foráneas de Django son diferidas: las verificaciones pendientes (de filas
+            # ya escritas en esta transacción) impedirían alterar las tablas referenciadas.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            for tabla, nombre, _ in claves_foraneas:
+                cursor.execute(f'ALTER TABLE {tabla} DROP CONSTRAINT {connection.ops.quote_name(nombre)}')
+            for nombre, _ in indices:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(nombre)}')
+    yield
+    with connection.cursor() as cursor:
+        for _, definicion in indices:
+            cursor.execute(definicion)
+        for tabla, nombre, definicion in claves_foraneas:
+            cursor.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT {connection.ops.quote_name(nombre)} {definicion}')
+
+
+@contextmanager
+def _busqueda_precalculada():
+    '''Desactiva el trigger de 'busqueda' durante la carga y entrega el vector de cada (motivo, diagnóstico).
+
+    Los textos salen de listas fijas: sus vectores se calculan una vez, con la misma
+    expresión del trigger, en vez de una vez por fila.
+    '''
+    motivos = [motivo for motivo in MOTIVOS for _ in (0, 1)]
+    diagnosticos = [diagnostico for par in zip(DIAGNOSTICOS, [None] * len(DIAGNOSTICOS)) for diagnostico in par]
+    tabla = connection.ops.quote_name(ConsultaMedica._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''SELECT motivo, diagnostico,
+                      (setweight(to_tsvector('spanish', coalesce(diagnostico, '')), 'A') ||
+                       setweight(to_tsvector('spanish', coalesce(motivo, '')), 'B'))::text
+               FROM unnest(%s::text[], %s::text[]) AS t(motivo, diagnostico)''',
+            [motivos, diagnosticos],
+        )
+        vectores = {(motivo, diagnostico): vector for motivo, diagnostico, vector in cursor.fetchall()}
+        cursor.execute(f'ALTER TABLE {tabla} DISABLE TRIGGER {TRIGGER_BUSQUEDA}')
+    yield vectores
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {tabla} ENABLE TRIGGER {TRIGGER_BUSQUEDA}')
+
+
+def _catalogos(azar, escritor, cantidades, ahora):
+    '''Especialidades, tipos de tratamiento y medicamentos. Devuelve sus listas de claves.'''
+    pk = _siguiente_pk(Especialidad)
+    nombres = [ESPECIALIDADES[i % len(ESPECIALIDADES)] for i in range(cantidades['especialidades'])]
+    escritor.escribir(Especialidad, ('id', 'nombre', 'descripcion', 'updated_at'), [
+        (pk + i, nombre, f'Atención de {nombre.lower()}.', ahora)
+        for i, nombre in enumerate(_unicos(nombres, Especialidad, 'nombre'))
+    ])
+    especialidades = list(range(pk, pk + len(nombres)))
+
+    pk = _siguiente_pk(TipoTratamiento)
+    nombres = [TIPOS_TRATAMIENTO[i % len(TIPOS_TRATAMIENTO)] for i in range(cantidades['tipos_tratamiento'])]
+    escritor.escribir(TipoTratamiento, ('id', 'nombre', 'descripcion', 'updated_at'), [
+        (pk + i, nombre, None, ahora) for i, nombre in enumerate(_unicos(nombres, TipoTratamiento, 'nombre'))
+    ])
+    tipos = list(range(pk, pk + len(nombres)))
+
+    pk = _siguiente_pk(Medicamento)
+    principios = [PRINCIPIOS_ACTIVOS[i % len(PRINCIPIOS_ACTIVOS)] for i in range(cantidades['medicamentos'])]
+    presentaciones = [azar.choice(PRESENTACIONES) for _ in principios]
+    nombres = _unicos([f'{principio} {presentacion}' for (principio, _), presentacion in zip(principios, presentaciones)],
+                      Medicamento, 'nombre_comercial')
+    escritor.escribir(Medicamento, ('id', 'nombre_comercial', 'principio_activo', 'concentracion', 'presentacion',
+                                    'stock', 'updated_at'), [
+        (pk + i, nombre, principio, concentracion, presentacion, azar.randrange(100, 100_000), ahora)
+        for i, (nombre, (principio, concentracion), presentacion) in enumerate(zip(nombres, principios, presentaciones))
+    ])
+    return especialidades, tipos, list(range(pk, pk + len(nombres)))
+
+
+def _medicos(azar, escritor, cantidad, especialidades, ahora):
+    '''Médicos (repartidos entre las especialidades) y su horario semanal. Devuelve sus claves.'''
+    pk = _siguiente_pk(Medico)
+    filas = []
+    for i, rut in enumerate(_ruts(azar, cantidad, Medico, 5_000_000, 20_000_000)):
+        filas.append((pk + i, rut, azar.choice(NOMBRES[azar.choice('MF')]), azar.choice(APELLIDOS),
+                      especialidades[i % len(especialidades)], f'+569{azar.randrange(10_000_000, 100_000_000)}',
+                      f'medico{pk + i}@saludvital.cl', DURACION_CONSULTA, ahora))
+    escritor.escribir(Medico, ('id', 'rut', 'nombre', 'apellido', 'especialidad_id', 'telefono', 'email',
+                               'duracion_consulta', 'updated_at'), filas)
+    medicos = [fila[0] for fila in filas]
+
+    pk = _siguiente_pk(HorarioAtencion)
+    escritor.escribir(HorarioAtencion, ('id', 'medico_id', 'dia_semana', 'hora_inicio', 'hora_fin', 'updated_at'), [
+        (pk + i, medico, dia, INICIO_JORNADA, FIN_JORNADA, ahora)
+        for i, (medico, dia) in enumerate((medico, dia) for medico in medicos for dia in DIAS_ATENCION)
+    ])
+    return medicos
+
+
+def _pacientes(azar, escritor, cantidad, lote, ahora):
+    '''Pacientes con RUT válidos. Devuelve el rango [desde, hasta) de sus claves.'''
+    pk = _siguiente_pk(Paciente)
+    ruts = _ruts(azar, cantidad, Paciente, 1_000_000, 26_000_000)
+    for inicio in range(0, len(ruts), lote):
+        filas = []
+        for i in range(inicio, min(inicio + lote, len(ruts))):
+            sexo = azar.choices('MFO', cum_weights=(49, 99, 100))[0]
+            filas.append((
+                pk + i, ruts[i], azar.choice(NOMBRES.get(sexo, NOMBRES['F'])),
+                f'{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}',
+                date(1930, 1, 1) + timedelta(days=azar.randrange(34_000)), sexo,
+                f'{azar.choice(CALLES)} {azar.randrange(1, 9999)}, {azar.choice(COMUNAS)}',
+                f'+569{azar.randrange(10_000_000, 100_000_000)}', ahora,
+            ))
+        escritor.escribir(Paciente, ('id', 'rut', 'nombre', 'apellido', 'fecha_nacimiento', 'sexo', 'direccion',
+                                     'telefono', 'updated_at'), filas)
+    return pk, pk + len(ruts)
+
+
+def _jornadas(desde, dias_necesarios):
+    '''Inicio (aware) de la jornada de los primeros 'dias_necesarios' días hábiles desde 'desde'.'''
+    jornadas, dia = [], desde
+    while len(jornadas) < dias_necesarios:
+        if dia.weekday() in DIAS_ATENCION:
+            jornadas.append(timezone.make_aware(datetime.combine(dia, INICIO_JORNADA)))
+        dia += timedelta(days=1)
+    return jornadas
+
+
+def _consultas(azar, escritor, cantidad, pacientes, medicos, tipos, medicamentos, desde, lote, ahora, vectores=None):
+    '''Consultas con sus tratamientos, recetas y detalles, escritas por lotes.
+
+    Si se entregan 'vectores' (ver _busqueda_precalculada), la columna 'busqueda' se escribe directamente.
+
+    La consulta i es del médico i % M en su bloque i // M: los bloques recorren la jornada
+    de cada día hábil, así que las citas de un médico nunca se superponen.
+    '''
+    duracion = timedelta(minutes=DURACION_CONSULTA)
+    bloques_por_dia = (datetime.combine(desde, FIN_JORNADA) - datetime.combine(desde, INICIO_JORNADA)) // duracion
+    ultimo_bloque = (cantidad - 1) // len(medicos)
+    jornadas = _jornadas(desde, ultimo_bloque // bloques_por_dia + 1)
+    estados_pasados, pesos_pasados = zip(*ESTADOS_PASADOS)
+    estados_futuros, pesos_futuros = zip(*ESTADOS_FUTUROS)
+    pesos_pasados, pesos_futuros = list(accumulate(pesos_pasados)), list(accumulate(pesos_futuros))
+
+    columnas_consulta = ('id', 'paciente_id', 'medico_id', 'fecha_hora', 'motivo_consulta', 'diagnostico', 'estado',
+                         'updated_at') + (('busqueda',) if vectores else ())
+    pk_consulta = _siguiente_pk(ConsultaMedica)
+    pk_tratamiento = _siguiente_pk(Tratamiento)
+    pk_receta = _siguiente_pk(RecetaMedica)
+    pk_detalle = _siguiente_pk(DetalleReceta)
+    for inicio in range(0, cantidad, lote):
+        consultas, tratamientos, recetas, detalles = [], [], [], []
+        for i in range(inicio, min(inicio + lote, cantidad)):
+            bloque = i // len(medicos)
+            fecha_hora = jornadas[bloque // bloques_por_dia] + duracion * (bloque % bloques_por_dia)
+            if fecha_hora < ahora:
+                estado = azar.choices(estados_pasados, cum_weights=pesos_pasados)[0]
+            else:
+                estado = azar.choices(estados_futuros, cum_weights=pesos_futuros)[0]
+            indice = azar.randrange(len(MOTIVOS))
+            realizada = estado == 'REALIZADA'
+            motivo, diagnostico = MOTIVOS[indice], DIAGNOSTICOS[indice] if realizada else None
+            consulta = (pk_consulta, azar.randrange(*pacientes), medicos[i % len(medicos)], fecha_hora, motivo,
+                        diagnostico, estado, ahora)
+            consultas.append(consulta + (vectores[motivo, diagnostico],) if vectores else consulta)
+            if realizada and azar.random() < PROPORCION_TRATAMIENTOS:
+                fecha = fecha_hora.date()
+                tratamientos.append((pk_tratamiento, pk_consulta, azar.choice(tipos),
+                                     f'Tratamiento de {DIAGNOSTICOS[indice].lower()}',
+                                     'Indicaciones entregadas en la consulta.', fecha,
+                                     fecha + timedelta(days=azar.choice((7, 14, 30))), ahora))
+                pk_tratamiento += 1
+            if realizada and azar.random() < PROPORCION_RECETAS:
+                recetas.append((pk_receta, pk_consulta, fecha_hora.date(), None, ahora))
+                por_receta = min(len(medicamentos), azar.randint(*DETALLES_POR_RECETA))
+                for medicamento in azar.sample(medicamentos, por_receta):
+                    detalles.append((pk_detalle, pk_receta, medicamento, '1 unidad', azar.choice(FRECUENCIAS),
+                                     azar.choice(DURACIONES), azar.randint(1, 3), ahora))
+                    pk_detalle += 1
+                pk_receta += 1
+            pk_consulta += 1
+
+        escritor.escribir(ConsultaMedica, columnas_consulta, consultas)
+        escritor.escribir(Tratamiento, ('id', 'consulta_id', 'tipo_id', 'nombre', 'descripcion', 'fecha_inicio',
+                                        'fecha_fin', 'updated_at'), tratamientos)
+        escritor.escribir(RecetaMedica, ('id', 'consulta_id', 'fecha_emision', 'indicaciones_generales',
+                                         'updated_at'), recetas)
+        escritor.escribir(DetalleReceta, ('id', 'receta_id', 'medicamento_id', 'dosis', 'frecuencia', 'duracion',
+                                          'cantidad', 'updated_at'), detalles)
+
+
+def generar(cantidades, semilla=1, desde=None, lote=LOTE, usar_copy=None):
+    '''Genera los volúmenes de 'cantidades' (ver volumen()) en una transacción.
+
+    'desde' es el primer día de la agenda (por defecto, el 2 de enero de 2023).
+    Devuelve un Counter con las filas escritas por modelo.
+    '''
+    if usar_copy is None:
+        usar_copy = connection.vendor == 'postgresql' and is_psycopg3
+    azar = random.Random(semilla)
+    escritor = _Escritor(usar_copy, lote)
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        especialidades, tipos, medicamentos = _catalogos(azar, escritor, cantidades, ahora)
+        medicos = _medicos(azar, escritor, cantidades['medicos'], especialidades, ahora)
+        with _carga_masiva(MODELOS_MASIVOS), (_busqueda_precalculada() if usar_copy else nullcontext()) as vectores:
+            pacientes = _pacientes(azar, escritor, cantidades['pacientes'], lote, ahora)
+            _consultas(azar, escritor, cantidades['consultas'], pacientes, medicos, tipos, medicamentos,
+                       desde or date(2023, 1, 2), lote, ahora, vectores)
+
+        # Las claves se asignaron a mano: las secuencias deben continuar después de ellas.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(escritor.filas)):
+                cursor.execute(sql)
+        reconstruir_resumenes()
+        for modelo in escritor.filas:
+            invalidar_modelo(modelo)
+            incrementar_version(modelo)
+
+    if connection.vendor == 'postgresql':
+        # Estadísticas del planificador al día con el nuevo volumen.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE ' + ', '.join(connection.ops.quote_name(modelo._meta.db_table)
+                                                  for modelo in escritor.filas))
+    return escritor.filas
@@ -0,0 +1,75 @@
+# api_vital/gestion.py
+
+'''Bloque de Comentarios:
+Módulo de Listados de Gestión (vistas HTML 'gestion/').
+ListadoGestionMixin acota el costo de cada listado, sin importar el tamaño de la tabla:
+- páginas de 'paginate_by' filas (?page=) con ConteoEstimadoPaginator
+  (api_vital/pagination.py), que no cuenta la tabla entera;
+- select_related de las relaciones que muestra el template ('relaciones') y
+  defer de las columnas que no muestra ('diferidos'): una consulta por página;
+- filtros del lado del servidor con un FilterSet de django-filter; ?buscar=
+  (BusquedaFilterSet) usa buscar_palabras de api_vital/search.py, que en
+  PostgreSQL resuelven los índices de trigramas de pacientes y médicos;
+- orden con ?orden= entre los declarados en 'ordenes', cada uno terminado en
+  un desempate único y respaldado por un índice.
+Una página profunda (?page= alto) paga el OFFSET; para recorrer la tabla
+completa están la API (paginación por cursor) y la exportación.
+Los templates incluyen api_vital/_filtros_gestion.html y api_vital/_paginacion.html.
+'''
+
+import django_filters
+from django import forms
+
+from .pagination import ConteoEstimadoPaginator
+from .search import buscar_palabras
+
+
+class BusquedaFilterSet(django_filters.FilterSet):
+    '''FilterSet con ?buscar=: cada palabra debe aparecer (icontains) en alguno de 'campos_busqueda'.'''
+    buscar = django_filters.CharFilter(method='filtrar_busqueda', label='Buscar')
+    campos_busqueda = ()
+
+    def filtrar_busqueda(self, queryset, nombre, valor):
+        return buscar_palabras(queryset, valor, self.campos_busqueda)
+
+
+class ListadoGestionMixin:
+    '''Mixin para ListView de gestión: paginación, select_related, filtros y orden del lado del servidor.'''
+    paginate_by = 50
+    paginator_class = ConteoEstimadoPaginator
+    # Relaciones que lee el template (select_related) y columnas que no muestra (defer).
+    relaciones = ()
+    diferidos = ()
+    filterset_class = None
+    # {valor de ?orden=: (etiqueta, campos de order_by)}; el primero es el orden por defecto.
+    ordenes = {}
+
+    def clave_orden(self):
+        orden = self.request.GET.get('orden')
+        return orden if orden in self.ordenes else next(iter(self.ordenes), None)
+
+    def get_ordering(self):
+        clave = self.clave_orden()
+        return self.ordenes[clave][1] if clave else super().get_ordering()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.relaciones:
+            queryset = queryset.select_related(*self.relaciones)
+        if self.diferidos:
+            queryset = queryset.defer(*self.diferidos)
+        self.filtro = None
+        if self.filterset_class is not None:
+            self.filtro = self.filterset_class(self.request.GET, queryset=queryset, request=self.request)
+            queryset = self.filtro.qs
+            for campo in self.filtro.form.fields.values():
+                clase = 'form-select' if isinstance(campo.widget, forms.Select) else 'form-control'
+                campo.widget.attrs.setdefault('class', clase)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        contexto = super().get_context_data(**kwargs)
+        contexto['filtro'] = self.filtro
+        contexto['ordenes'] = [(clave, etiqueta) for clave, (etiqueta, _) in self.ordenes.items()]
+        contexto['orden'] = self.clave_orden()
+        return contexto
@@ -0,0 +1,204 @@
+# api_vital/lectura_rapida.py
+
+'''Bloque de Comentarios:
+Módulo de Lectura Rápida (solo lectura) para los listados grandes.
+Opcional, desactivada por defecto: se activa con LECTURA_RAPIDA = True (settings).
+LecturaRapidaMixin atiende list y export sin instanciar modelos ni recorrer
+los campos de DRF fila por fila: lee tuplas con values_list() (incluidas las
+columnas de las relaciones, como los nombres de paciente y médico) y arma cada
+dict con un lector precalculado por campo. La salida es idéntica a la del
+serializer: cada lector usa el to_representation del campo (se omite cuando
+devuelve el valor sin cambios; los DateTimeField ISO 8601 leen la zona horaria
+activa una vez por listado y no en cada fila) y los '__str__' de una relación
+usan el formato declarado en su modelo (columnas_str / formato_str).
+Si algún campo no puede leerse así (serializers anidados de ?expand=,
+relaciones múltiples, propiedades o métodos, una FK nulable intermedia) la
+vista usa el serializer. Los planes se calculan una vez por proceso.
+Medición frente al serializer: 'manage.py benchmark_serializacion'.
+'''
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .campos import CamposDinamicosMixin, leer_seleccion
+
+# to_representation que devuelven el valor leído de la base sin cambios: no se llaman.
+_IDENTIDAD = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.ReadOnlyField.to_representation,
+}
+
+# Cache de planes por (serializer, selección de campos); None si el serializer no admite la lectura rápida.
+_PLANES = {}
+
+
+def _columnas_campo(campo, modelo):
+    '''(columnas, formato) de un campo: formato es None (una columna) o el formato_str de una relación.
+    Devuelve None si el campo no puede leerse con values_list().'''
+    if isinstance(campo, (serializers.BaseSerializer, ManyRelatedField)) or campo.source == '*':
+        return None
+    actual, ruta = modelo, []
+    atributos = campo.source_attrs
+    for indice, atributo in enumerate(atributos):
+        ultimo = indice == len(atributos) - 1
+        try:
+            relacion = actual._meta.get_field(atributo)
+        except FieldDoesNotExist:
+            if atributo == '__str__' and ultimo and ruta and hasattr(actual, 'formato_str'):
+                return ['__'.join(ruta + [columna]) for columna in actual.columnas_str], actual.formato_str
+            return None
+        if not relacion.concrete or relacion.many_to_many:
+            return None
+        if ultimo:
+            # Una FK solo se lee como columna si el campo la representa por su PK.
+            if relacion.is_relation and not (isinstance(campo, RelatedField) and campo.use_pk_only_optimization()):
+                return None
+            return ['__'.join(ruta + [atributo])], None
+        # Con la FK en NULL el serializer omite el campo; values_list() daría None.
+        if not relacion.is_relation or relacion.null:
+            return None
+        ruta.append(atributo)
+        actual = relacion.related_model
+    return None
+
+
+def _fecha_hora_iso(campo):
+    '''True si el campo es un DateTimeField ISO 8601 con la zona horaria activa (el caso de ModelSerializer).'''
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    return (type(campo) is serializers.DateTimeField and not hasattr(campo, 'timezone')
+            and isinstance(formato, str) and formato.lower() == ISO_8601)
+
+
+def _fabrica(indices, formato, campo):
+    '''Función zona -> lector (tupla -> valor representado) del campo.'''
+    if formato is not None:
+        return lambda zona: lambda fila: formato(*[fila[indice] for indice in indices])
+    indice = indices[0]
+    convertir = campo.to_representation
+    if isinstance(campo, RelatedField):
+        # La columna ya es la PK que representaría el campo.
+        if campo.pk_field is None:
+            return lambda zona: lambda fila: fila[indice]
+        convertir = campo.pk_field.to_representation
+    elif type(campo).to_representation in _IDENTIDAD:
+        return lambda zona: lambda fila: fila[indice]
+    elif _fecha_hora_iso(campo):
+        return lambda zona: _lector_fecha_hora(indice, zona, convertir)
+    return lambda zona: lambda fila: None if fila[indice] is None else convertir(fila[indice])
+
+
+def _lector_fecha_hora(indice, zona, convertir):
+    # Lo mismo que DateTimeField.to_representation, con la zona ya resuelta; el resto de los casos lo delega.
+    def leer(fila):
+        valor = fila[indice]
+        if valor is None:
+            return None
+        if zona is None or not timezone.is_aware(valor):
+            return convertir(valor)
+        texto = valor.astimezone(zona).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return leer
+
+
+class PlanLectura:
+    '''Columnas para values_list() y lectores que arman el dict del serializer desde cada tupla.'''
+
+    def __init__(self, columnas, fabricas):
+        self.columnas = tuple(columnas)
+        self.fabricas = tuple(fabricas)
+
+    def leer(self, queryset, extra=()):
+        '''Queryset de tuplas con nombre; 'extra' agrega columnas que necesita la vista (orden del cursor).'''
+        columnas = self.columnas + tuple(columna for columna in extra if columna not in self.columnas)
+        return queryset.values_list(*columnas, named=True)
+
+    def convertidor(self):
+        '''Función tupla -> dict; la zona horaria activa se lee aquí, una vez.'''
+        zona = timezone.get_current_timezone() if settings.USE_TZ else None
+        lectores = tuple((nombre, fabrica(zona)) for nombre, fabrica in self.fabricas)
+        return lambda fila: {nombre: leer(fila) for nombre, leer in lectores}
+
+    def convertir(self, filas):
+        convertir = self.convertidor()
+        return [convertir(fila) for fila in filas]
+
+
+def compilar(serializer):
+    '''Plan de lectura rápida de un serializer, o None si algún campo no lo admite.'''
+    modelo = serializer.Meta.model
+    columnas, fabricas = {}, []
+    for nombre, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        resultado = _columnas_campo(campo, modelo)
+        if resultado is None:
+            return None
+        rutas, formato = resultado
+        indices = [columnas.setdefault(ruta, len(columnas)) for ruta in rutas]
+        fabricas.append((nombre, _fabrica(indices, formato, campo)))
+    return PlanLectura(columnas, fabricas)
+
+
+def plan_lectura(clase, seleccion=None):
+    '''Plan (en cache) para una clase de serializer y una selección de ?fields= / ?omit= / ?expand=.'''
+    clave = (clase, seleccion)
+    if clave not in _PLANES:
+        # Sin contexto: los lectores guardan campos del serializer y no deben retener la solicitud.
+        serializer = clase(seleccion=seleccion) if seleccion is not None else clase()
+        _PLANES[clave] = compilar(serializer)
+    return _PLANES[clave]
+
+
+class LecturaRapidaMixin:
+    '''Mixin para ViewSets: list y export con values_list(). Debe ir después de ConditionalGetMixin
+    y antes de ExportMixin y LecturaAsincronaMixin.'''
+    # El ViewSet admite la lectura rápida; se usa solo si además LECTURA_RAPIDA está activa.
+    lectura_rapida = True
+
+    def plan_lectura_rapida(self):
+        if not (self.lectura_rapida and getattr(settings, 'LECTURA_RAPIDA', False)):
+            return None
+        clase = self.get_serializer_class()
+        seleccion = leer_seleccion(self.request) if issubclass(clase, CamposDinamicosMixin) else None
+        return plan_lectura(clase, seleccion)
+
+    def filas_rapidas(self, plan, queryset):
+        return plan.leer(queryset, self.columnas_requeridas())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.plan_lectura_rapida()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        filas = self.filas_rapidas(plan, self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(plan.convertir(pagina))
+        return Response(plan.convertir(filas))
+
+    async def alist(self, request, *args, **kwargs):
+        plan = self.plan_lectura_rapida()
+        if plan is None:
+            return await super().alist(request, *args, **kwargs)
+        filas = self.filas_rapidas(plan, await self.afilter_queryset(self.get_queryset()))
+        if self.paginator is not None:
+            pagina = await sync_to_async(self.paginate_queryset)(filas)
+            if pagina is not None:
+                return self.get_paginated_response(plan.convertir(pagina))
+        return Response(plan.convertir([fila async for fila in filas]))
+
+    def filas_exportacion(self, queryset):
+        plan = self.plan_lectura_rapida()
+        if plan is None:
+            yield from super().filas_exportacion(queryset)
+            return
+        convertir = plan.convertidor()
+        for fila in self.filas_rapidas(plan, queryset).iterator(chunk_size=self.export_chunk_size):
+            yield convertir(fila)
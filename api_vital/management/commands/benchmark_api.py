@@ -0,0 +1,108 @@
+# api_vital/management/commands/benchmark_api.py
+
+'''Bloque de Comentarios:
+Comando de Benchmark de la API y de las vistas de gestión.
+Crea una base de datos de prueba (como 'manage.py test', sin tocar la de
+desarrollo), la siembra con volúmenes realistas, mide cada endpoint y escribe
+un reporte JSON. Con --linea-base compara contra un reporte anterior y termina
+con error si hay regresiones (para CI).
+Uso:
+  python manage.py benchmark_api --escala 0.002 --salida benchmark.json
+  python manage.py benchmark_api --linea-base benchmark_base.json --tolerancia 0.25
+'''
+
+import json
+import platform
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from api_vital import benchmark
+from api_vital.models import Paciente
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia (p50/p95/p99), throughput, consultas SQL y bytes de cada endpoint y vista de gestión.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=0.002,
+                            help='Fracción del volumen de referencia (1 = 100.000 pacientes, 1.000.000 de consultas).')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla de los datos sintéticos.')
+        parser.add_argument('--repeticiones', type=int, default=10, help='Mediciones por caso.')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Solicitudes previas no medidas por caso.')
+        parser.add_argument('--filtro', default='', help='Mide solo los casos cuyo nombre contiene este texto.')
+        parser.add_argument('--con-cache', action='store_true',
+                            help='No vacía la cache de respuestas entre mediciones.')
+        parser.add_argument('--salida', default='benchmark_api.json', help='Ruta del reporte JSON.')
+        parser.add_argument('--linea-base', help='Reporte anterior contra el que comparar.')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Aumento de p95 permitido frente a la línea base (fracción).')
+        parser.add_argument('--mantener-base', action='store_true',
+                            help='Conserva la base de prueba (y sus datos) para la próxima ejecución.')
+        parser.add_argument('--base-actual', action='store_true',
+                            help='Usa la base de datos configurada en vez de crear una de prueba.')
+
+    def handle(self, *args, **opciones):
+        nombre_original = None
+        if not opciones['base_actual']:
+            nombre_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=opciones['mantener_base'])
+        try:
+            # El cliente de pruebas usa el host 'testserver'.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                reporte = self.ejecutar(opciones)
+        finally:
+            if nombre_original is not None:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=opciones['mantener_base'])
+
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Reporte: {opciones['salida']}")
+
+        if opciones['linea_base']:
+            with open(opciones['linea_base'], encoding='utf-8') as archivo:
+                regresiones = benchmark.comparar(reporte, json.load(archivo), opciones['tolerancia'])
+            if regresiones:
+                raise CommandError('Regresiones frente a la línea base:\n  ' + '\n  '.join(regresiones))
+            self.stdout.write(self.style.SUCCESS('Sin regresiones frente a la línea base.'))
+
+    def ejecutar(self, opciones):
+        if Paciente.objects.exists():
+            self.stdout.write('La base ya tiene datos: se miden tal cual.')
+        else:
+            self.stdout.write(f"Sembrando datos (escala {opciones['escala']})...")
+            benchmark.sembrar(opciones['escala'], opciones['semilla'])
+
+        cliente = Client()
+        resultados = {}
+        self.stdout.write(f"{'caso':<55} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'sql':>4} {'bytes':>10}")
+        for nombre, url in benchmark.casos():
+            if opciones['filtro'] not in nombre:
+                continue
+            medicion = benchmark.medir(
+                cliente, url, opciones['repeticiones'], opciones['calentamiento'], opciones['con_cache'],
+            )
+            resultados[nombre] = {'url': url, **medicion}
+            self.stdout.write(
+                f"{nombre:<55} {medicion['p50_ms']:>9.2f} {medicion['p95_ms']:>9.2f} {medicion['p99_ms']:>9.2f} "
+                f"{medicion['solicitudes_por_segundo']:>8.1f} {medicion['consultas_sql']:>4} {medicion['bytes']:>10}"
+            )
+
+        return {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'motor': connection.vendor,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'plataforma': platform.platform(),
+                'repeticiones': opciones['repeticiones'],
+                'con_cache': opciones['con_cache'],
+                'volumen': {modelo.__name__: modelo.objects.count() for modelo in benchmark.MODELOS_VOLUMEN},
+            },
+            'resultados': resultados,
+        }
@@ -0,0 +1,151 @@
+# api_vital/management/commands/benchmark_async.py
+
+'''Bloque de Comentarios:
+Comando que compara el throughput de las lecturas de la API con solicitudes
+concurrentes reales (HTTP sobre TCP local) en tres despliegues:
+- wsgi: el servidor WSGI con un hilo por solicitud (runserver --noreload),
+- asgi: uvicorn con las vistas de lectura asíncronas (api_vital/asincrono.py),
+- asgi-sincrono: uvicorn con las vistas síncronas de DRF (LECTURA_ASINCRONA=0).
+Cada servidor se inicia en un subproceso con la configuración actual y mide
+contra la base de datos configurada, que debe tener datos (generar_datos).
+Uso:
+  python manage.py generar_datos --escala 0.01
+  python manage.py benchmark_async --concurrencia 1 10 50 --duracion 5
+'''
+
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api_vital import benchmark
+from api_vital.models import Paciente
+
+MODOS = ('wsgi', 'asgi', 'asgi-sincrono')
+# Segundos de espera a que el servidor acepte conexiones.
+ESPERA_INICIO = 30
+
+
+def comando_servidor(modo, host, puerto):
+    '''Línea de comandos y variables de entorno del servidor de cada modo.'''
+    entorno = {**os.environ, 'PYTHONUNBUFFERED': '1'}
+    if modo == 'wsgi':
+        comando = [sys.executable, 'manage.py', 'runserver', f'{host}:{puerto}',
+                   '--noreload', '--nostatic', '--skip-checks']
+    else:
+        entorno['LECTURA_ASINCRONA'] = '1' if modo == 'asgi' else '0'
+        comando = [sys.executable, '-m', 'uvicorn', 'SaludVitalProject.asgi:application',
+                   '--host', host, '--port', str(puerto), '--lifespan', 'off',
+                   '--no-access-log', '--log-level', 'warning']
+    return comando, entorno
+
+
+class Command(BaseCommand):
+    help = 'Compara el throughput de lecturas concurrentes bajo uvicorn (ASGI, vistas asíncronas) y WSGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS), help='Despliegues a medir.')
+        parser.add_argument('--concurrencia', nargs='+', type=int, default=[1, 10, 50],
+                            help='Clientes simultáneos de cada medición.')
+        parser.add_argument('--duracion', type=float, default=5.0, help='Segundos de cada medición.')
+        parser.add_argument('--calentamiento', type=float, default=1.0,
+                            help='Segundos de carga no medida al iniciar cada servidor.')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--filtro', default='', help='Solo los casos cuyo nombre contiene este texto.')
+        parser.add_argument('--salida', default='benchmark_async.json', help='Ruta del reporte JSON.')
+
+    def handle(self, *args, **opciones):
+        if not Paciente.objects.exists():
+            raise CommandError("La base de datos no tiene datos: cárguelos con 'manage.py generar_datos'.")
+        casos = [(nombre, url) for nombre, url in benchmark.casos_lectura() if opciones['filtro'] in nombre]
+        if not casos:
+            raise CommandError('Ningún caso coincide con el filtro.')
+        urls = [url for _, url in casos]
+        # Los servidores abren sus propias conexiones a la base.
+        connection.close()
+
+        resultados = {}
+        self.stdout.write(f"{'modo':<15} {'clientes':>8} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errores':>8}")
+        for modo in opciones['modos']:
+            resultados[modo] = {}
+            with self.servidor(modo, opciones['host'], opciones['puerto']):
+                benchmark.carga_concurrente(opciones['host'], opciones['puerto'], urls,
+                                            max(opciones['concurrencia']), opciones['calentamiento'])
+                for concurrencia in opciones['concurrencia']:
+                    medicion = benchmark.carga_concurrente(
+                        opciones['host'], opciones['puerto'], urls, concurrencia, opciones['duracion'],
+                    )
+                    resultados[modo][str(concurrencia)] = medicion
+                    self.stdout.write(
+                        f"{modo:<15} {concurrencia:>8} {medicion['solicitudes_por_segundo']:>9.1f} "
+                        f"{medicion.get('p50_ms', 0):>9.2f} {medicion.get('p95_ms', 0):>9.2f} "
+                        f"{medicion.get('p99_ms', 0):>9.2f} {medicion['errores']:>8}"
+                    )
+
+        reporte = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'motor': connection.vendor,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+                'duracion_s': opciones['duracion'],
+                'casos': dict(casos),
+            },
+            'resultados': resultados,
+        }
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Reporte: {opciones['salida']}")
+
+    def servidor(self, modo, host, puerto):
+        comando, entorno = comando_servidor(modo, host, puerto)
+        # stderr a un archivo: runserver registra cada solicitud y un pipe sin leer lo bloquearía.
+        errores = tempfile.TemporaryFile()
+        proceso = subprocess.Popen(comando, cwd=settings.BASE_DIR, env=entorno,
+                                   stdout=subprocess.DEVNULL, stderr=errores)
+        return _Servidor(proceso, errores, host, puerto, modo)
+
+
+class _Servidor:
+    '''Contexto que espera a que el servidor acepte conexiones y lo detiene al salir.'''
+
+    def __init__(self, proceso, errores, host, puerto, modo):
+        self.proceso, self.errores, self.host, self.puerto, self.modo = proceso, errores, host, puerto, modo
+
+    def __enter__(self):
+        limite = time.monotonic() + ESPERA_INICIO
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                self.errores.seek(0)
+                error = self.errores.read().decode(errors='replace')
+                self.errores.close()
+                raise CommandError(f'El servidor {self.modo} terminó al iniciar:\n{error}')
+            try:
+                socket.create_connection((self.host, self.puerto), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise CommandError(f'El servidor {self.modo} no aceptó conexiones en {ESPERA_INICIO} s.')
+
+    def __exit__(self, *excepcion):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+            self.proceso.wait()
+        self.errores.close()
@@ -0,0 +1,132 @@
+# api_vital/management/commands/benchmark_renderers.py
+
+'''Bloque de Comentarios:
+Comando que compara los formatos de respuesta de la API sobre listados
+grandes: JSON con el JSONRenderer / JSONParser de DRF (json de la biblioteca
+estándar), JSON con orjson y MessagePack (api_vital/renderers.py y
+api_vital/parsers.py). Para cada formato mide codificar y decodificar
+(mediana de varias ejecuciones), el tamaño del cuerpo (y comprimido con gzip)
+y verifica que los datos decodificados sean los mismos que con DRF.
+Los datos son los de los listados de la API (lectura rápida de
+api_vital/lectura_rapida.py): fechas ya convertidas a texto, como en la respuesta.
+Requiere datos (generar_datos).
+Uso: python manage.py benchmark_renderers --filas 10000 --repeticiones 5
+'''
+
+import gzip
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api_vital.lectura_rapida import plan_lectura
+from api_vital.models import ConsultaMedica, Paciente
+from api_vital.parsers import MessagePackParser, ORJSONParser
+from api_vital.query_planner import planificar
+from api_vital.renderers import MessagePackRenderer, ORJSONRenderer
+from api_vital.serializers import ConsultaMedicaSerializer, PacienteSerializer
+
+CASOS = {
+    'consultas-medicas': (ConsultaMedica, ConsultaMedicaSerializer),
+    'pacientes': (Paciente, PacienteSerializer),
+}
+FORMATOS = {
+    'json': (JSONRenderer, JSONParser),
+    'orjson': (ORJSONRenderer, ORJSONParser),
+    'msgpack': (MessagePackRenderer, MessagePackParser),
+}
+
+
+def datos_listado(modelo, clase, filas):
+    '''Las primeras 'filas' filas del listado, como las arma la API.'''
+    plan = planificar(clase())
+    queryset = plan.recortar(plan.aplicar(modelo.objects.all())).order_by('pk')
+    lectura = plan_lectura(clase)
+    return lectura.convertir(lectura.leer(queryset)[:filas])
+
+
+def _mediana_ms(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+class Command(BaseCommand):
+    help = 'Compara JSON (DRF), orjson y MessagePack: tiempo de codificar / decodificar y tamaño de la respuesta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', nargs='+', type=int, default=[10000], help='Filas por listado.')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por medición (se informa la mediana).')
+        parser.add_argument('--casos', nargs='+', choices=CASOS, default=list(CASOS))
+        parser.add_argument('--salida', default='benchmark_renderers.json', help='Ruta del reporte JSON.')
+
+    def handle(self, *args, **opciones):
+        if not ConsultaMedica.objects.exists():
+            raise CommandError("La base de datos no tiene datos: cárguelos con 'manage.py generar_datos'.")
+
+        resultados = {}
+        self.stdout.write(
+            f"{'caso':<18} {'filas':>7} {'formato':<8} {'codificar':>10} {'decodificar':>12} "
+            f"{'bytes':>11} {'gzip':>10}  iguales"
+        )
+        for caso in opciones['casos']:
+            modelo, clase = CASOS[caso]
+            resultados[caso] = {}
+            for filas in opciones['filas']:
+                datos = datos_listado(modelo, clase, filas)
+                referencia = None
+                medicion = resultados[caso][str(filas)] = {'filas': len(datos)}
+                for formato, (renderer_clase, parser_clase) in FORMATOS.items():
+                    renderer, parser = renderer_clase(), parser_clase()
+                    codificar_ms, contenido = _mediana_ms(lambda: renderer.render(datos), opciones['repeticiones'])
+                    decodificar_ms, decodificados = _mediana_ms(
+                        lambda: parser.parse(io.BytesIO(contenido)), opciones['repeticiones'],
+                    )
+                    if referencia is None:
+                        referencia = decodificados
+                    medicion[formato] = {
+                        'codificar_ms': round(codificar_ms, 2),
+                        'decodificar_ms': round(decodificar_ms, 2),
+                        'bytes': len(contenido),
+                        'bytes_gzip': len(gzip.compress(contenido, compresslevel=6)),
+                        'iguales': decodificados == referencia,
+                    }
+                    self.stdout.write(
+                        f"{caso:<18} {len(datos):>7} {formato:<8} {codificar_ms:>10.1f} {decodificar_ms:>12.1f} "
+                        f"{len(contenido):>11} {medicion[formato]['bytes_gzip']:>10}  "
+                        f"{'sí' if medicion[formato]['iguales'] else 'NO'}"
+                    )
+
+        reporte = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'motor': connection.vendor,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+                'repeticiones': opciones['repeticiones'],
+            },
+            'resultados': resultados,
+        }
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Reporte: {opciones['salida']}")
+        if not all(
+            medicion[formato]['iguales'] for caso in resultados.values()
+            for medicion in caso.values() for formato in FORMATOS
+        ):
+            raise CommandError('Algún formato no devolvió los mismos datos que el JSON de DRF.')
@@ -0,0 +1,128 @@
+# api_vital/management/commands/benchmark_serializacion.py
+
+'''Bloque de Comentarios:
+Comando que compara la serialización de listados grandes con el serializer de
+DRF (instancia los modelos y recorre sus campos fila por fila) y con la lectura
+rápida de api_vital/lectura_rapida.py (tuplas de values_list()).
+Para cada caso lee las mismas N filas con el mismo queryset que la vista
+(planificador incluido), mide consulta + armado de los dicts y el JSON final, y
+verifica que los dos caminos produzcan exactamente los mismos bytes.
+Requiere datos (generar_datos).
+Uso: python manage.py benchmark_serializacion --filas 1000 10000 --repeticiones 5
+'''
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api_vital.lectura_rapida import plan_lectura
+from api_vital.models import ConsultaMedica, Paciente
+from api_vital.query_planner import planificar
+from api_vital.serializers import ConsultaMedicaSerializer, PacienteSerializer
+
+CASOS = {
+    'consultas-medicas': (ConsultaMedica, ConsultaMedicaSerializer),
+    'pacientes': (Paciente, PacienteSerializer),
+}
+
+
+def _queryset(modelo, clase):
+    # Igual que QueryPlannerMixin en un GET, con un orden total para comparar los bytes.
+    plan = planificar(clase())
+    return plan.recortar(plan.aplicar(modelo.objects.all())).order_by('pk')
+
+
+def _serializer(modelo, clase, filas):
+    return clase(list(_queryset(modelo, clase)[:filas]), many=True).data
+
+
+def _rapida(modelo, clase, filas):
+    plan = plan_lectura(clase)
+    return plan.convertir(plan.leer(_queryset(modelo, clase))[:filas])
+
+
+def _medir(funcion, repeticiones, *args):
+    '''Mediana (ms) de armar los datos y de armar + JSON; devuelve también los bytes de la última ejecución.'''
+    datos_ms, total_ms = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        datos = funcion(*args)
+        armado = time.perf_counter()
+        contenido = JSONRenderer().render(datos)
+        fin = time.perf_counter()
+        datos_ms.append((armado - inicio) * 1000)
+        total_ms.append((fin - inicio) * 1000)
+    return statistics.median(datos_ms), statistics.median(total_ms), contenido
+
+
+class Command(BaseCommand):
+    help = 'Compara el serializer de DRF con la lectura rápida (values_list) en listados de N filas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', nargs='+', type=int, default=[1000, 10000], help='Filas por listado.')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por medición (se informa la mediana).')
+        parser.add_argument('--casos', nargs='+', choices=CASOS, default=list(CASOS))
+        parser.add_argument('--salida', default='benchmark_serializacion.json', help='Ruta del reporte JSON.')
+
+    def handle(self, *args, **opciones):
+        if not ConsultaMedica.objects.exists():
+            raise CommandError("La base de datos no tiene datos: cárguelos con 'manage.py generar_datos'.")
+
+        resultados = {}
+        self.stdout.write(
+            f"{'caso':<18} {'filas':>7} {'serializer':>11} {'rápida':>9} {'x':>6} "
+            f"{'+ JSON':>9} {'+ JSON':>9} {'x':>6}  idéntica"
+        )
+        for caso in opciones['casos']:
+            modelo, clase = CASOS[caso]
+            resultados[caso] = {}
+            for filas in opciones['filas']:
+                # Una ejecución previa de cada camino: planes en cache y páginas de la tabla en memoria.
+                _serializer(modelo, clase, filas)
+                _rapida(modelo, clase, filas)
+                datos_s, total_s, bytes_s = _medir(_serializer, opciones['repeticiones'], modelo, clase, filas)
+                datos_r, total_r, bytes_r = _medir(_rapida, opciones['repeticiones'], modelo, clase, filas)
+                medicion = {
+                    'filas': len(json.loads(bytes_r)),
+                    'serializer_ms': round(datos_s, 2),
+                    'rapida_ms': round(datos_r, 2),
+                    'aceleracion': round(datos_s / datos_r, 2),
+                    'serializer_json_ms': round(total_s, 2),
+                    'rapida_json_ms': round(total_r, 2),
+                    'aceleracion_json': round(total_s / total_r, 2),
+                    'bytes': len(bytes_r),
+                    'identica': bytes_s == bytes_r,
+                }
+                resultados[caso][str(filas)] = medicion
+                self.stdout.write(
+                    f"{caso:<18} {medicion['filas']:>7} {datos_s:>11.1f} {datos_r:>9.1f} "
+                    f"{medicion['aceleracion']:>6.2f} {total_s:>9.1f} {total_r:>9.1f} "
+                    f"{medicion['aceleracion_json']:>6.2f}  {'sí' if medicion['identica'] else 'NO'}"
+                )
+
+        reporte = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'motor': connection.vendor,
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+                'repeticiones': opciones['repeticiones'],
+            },
+            'resultados': resultados,
+        }
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f"Reporte: {opciones['salida']}")
+        if not all(medicion['identica'] for caso in resultados.values() for medicion in caso.values()):
+            raise CommandError('La lectura rápida no produjo los mismos bytes que el serializer.')
@@ -0,0 +1,98 @@
+# api_vital/management/commands/benchmark_stock.py
+
+'''Bloque de Comentarios:
+Comando de Benchmark de Reserva de Stock.
+Lanza varios hilos que reservan stock de un mismo medicamento (el caso de mayor
+contención) y mide reservas por segundo. Con --comparar ejecuta además el
+camino ingenuo leer-modificar-escribir para mostrar las actualizaciones perdidas.
+Crea un medicamento temporal y lo elimina al terminar.
+Uso: python manage.py benchmark_stock --hilos 8 --reservas 2000 [--comparar]
+'''
+
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api_vital.models import Medicamento
+from api_vital.stock import StockInsuficiente, reservar_stock
+
+
+def _reserva_condicional(medicamento_id):
+    with transaction.atomic():
+        reservar_stock(medicamento_id, 1)
+
+
+def _reserva_lectura_escritura(medicamento_id):
+    # Camino anterior: lee, resta en Python y guarda (pierde actualizaciones concurrentes).
+    with transaction.atomic():
+        medicamento = Medicamento.objects.get(pk=medicamento_id)
+        if medicamento.stock < 1:
+            raise StockInsuficiente(medicamento_id, 1)
+        medicamento.stock -= 1
+        medicamento.save(update_fields=['stock'])
+
+
+class Command(BaseCommand):
+    help = 'Mide el throughput de reservas concurrentes de stock sobre un mismo medicamento.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos (conexiones) concurrentes.')
+        parser.add_argument('--reservas', type=int, default=2000, help='Reservas totales de 1 unidad.')
+        parser.add_argument('--stock', type=int, default=None,
+                            help='Stock inicial (por defecto, igual a --reservas).')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Ejecuta también el camino leer-modificar-escribir.')
+
+    def handle(self, *args, **opciones):
+        caminos = [('condicional', _reserva_condicional)]
+        if opciones['comparar']:
+            caminos.append(('lectura-escritura', _reserva_lectura_escritura))
+        stock = opciones['reservas'] if opciones['stock'] is None else opciones['stock']
+        for nombre, reservar in caminos:
+            self.ejecutar(nombre, reservar, opciones['hilos'], opciones['reservas'], stock)
+
+    def ejecutar(self, nombre, reservar, hilos, reservas, stock):
+        medicamento = Medicamento.objects.create(
+            nombre_comercial=f'benchmark-{uuid.uuid4().hex[:12]}', principio_activo='Benchmark',
+            concentracion='-', presentacion='-', stock=stock,
+        )
+        resultados = {'exitosas': 0, 'rechazadas': 0}
+        candado = threading.Lock()
+        barrera = threading.Barrier(hilos)
+
+        def trabajador(cantidad):
+            exitosas = rechazadas = 0
+            try:
+                barrera.wait()
+                for _ in range(cantidad):
+                    try:
+                        reservar(medicamento.pk)
+                        exitosas += 1
+                    except StockInsuficiente:
+                        rechazadas += 1
+            finally:
+                connection.close()
+            with candado:
+                resultados['exitosas'] += exitosas
+                resultados['rechazadas'] += rechazadas
+
+        cuotas = [reservas // hilos + (1 if i < reservas % hilos else 0) for i in range(hilos)]
+        trabajadores = [threading.Thread(target=trabajador, args=(cuota,)) for cuota in cuotas]
+        inicio = time.perf_counter()
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        medicamento.refresh_from_db(fields=['stock'])
+        perdidas = medicamento.stock - (stock - resultados['exitosas'])
+        medicamento.delete()
+        self.stdout.write(
+            f"{nombre}: {resultados['exitosas']} reservas, {resultados['rechazadas']} rechazadas, "
+            f"{hilos} hilos, {duracion:.2f} s, {resultados['exitosas'] / duracion:.0f} reservas/s, "
+            f"stock final {medicamento.stock}, actualizaciones perdidas {perdidas}"
+        )
@@ -0,0 +1,50 @@
+# api_vital/management/commands/consultas_lentas.py
+
+'''Bloque de Comentarios:
+Comando que muestra las consultas lentas registradas por
+ConsultasLentasMiddleware (activo solo si CONSULTAS_LENTAS_UMBRAL_MS está
+definido), de la más reciente a la más antigua.
+Uso: python manage.py consultas_lentas [--limite 20] [--vista paciente-list]
+     [--con-plan] [--limpiar]
+'''
+
+from django.core.management.base import BaseCommand
+
+from api_vital.models import ConsultaLenta
+
+
+class Command(BaseCommand):
+    help = 'Muestra las últimas consultas SQL lentas con su ruta, vista, acción y (si se tomó) su plan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=20, help='Cantidad de consultas a mostrar (20 por defecto).')
+        parser.add_argument('--vista', help="Solo las de una vista (nombre de ruta, p. ej. 'paciente-list').")
+        parser.add_argument('--con-plan', action='store_true', help='Solo las que tienen plan y mostrarlo.')
+        parser.add_argument('--limpiar', action='store_true', help='Vacía el registro en lugar de mostrarlo.')
+
+    def handle(self, *args, **opciones):
+        if opciones['limpiar']:
+            borradas, _ = ConsultaLenta.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'{borradas} consultas lentas eliminadas.'))
+            return
+
+        consultas = ConsultaLenta.objects.all()
+        if opciones['vista']:
+            consultas = consultas.filter(vista=opciones['vista'])
+        if opciones['con_plan']:
+            consultas = consultas.filter(plan__isnull=False)
+
+        mostradas = 0
+        for consulta in consultas[:opciones['limite']]:
+            mostradas += 1
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{consulta.creada:%Y-%m-%d %H:%M:%S}  {consulta.duracion_ms:.1f} ms  '
+                f'{consulta.metodo} {consulta.ruta}  ({consulta.vista or "sin ruta"}'
+                f'{":" + consulta.accion if consulta.accion else ""}, {consulta.base_datos})'
+            ))
+            self.stdout.write(f'  {consulta.sql}')
+            if opciones['con_plan'] and consulta.plan:
+                for linea in consulta.plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+        if not mostradas:
+            self.stdout.write('No hay consultas lentas registradas.')
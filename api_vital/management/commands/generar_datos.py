@@ -0,0 +1,55 @@
+# api_vital/management/commands/generar_datos.py
+
+'''Bloque de Comentarios:
+Comando que genera datos sintéticos de volumen productivo (ver
+api_vital/generador.py): médicos con RUT válidos y horarios, pacientes,
+consultas sin superposición de horario, tratamientos, recetas y detalles.
+A diferencia de 'loaddata' (un save() por objeto), escribe con COPY en
+PostgreSQL o bulk_create por lotes. Con la misma semilla genera los mismos datos.
+Uso:
+  python manage.py generar_datos --escala 1            # 100.000 pacientes, 1.000.000 de consultas
+  python manage.py generar_datos --pacientes 5000 --consultas 20000 --semilla 7
+'''
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_vital.generador import VOLUMEN_REFERENCIA, generar, volumen
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos coherentes (COPY o bulk_create por lotes), reproducibles con --semilla.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=0.01,
+                            help='Fracción del volumen de referencia (1 = 100.000 pacientes, 1.000.000 de consultas).')
+        for clave, total in VOLUMEN_REFERENCIA.items():
+            parser.add_argument(f"--{clave.replace('_', '-')}", type=int, dest=clave,
+                                help=f'Cantidad exacta (a escala 1: {total}).')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla del generador aleatorio.')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día de la agenda (AAAA-MM-DD).')
+        parser.add_argument('--lote', type=int, default=10_000, help='Filas por lote de escritura.')
+        parser.add_argument('--sin-copy', action='store_true',
+                            help='Usa bulk_create también en PostgreSQL (en vez de COPY).')
+
+    def handle(self, *args, **opciones):
+        cantidades = volumen(opciones['escala'])
+        for clave in VOLUMEN_REFERENCIA:
+            if opciones[clave] is not None:
+                cantidades[clave] = opciones[clave]
+        if min(cantidades.values()) < 1:
+            raise CommandError('Todas las cantidades deben ser mayores que cero.')
+
+        self.stdout.write('Generando: ' + ', '.join(f'{valor} {clave}' for clave, valor in cantidades.items()))
+        inicio = time.perf_counter()
+        filas = generar(cantidades, opciones['semilla'], opciones['desde'], opciones['lote'],
+                        usar_copy=False if opciones['sin_copy'] else None)
+        duracion = time.perf_counter() - inicio
+
+        for modelo, total in filas.items():
+            self.stdout.write(f'  {modelo._meta.verbose_name_plural}: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(filas.values())} filas en {duracion:.1f} s ({sum(filas.values()) / duracion:,.0f} filas/s).'
+        ))
@@ -0,0 +1,27 @@
+# api_vital/management/commands/reconstruir_resumenes.py
+
+'''Bloque de Comentarios:
+Comando que recalcula desde cero los resúmenes de estadísticas
+(ResumenConsultaDiaria y ResumenTratamientoTipo). Se usa después de cargas
+que no emiten señales (bulk_create, loaddata, SQL directo) o para verificar
+que el mantenimiento incremental no se haya desviado.
+Uso: python manage.py reconstruir_resumenes
+'''
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_vital.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes de consultas por día/especialidad/estado y de tratamientos por tipo.'
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        consultas, tratamientos = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resúmenes reconstruidos en {time.perf_counter() - inicio:.2f} s: '
+            f'{consultas} filas de consultas diarias, {tratamientos} filas de tratamientos por tipo.'
+        ))
@@ -0,0 +1,243 @@
+# api_vital/metricas.py
+
+'''Bloque de Comentarios:
+Módulo de Métricas por Endpoint en formato Prometheus.
+MetricasMiddleware mide cada solicitud y la agrega en memoria por nombre de
+ruta resuelta (p. ej. 'paciente-list', 'paciente_list') y método HTTP:
+- latencia total de la solicitud,
+- cantidad de consultas SQL y tiempo en la base de datos (execute_wrapper),
+- tiempo de serialización: el render de la respuesta (renderer de DRF o
+  plantilla HTML, incluidas las consultas perezosas que dispare),
+- bytes de la respuesta (las respuestas en streaming no se miden),
+- cantidad de solicitudes por código de estado.
+GET /metrics expone los contadores e histogramas en el formato de texto de
+Prometheus. El costo por solicitud es una llamada extra por consulta SQL y una
+actualización de contadores bajo un lock, por lo que puede quedar activo en
+producción. Cada proceso agrega sus propias métricas: con varios workers,
+Prometheus debe consultar cada uno (o usar un solo proceso por contenedor).
+Funciona en modo síncrono (WSGI) y asíncrono (ASGI); en este último el
+execute_wrapper se instala en el hilo donde el ORM asíncrono ejecuta las
+consultas de la solicitud.
+Configuración (settings): METRICAS_HABILITADAS (True por defecto) y
+METRICAS_TOKEN (si se define, /metrics exige 'Authorization: Bearer <token>').
+'''
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+PREFIJO = 'saludvital_'
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+SIN_RUTA = 'sin_ruta'
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+LIMITES_BYTES = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+
+def instalar_wrapper(pila, wrapper):
+    '''Instala el execute_wrapper en todas las conexiones del hilo actual (se retira al cerrar la pila).'''
+    for alias in connections:
+        pila.enter_context(connections[alias].execute_wrapper(wrapper))
+
+
+async def ainstalar_wrapper(pila, wrapper):
+    # Bajo ASGI, el ORM asíncrono ejecuta las consultas de la solicitud en un hilo propio
+    # (sync_to_async con thread_sensitive): el wrapper se instala en las conexiones de ese hilo.
+    await sync_to_async(instalar_wrapper)(pila, wrapper)
+
+
+def _etiquetas(nombres, valores):
+    return ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores))
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    '''Contador por combinación de etiquetas.'''
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre, self.ayuda, self.etiquetas = PREFIJO + nombre, ayuda, etiquetas
+        self.series = {}
+
+    def incrementar(self, valores, cantidad=1):
+        self.series[valores] = self.series.get(valores, 0) + cantidad
+
+    def lineas(self):
+        for valores, total in sorted(self.series.items()):
+            yield f'{self.nombre}{{{_etiquetas(self.etiquetas, valores)}}} {_numero(total)}'
+
+
+class Histograma:
+    '''Histograma por combinación de etiquetas (cubetas acumuladas al exportar, como exige Prometheus).'''
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas, limites):
+        self.nombre, self.ayuda, self.etiquetas, self.limites = PREFIJO + nombre, ayuda, etiquetas, limites
+        self.series = {}  # valores de etiquetas -> [cuenta por cubeta (no acumulada)..., +Inf, suma]
+
+    def observar(self, valores, valor):
+        serie = self.series.get(valores)
+        if serie is None:
+            serie = self.series[valores] = [0] * (len(self.limites) + 1) + [0]
+        serie[bisect_left(self.limites, valor)] += 1
+        serie[-1] += valor
+
+    def lineas(self):
+        for valores, serie in sorted(self.series.items()):
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            acumulado = 0
+            for limite, cuenta in zip((*self.limites, '+Inf'), serie):
+                acumulado += cuenta
+                yield f'{self.nombre}_bucket{{{etiquetas},le="{_numero(limite)}"}} {acumulado}'
+            yield f'{self.nombre}_sum{{{etiquetas}}} {_numero(serie[-1])}'
+            yield f'{self.nombre}_count{{{etiquetas}}} {acumulado}'
+
+
+class RegistroMetricas:
+    '''Métricas agregadas del proceso. Todas las actualizaciones de una solicitud se hacen bajo un solo lock.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        ruta = ('view', 'method')
+        with self.lock:
+            self.solicitudes = Contador('http_requests_total', 'Solicitudes atendidas.', ruta + ('status',))
+            self.latencia = Histograma('http_request_duration_seconds', 'Latencia total de la solicitud.',
+                                       ruta, LIMITES_SEGUNDOS)
+            self.consultas = Histograma('http_request_db_queries', 'Consultas SQL por solicitud.',
+                                        ruta, LIMITES_CONSULTAS)
+            self.tiempo_bd = Histograma('http_request_db_duration_seconds',
+                                        'Tiempo en la base de datos por solicitud.', ruta, LIMITES_SEGUNDOS)
+            self.serializacion = Histograma('http_response_render_duration_seconds',
+                                            'Tiempo de serialización (render de la respuesta).',
+                                            ruta, LIMITES_SEGUNDOS)
+            self.bytes = Histograma('http_response_size_bytes', 'Tamaño del cuerpo de la respuesta.',
+                                    ruta, LIMITES_BYTES)
+
+    def registrar(self, vista, metodo, estado, medicion):
+        ruta = (vista, metodo)
+        with self.lock:
+            self.solicitudes.incrementar(ruta + (str(estado),))
+            self.latencia.observar(ruta, medicion.duracion)
+            self.consultas.observar(ruta, medicion.consultas)
+            self.tiempo_bd.observar(ruta, medicion.tiempo_bd)
+            if medicion.render is not None:
+                self.serializacion.observar(ruta, medicion.render)
+            if medicion.bytes is not None:
+                self.bytes.observar(ruta, medicion.bytes)
+
+    def exportar(self):
+        '''Texto en el formato de exposición de Prometheus (versión 0.0.4).'''
+        lineas = []
+        with self.lock:
+            for metrica in (self.solicitudes, self.latencia, self.consultas, self.tiempo_bd,
+                            self.serializacion, self.bytes):
+                lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+                lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+                lineas.extend(metrica.lineas())
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = RegistroMetricas()
+
+
+class _Medicion:
+    '''Acumula los datos de una solicitud; también es el execute_wrapper que cuenta las consultas.'''
+    __slots__ = ('duracion', 'consultas', 'tiempo_bd', 'render', 'bytes')
+
+    def __init__(self):
+        self.duracion, self.consultas, self.tiempo_bd, self.render, self.bytes = 0.0, 0, 0.0, None, None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_bd += time.perf_counter() - inicio
+
+
+class MetricasMiddleware:
+    '''Mide cada solicitud y la registra en REGISTRO. Debe ir primero en MIDDLEWARE para medir la latencia completa.'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_HABILITADAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Bajo ASGI, un hook síncrono costaría un salto a otro hilo por solicitud.
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = request._medicion_metricas = _Medicion()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            instalar_wrapper(pila, medicion)
+            response = self.get_response(request)
+        self._registrar(request, response, medicion, inicio)
+        return response
+
+    async def __acall__(self, request):
+        medicion = request._medicion_metricas = _Medicion()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            await ainstalar_wrapper(pila, medicion)
+            response = await self.get_response(request)
+        self._registrar(request, response, medicion, inicio)
+        return response
+
+    def _registrar(self, request, response, medicion, inicio):
+        medicion.duracion = time.perf_counter() - inicio
+        if not response.streaming:
+            medicion.bytes = len(response.content)
+
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else SIN_RUTA
+        REGISTRO.registrar(vista, request.method, response.status_code, medicion)
+
+    def process_template_response(self, request, response):
+        return self._medir_render(request, response)
+
+    async def _aprocess_template_response(self, request, response):
+        return self._medir_render(request, response)
+
+    def _medir_render(self, request, response):
+        # Se llama justo antes del render (TemplateResponse y Response de DRF): se mide hasta que termina.
+        inicio = time.perf_counter()
+
+        def fin_render(respuesta):
+            request._medicion_metricas.render = time.perf_counter() - inicio
+
+        response.add_post_render_callback(fin_render)
+        return response
+
+
+def metricas(request):
+    '''GET /metrics: métricas del proceso en formato Prometheus.'''
+    token = getattr(settings, 'METRICAS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRO.exportar(), content_type=TIPO_CONTENIDO)
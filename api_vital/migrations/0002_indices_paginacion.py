@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='consulta_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recetamedica',
+            index=models.Index(fields=['-fecha_emision', '-id'], name='receta_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['-fecha_inicio', '-id'], name='tratamiento_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Trigger que mantiene 'busqueda' en cada INSERT/UPDATE, backfill e índice GIN.
+# Solo aplica en PostgreSQL; en otros motores la columna queda sin uso.
+SQL_CREAR = '''
+CREATE OR REPLACE FUNCTION api_vital_consulta_busqueda() RETURNS trigger AS $$
+BEGIN
+    NEW.busqueda :=
+        setweight(to_tsvector('spanish', coalesce(NEW.diagnostico, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(NEW.motivo_consulta, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_vital_consulta_busqueda_trg
+    BEFORE INSERT OR UPDATE OF diagnostico, motivo_consulta ON api_vital_consultamedica
+    FOR EACH ROW EXECUTE FUNCTION api_vital_consulta_busqueda();
+
+UPDATE api_vital_consultamedica SET busqueda =
+    setweight(to_tsvector('spanish', coalesce(diagnostico, '')), 'A') ||
+    setweight(to_tsvector('spanish', coalesce(motivo_consulta, '')), 'B');
+
+CREATE INDEX consulta_busqueda_gin ON api_vital_consultamedica USING gin (busqueda);
+'''
+
+SQL_BORRAR = '''
+DROP INDEX IF EXISTS consulta_busqueda_gin;
+DROP TRIGGER IF EXISTS api_vital_consulta_busqueda_trg ON api_vital_consultamedica;
+DROP FUNCTION IF EXISTS api_vital_consulta_busqueda();
+'''
+
+
+def crear_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_CREAR)
+
+
+def borrar_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_BORRAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0002_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultamedica',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_trigger, borrar_trigger),
+    ]
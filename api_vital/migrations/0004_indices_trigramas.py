@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Índices GIN con gin_trgm_ops para la búsqueda difusa de pacientes y médicos.
+# Aceleran los operadores de similitud de pg_trgm (%, <%, %>) y LIKE '%texto%'.
+INDICES = [
+    ('paciente_nombre_trgm', 'api_vital_paciente', 'nombre'),
+    ('paciente_apellido_trgm', 'api_vital_paciente', 'apellido'),
+    ('paciente_rut_trgm', 'api_vital_paciente', 'rut'),
+    ('medico_nombre_trgm', 'api_vital_medico', 'nombre'),
+    ('medico_apellido_trgm', 'api_vital_medico', 'apellido'),
+    ('medico_rut_trgm', 'api_vital_medico', 'rut'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Sin pg_trgm la búsqueda usa el respaldo con icontains (ver api_vital/search.py).
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, columna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin ({columna} gin_trgm_ops)'
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0003_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0004_indices_trigramas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['medico', 'fecha_hora'], name='consulta_medico_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['paciente', '-fecha_hora'], name='consulta_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(condition=models.Q(('estado__in', ('PENDIENTE', 'CONFIRMADA'))), fields=['fecha_hora'], name='consulta_abiertas_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def stock_negativo_a_cero(apps, schema_editor):
+    # La nueva restricción (stock >= 0) fallaría con filas negativas heredadas.
+    Medicamento = apps.get_model('api_vital', 'Medicamento')
+    Medicamento.objects.filter(stock__lt=0).update(stock=0)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0006_updated_at_versiontabla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallereceta',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(stock_negativo_a_cero, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='medicamento',
+            name='stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
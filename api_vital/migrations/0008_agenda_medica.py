@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0007_reserva_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medico',
+            name='duracion_consulta',
+            field=models.PositiveSmallIntegerField(default=30, help_text='Duración de cada cita, en minutos.', validators=[django.core.validators.MinValueValidator(5)]),
+        ),
+        migrations.CreateModel(
+            name='HorarioAtencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='api_vital.medico')),
+            ],
+            options={
+                'verbose_name_plural': 'Horarios de Atención',
+                'ordering': ['medico_id', 'dia_semana', 'hora_inicio'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('hora_fin__gt', models.F('hora_inicio'))), name='horario_fin_despues_inicio')],
+            },
+        ),
+    ]
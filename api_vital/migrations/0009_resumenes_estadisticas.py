@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumenes(apps, schema_editor):
+    # Carga inicial desde los datos existentes; luego los mantienen las señales.
+    ConsultaMedica = apps.get_model('api_vital', 'ConsultaMedica')
+    Tratamiento = apps.get_model('api_vital', 'Tratamiento')
+    ResumenConsultaDiaria = apps.get_model('api_vital', 'ResumenConsultaDiaria')
+    ResumenTratamientoTipo = apps.get_model('api_vital', 'ResumenTratamientoTipo')
+    ResumenConsultaDiaria.objects.bulk_create([
+        ResumenConsultaDiaria(
+            fecha=fila['fecha'], especialidad_id=fila['medico__especialidad'], estado=fila['estado'],
+            cantidad=fila['total'],
+        )
+        for fila in ConsultaMedica.objects.order_by()
+        .annotate(fecha=TruncDate('fecha_hora')).values('fecha', 'medico__especialidad', 'estado')
+        .annotate(total=Count('id'))
+    ], batch_size=1000)
+    ResumenTratamientoTipo.objects.bulk_create([
+        ResumenTratamientoTipo(tipo_id=fila['tipo'], cantidad=fila['total'])
+        for fila in Tratamiento.objects.order_by().values('tipo').annotate(total=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0008_agenda_medica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenTratamientoTipo',
+            fields=[
+                ('tipo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api_vital.tipotratamiento')),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Tratamientos por Tipo',
+                'ordering': ['tipo_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenConsultaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADA', 'Confirmada'), ('REALIZADA', 'Realizada'), ('CANCELADA', 'Cancelada')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('especialidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api_vital.especialidad')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Consultas Diarias',
+                'ordering': ['-fecha', 'especialidad_id', 'estado'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'especialidad', 'estado'), name='resumen_consulta_clave')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
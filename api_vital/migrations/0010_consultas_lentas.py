@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0009_resumenes_estadisticas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duracion_ms', models.FloatField()),
+                ('sql', models.TextField()),
+                ('base_datos', models.CharField(default='default', max_length=50)),
+                ('metodo', models.CharField(blank=True, max_length=10)),
+                ('ruta', models.CharField(blank=True, max_length=255)),
+                ('vista', models.CharField(blank=True, help_text='Nombre de la ruta resuelta.', max_length=150)),
+                ('accion', models.CharField(blank=True, help_text='Acción del ViewSet (list, retrieve, buscar...).', max_length=100)),
+                ('plan', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
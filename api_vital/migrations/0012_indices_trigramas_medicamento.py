@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Índices GIN con gin_trgm_ops para el autocompletado de medicamentos (gestion/autocompletar/medicamentos/),
+# como los de pacientes y médicos en 0004_indices_trigramas.
+INDICES = [
+    ('medicamento_nombre_comercial_trgm', 'api_vital_medicamento', 'nombre_comercial'),
+    ('medicamento_principio_activo_trgm', 'api_vital_medicamento', 'principio_activo'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Sin pg_trgm la búsqueda usa el respaldo con icontains (ver api_vital/search.py).
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, columna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin ({columna} gin_trgm_ops)'
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_vital', '0011_indice_paciente_apellido'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -10,7 +10,10 @@ de pacientes, médicos, atenciones, tratamientos y medicamentos.
 Incluye mejoras con CHOICES y una nueva tabla (TipoTratamiento).
 '''
 
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
 
 # --- CHOICES ---
 # Mejoras con CHOICES: Estado de la consulta
@@ -21,6 +24,20 @@ ESTADO_CONSULTA_CHOICES = (
     ('CANCELADA', 'Cancelada'),
 )
 
+# Estados de una cita que todavía ocupan la agenda (cubiertos por un índice parcial).
+ESTADOS_ABIERTOS = ('PENDIENTE', 'CONFIRMADA')
+
+# Días de la semana de los horarios de atención (mismo orden que date.weekday()).
+DIA_SEMANA_CHOICES = (
+    (0, 'Lunes'),
+    (1, 'Martes'),
+    (2, 'Miércoles'),
+    (3, 'Jueves'),
+    (4, 'Viernes'),
+    (5, 'Sábado'),
+    (6, 'Domingo'),
+)
+
 SEXO_CHOICES = (
     ('M', 'Masculino'),
     ('F', 'Femenino'),
@@ -32,6 +49,8 @@ class Especialidad(models.Model):
     '''Entidad para registrar las especialidades médicas.'''
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
+    # Fecha de la última modificación (se expone en la API y sirve para sincronizar clientes).
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Especialidades"
@@ -50,12 +69,24 @@ class Paciente(models.Model):
     sexo = models.CharField(max_length=1, choices=SEXO_CHOICES)
     direccion = models.CharField(max_length=255, blank=True, null=True)
     telefono = models.CharField(max_length=15, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['apellido', 'nombre']
+        indexes = [
+            # Orden alfabético de los listados (con 'id' como desempate de la paginación).
+            models.Index(fields=['apellido', 'nombre', 'id'], name='paciente_apellido_nombre_idx'),
+        ]
+
+    # Columnas que lee __str__ y su formato (usados por la lectura rápida con values_list()).
+    columnas_str = ('nombre', 'apellido', 'rut')
+
+    @staticmethod
+    def formato_str(nombre, apellido, rut):
+        return f"{nombre} {apellido} ({rut})"
 
     def __str__(self):
-        return f"{self.nombre} {self.apellido} ({self.rut})"
+        return self.formato_str(self.nombre, self.apellido, self.rut)
 
 
 class Medico(models.Model):
@@ -66,13 +97,26 @@ class Medico(models.Model):
     especialidad = models.ForeignKey(Especialidad, on_delete=models.PROTECT)
     telefono = models.CharField(max_length=15)
     email = models.EmailField(unique=True)
+    duracion_consulta = models.PositiveSmallIntegerField(
+        default=30, validators=[MinValueValidator(5)], help_text="Duración de cada cita, en minutos."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['apellido', 'nombre']
         verbose_name_plural = "Médicos"
 
+    # Relaciones que lee __str__ (usadas por el planificador de consultas).
+    relaciones_str = ('especialidad',)
+    # Columnas que lee __str__ y su formato (usados por la lectura rápida con values_list()).
+    columnas_str = ('nombre', 'apellido', 'especialidad__nombre')
+
+    @staticmethod
+    def formato_str(nombre, apellido, especialidad):
+        return f"Dr(a). {nombre} {apellido} - {especialidad}"
+
     def __str__(self):
-        return f"Dr(a). {self.nombre} {self.apellido} - {self.especialidad.nombre}"
+        return self.formato_str(self.nombre, self.apellido, self.especialidad.nombre)
 
 
 class ConsultaMedica(models.Model):
@@ -88,20 +132,70 @@ class ConsultaMedica(models.Model):
         default='PENDIENTE',
         help_text="Estado de la cita: Pendiente, Confirmada, Realizada, Cancelada"
     )
+    # Vector de búsqueda de texto completo (diagnóstico + motivo, configuración 'spanish').
+    # Lo mantiene un trigger de PostgreSQL y tiene índice GIN (ver migración 0003).
+    busqueda = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-fecha_hora']
         verbose_name_plural = "Consultas Médicas"
+        indexes = [
+            # Soporta la paginación por cursor (orden natural + desempate por id).
+            models.Index(fields=['-fecha_hora', '-id'], name='consulta_fecha_id_idx'),
+            # Agenda de un médico en un rango de fechas.
+            models.Index(fields=['medico', 'fecha_hora'], name='consulta_medico_fecha_idx'),
+            # Historial de un paciente, más reciente primero.
+            models.Index(fields=['paciente', '-fecha_hora'], name='consulta_paciente_fecha_idx'),
+            # Citas abiertas (PENDIENTE/CONFIRMADA) desde hoy en adelante.
+            models.Index(
+                fields=['fecha_hora'], name='consulta_abiertas_fecha_idx',
+                condition=models.Q(estado__in=ESTADOS_ABIERTOS),
+            ),
+        ]
+
+    relaciones_str = ('paciente', 'medico__especialidad')
 
     def __str__(self):
         return f"Consulta de {self.paciente} con {self.medico} el {self.fecha_hora.date()}"
 
+    def save(self, *args, **kwargs):
+        # La verificación de choque de horario y el guardado se confirman juntos (ver api_vital/agenda.py).
+        from .agenda import verificar_disponibilidad
+        with transaction.atomic():
+            verificar_disponibilidad(self)
+            super().save(*args, **kwargs)
+
+
+class HorarioAtencion(models.Model):
+    '''Bloque semanal de atención de un médico (plantilla para calcular su agenda libre).'''
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='horarios')
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['medico_id', 'dia_semana', 'hora_inicio']
+        verbose_name_plural = "Horarios de Atención"
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(hora_fin__gt=models.F('hora_inicio')), name='horario_fin_despues_inicio',
+            ),
+        ]
+
+    relaciones_str = ('medico__especialidad',)
+
+    def __str__(self):
+        return f"{self.medico} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+
 
 # --- NUEVA ENTIDAD/TABLA PARA MEJORA ---
 class TipoTratamiento(models.Model):
     '''Nueva Entidad: Clasificación de los tratamientos (e.g., Farmacológico, Fisioterapia, Cirugía).'''
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Tipos de Tratamiento"
@@ -118,9 +212,15 @@ class Tratamiento(models.Model):
     descripcion = models.TextField()
     fecha_inicio = models.DateField()
     fecha_fin = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-fecha_inicio']
+        indexes = [
+            models.Index(fields=['-fecha_inicio', '-id'], name='tratamiento_fecha_id_idx'),
+        ]
+
+    relaciones_str = ('consulta__paciente',)
 
     def __str__(self):
         return f"Tratamiento: {self.nombre} ({self.consulta.paciente})"
@@ -132,7 +232,9 @@ class Medicamento(models.Model):
     principio_activo = models.CharField(max_length=100)
     concentracion = models.CharField(max_length=50)
     presentacion = models.CharField(max_length=50) # e.g., Comprimido, Jarabe, Inyectable
-    stock = models.IntegerField(default=0)
+    # Solo se descuenta con UPDATE condicional (ver api_vital/stock.py); nunca queda negativo.
+    stock = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['nombre_comercial']
@@ -146,9 +248,15 @@ class RecetaMedica(models.Model):
     consulta = models.OneToOneField(ConsultaMedica, on_delete=models.CASCADE)
     fecha_emision = models.DateField(auto_now_add=True)
     indicaciones_generales = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Recetas Médicas"
+        indexes = [
+            models.Index(fields=['-fecha_emision', '-id'], name='receta_fecha_id_idx'),
+        ]
+
+    relaciones_str = ('consulta__paciente',)
 
     def __str__(self):
         return f"Receta para {self.consulta.paciente} del {self.fecha_emision}"
@@ -161,10 +269,93 @@ class DetalleReceta(models.Model):
     dosis = models.CharField(max_length=100)
     frecuencia = models.CharField(max_length=100)
     duracion = models.CharField(max_length=100)
+    cantidad = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)]) # Unidades reservadas del stock
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('receta', 'medicamento')
         verbose_name_plural = "Detalles de Receta"
 
+    relaciones_str = ('medicamento',)
+
+    def __str__(self):
+        return f"{self.medicamento.nombre_comercial} - {self.dosis}"
+
+    def save(self, *args, **kwargs):
+        # La reserva de stock y el detalle se confirman juntos; la liberación al borrar
+        # (incluso en cascada) la hace un receptor post_delete (api_vital/signals.py).
+        from .stock import ajustar_reserva
+        with transaction.atomic():
+            ajustar_reserva(self)
+            super().save(*args, **kwargs)
+
+
+# --- RESÚMENES (mantenidos de forma incremental, ver api_vital/resumenes.py) ---
+class ResumenConsultaDiaria(models.Model):
+    '''Cantidad de consultas por día, especialidad del médico y estado.'''
+    fecha = models.DateField()
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.CASCADE)
+    estado = models.CharField(max_length=10, choices=ESTADO_CONSULTA_CHOICES)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-fecha', 'especialidad_id', 'estado']
+        verbose_name_plural = "Resúmenes de Consultas Diarias"
+        constraints = [
+            # También sirve de índice para las consultas por rango de fechas.
+            models.UniqueConstraint(fields=['fecha', 'especialidad', 'estado'], name='resumen_consulta_clave'),
+        ]
+
+    relaciones_str = ('especialidad',)
+
+    def __str__(self):
+        return f"{self.fecha} {self.especialidad.nombre} {self.estado}: {self.cantidad}"
+
+
+class ResumenTratamientoTipo(models.Model):
+    '''Cantidad de tratamientos por tipo de tratamiento.'''
+    tipo = models.OneToOneField(TipoTratamiento, on_delete=models.CASCADE, primary_key=True)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['tipo_id']
+        verbose_name_plural = "Resúmenes de Tratamientos por Tipo"
+
+    relaciones_str = ('tipo',)
+
+    def __str__(self):
+        return f"{self.tipo.nombre}: {self.cantidad}"
+
+
+# --- TABLAS INTERNAS ---
+class VersionTabla(models.Model):
+    '''Contador de cambios por tabla: alimenta los ETag/Last-Modified de la API (ver api_vital/conditional.py).'''
+    tabla = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    modificado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "Versiones de Tabla"
+
+    def __str__(self):
+        return f"{self.tabla} v{self.version}"
+
+class ConsultaLenta(models.Model):
+    '''Sentencia SQL que superó el umbral de lentitud (buffer circular, ver api_vital/consultas_lentas.py).'''
+    creada = models.DateTimeField(default=timezone.now)
+    duracion_ms = models.FloatField()
+    sql = models.TextField()
+    base_datos = models.CharField(max_length=50, default='default')
+    metodo = models.CharField(max_length=10, blank=True)
+    ruta = models.CharField(max_length=255, blank=True)
+    vista = models.CharField(max_length=150, blank=True, help_text="Nombre de la ruta resuelta.")
+    accion = models.CharField(max_length=100, blank=True, help_text="Acción del ViewSet (list, retrieve, buscar...).")
+    # Salida de EXPLAIN (ANALYZE, BUFFERS) en las sentencias muestreadas (solo PostgreSQL).
+    plan = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = "Consultas Lentas"
+
     def __str__(self):
-        return f"{self.medicamento.nombre_comercial} - {self.dosis}"
\ No newline at end of file
+        return f"{self.duracion_ms:.1f} ms {self.vista or self.ruta}"
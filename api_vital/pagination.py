@@ -0,0 +1,187 @@
+# api_vital/pagination.py
+
+'''Bloque de Comentarios:
+Módulo de Paginación para la API Salud Vital Ltda.
+Implementa paginación por cursor (keyset): el cursor guarda los valores de
+todas las columnas del orden (el orden natural del modelo más 'id' como
+desempate) y cada página se obtiene con un filtro WHERE sobre ellas, sin
+OFFSET: una página profunda cuesta lo mismo que la primera, aunque muchas
+filas compartan la misma fecha.
+El tamaño de página por defecto y su máximo se configuran por endpoint.
+Las páginas HTML (vistas 'gestion/' y admin) usan ConteoEstimadoPaginator,
+un Paginator de Django que no recorre la tabla entera para contar.
+'''
+
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Dirección (hacia atrás o no) y valores de las columnas del orden en la fila de referencia.
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+
+def _invertir(orden):
+    return orden[1:] if orden.startswith('-') else '-' + orden
+
+
+class KeysetPagination(CursorPagination):
+    '''Base de la paginación por cursor: tamaño acotado y ajustable con ?page_size=.
+    A diferencia de CursorPagination de DRF (que filtra solo por la primera columna del orden
+    y desempata con un OFFSET acotado), el cursor lleva el valor de cada columna del orden
+    y la página se filtra por la tupla completa. El orden siempre termina en 'id'.'''
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(campo.lstrip('-') in ('id', 'pk') for campo in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = tuple(map(_invertir, self.ordering)) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.filtro_posicion(queryset.model, ordering, self.cursor.position))
+
+        # Una fila extra indica si hay más filas en la dirección recorrida.
+        resultados = list(queryset[:self.page_size + 1])
+        self.page = resultados[:self.page_size]
+        hay_mas = len(resultados) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, self.cursor is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def filtro_posicion(self, modelo, ordering, posicion):
+        '''Filas posteriores a 'posicion' en 'ordering': (a, b) > (x, y) es a > x OR (a = x AND b > y).
+        Se agrega la cota a >= x sobre la primera columna para que el índice acote el recorrido.'''
+        valores = []
+        for campo, texto in zip(ordering, posicion):
+            nombre = campo.lstrip('-')
+            campo_modelo = modelo._meta.pk if nombre == 'pk' else modelo._meta.get_field(nombre)
+            try:
+                valores.append(campo_modelo.to_python(texto))
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        filtro, iguales = Q(), {}
+        for campo, valor in zip(ordering, valores):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            filtro |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        primero = ordering[0]
+        cota = {f"{primero.lstrip('-')}__{'lte' if primero.startswith('-') else 'gte'}": valores[0]}
+        return Q(**cota) & filtro
+
+    def posicion(self, fila):
+        '''Valores (como texto) de las columnas del orden en una fila: modelo, dict o tupla con nombre.'''
+        return [
+            str(fila[campo] if isinstance(fila, dict) else getattr(fila, campo))
+            for campo in (orden.lstrip('-') for orden in self.ordering)
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Página vacía hacia atrás: no hay filas antes del cursor, la siguiente es la primera.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.posicion(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(self.cursor.position, reverse=True)
+        return self.encode_cursor(self.posicion(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        posicion = tokens.get('p', [])
+        # El cursor debe traer un valor por columna del orden (otro ?ordering= lo invalida).
+        if len(posicion) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(reverse, posicion)
+
+    def encode_cursor(self, posicion, reverse):
+        tokens = {'p': posicion}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens, doseq=True).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class ConsultaMedicaPagination(KeysetPagination):
+    # Orden natural de ConsultaMedica (Meta.ordering) más 'id' como desempate.
+    ordering = ('-fecha_hora', '-id')
+
+
+class TratamientoPagination(KeysetPagination):
+    ordering = ('-fecha_inicio', '-id')
+
+
+class RecetaMedicaPagination(KeysetPagination):
+    ordering = ('-fecha_emision', '-id')
+
+
+def filas_estimadas(queryset):
+    '''Filas que el planificador de PostgreSQL estima para el queryset (EXPLAIN, sin ejecutarlo).'''
+    sql, params = queryset.values('pk').order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ConteoEstimadoPaginator(Paginator):
+    '''Paginator con total exacto hasta 'limite_exacto' filas y estimado por encima (solo PostgreSQL).
+    El conteo exacto es un COUNT sobre una subconsulta con LIMIT: su costo no crece con la tabla.
+    Si hay más filas, el total es la estimación del planificador y 'estimado' queda en True.'''
+    limite_exacto = 1000
+    estimado = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (not isinstance(queryset, QuerySet) or queryset.query.is_sliced
+                or connections[queryset.db].vendor != 'postgresql'):
+            return super().count
+        acotado = queryset.order_by()[:self.limite_exacto + 1].count()
+        if acotado <= self.limite_exacto:
+            return acotado
+        self.estimado = True
+        return max(acotado, filas_estimadas(queryset))
@@ -0,0 +1,44 @@
+# api_vital/parsers.py
+
+'''Bloque de Comentarios:
+Módulo de Parsers para la API Salud Vital Ltda. (registrados en REST_FRAMEWORK,
+elegidos por Content-Type).
+- ORJSONParser: JSON con orjson; rechaza NaN e Infinity como el JSONParser
+  de DRF en modo estricto.
+- MessagePackParser: cuerpos application/msgpack. Las fechas pueden enviarse
+  como texto ISO 8601 (igual que en JSON) o con el tipo timestamp de
+  MessagePack, que llega como datetime con zona UTC.
+Los renderers equivalentes están en api_vital/renderers.py.
+'''
+
+import codecs
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+
+class ORJSONParser(parsers.JSONParser):
+    '''JSON con orjson (el cuerpo debe estar en UTF-8; otra codificación declarada usa el JSONParser de DRF).'''
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        codificacion = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(codificacion).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackParser(parsers.BaseParser):
+    '''Cuerpos MessagePack (application/msgpack); los mapas deben tener claves de texto.'''
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -0,0 +1,225 @@
+# api_vital/query_planner.py
+
+'''Bloque de Comentarios:
+Módulo Planificador de Consultas (select_related / prefetch_related).
+Inspecciona los campos de un serializer (rutas 'source' con puntos, serializers
+anidados y campos que usan __str__ de un modelo relacionado) y calcula qué
+relaciones deben cargarse por adelantado para evitar el problema N+1.
+Las dependencias de __str__ se declaran en cada modelo con 'relaciones_str'.
+También calcula las columnas que el serializer lee: en las lecturas el resto
+se difiere con only() (un modelo leído por __str__ o por una propiedad se
+carga completo, porque no se sabe qué columnas usa).
+'''
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.pagination import CursorPagination
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+# Cache de planes por (serializer, campos, selección): el cálculo se hace una sola vez por proceso.
+_PLANES = {}
+
+
+class PlanConsulta:
+    '''Resultado del planificador: rutas para select_related y prefetch_related, y columnas para only().'''
+
+    def __init__(self, select=(), prefetch=(), solo=None):
+        self.select = tuple(sorted(set(select)))
+        self.solo = solo
+        # Un prefetch que ya está cubierto por otro más profundo no se repite.
+        prefetch = set(prefetch)
+        self.prefetch = tuple(sorted(
+            ruta for ruta in prefetch
+            if not any(otra.startswith(ruta + '__') for otra in prefetch)
+        ))
+
+    def aplicar(self, queryset):
+        '''Aplica el plan a un queryset (sin evaluarlo).'''
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset
+
+    def recortar(self, queryset, extra=()):
+        '''Difiere las columnas que el serializer no lee; 'extra' agrega las que necesita la vista.'''
+        if self.solo is None:
+            return queryset
+        return queryset.only(*self.solo, *extra)
+
+    def modelos(self, modelo):
+        '''Modelo raíz más los modelos relacionados que el plan carga (de los que depende la respuesta).'''
+        relacionados = set()
+        for ruta in self.select + self.prefetch:
+            actual = modelo
+            for nombre in ruta.split('__'):
+                actual = actual._meta.get_field(nombre).related_model
+            relacionados.add(actual)
+        return [modelo] + sorted(relacionados - {modelo}, key=lambda m: m._meta.label)
+
+    def __repr__(self):
+        return f'PlanConsulta(select={self.select!r}, prefetch={self.prefetch!r}, solo={self.solo!r})'
+
+
+class _Columnas:
+    '''Columnas que lee el serializer y rutas de los modelos que deben cargarse completos.'''
+
+    def __init__(self):
+        self.rutas, self.completas = set(), set()
+
+    def agregar(self, ruta, multiple):
+        # Las filas de un prefetch salen de otra consulta: only() no las recorta.
+        if not multiple:
+            self.rutas.add('__'.join(ruta))
+
+    def completa(self, ruta, multiple):
+        if not multiple:
+            self.completas.add('__'.join(ruta))
+
+    def solo(self):
+        '''Argumentos de only(), o None si el modelo raíz se lee completo.'''
+        if '' in self.completas:
+            return None
+        # Una columna bajo un modelo completo lo recortaría: se omite.
+        return tuple(sorted(
+            ruta for ruta in self.rutas | self.completas
+            if not any(ruta.startswith(completa + '__') for completa in self.completas)
+        ))
+
+
+def _registrar(ruta, multiple, select, prefetch):
+    if ruta:
+        (prefetch if multiple else select).add('__'.join(ruta))
+
+
+def _registrar_str(modelo, ruta, multiple, select, prefetch, columnas):
+    '''Agrega las relaciones que lee el __str__ del modelo bajo la ruta indicada.'''
+    columnas.completa(ruta, multiple)
+    for dependencia in getattr(modelo, 'relaciones_str', ()):
+        actual, ruta_actual, multiple_actual = modelo, list(ruta), multiple
+        for nombre in dependencia.split('__'):
+            relacion = actual._meta.get_field(nombre)
+            actual = relacion.related_model
+            ruta_actual.append(nombre)
+            multiple_actual = multiple_actual or relacion.many_to_many or relacion.one_to_many
+            columnas.completa(ruta_actual, multiple_actual)
+        _registrar(ruta_actual, multiple_actual, select, prefetch)
+
+
+def _recorrer(modelo, serializer, ruta, multiple, select, prefetch, columnas):
+    '''Recorre los campos del serializer acumulando las rutas de relaciones y las columnas necesarias.'''
+    for campo in serializer.fields.values():
+        if campo.write_only:
+            continue
+
+        if isinstance(campo, serializers.ListSerializer):
+            campo_base = campo.child
+        elif isinstance(campo, ManyRelatedField):
+            campo_base = campo.child_relation
+        else:
+            campo_base = campo
+
+        if campo.source == '*':
+            if isinstance(campo_base, serializers.BaseSerializer):
+                _recorrer(modelo, campo_base, ruta, multiple, select, prefetch, columnas)
+            else:
+                # SerializerMethodField y similares reciben el objeto entero.
+                columnas.completa(ruta, multiple)
+            continue
+
+        modelo_actual, ruta_actual, multiple_actual = modelo, list(ruta), multiple
+        atributos = campo.source_attrs
+        termina_en_modelo = True
+
+        for indice, atributo in enumerate(atributos):
+            ultimo = indice == len(atributos) - 1
+            try:
+                relacion = modelo_actual._meta.get_field(atributo)
+            except FieldDoesNotExist:
+                # '__str__' del modelo relacionado: cargar lo que ese __str__ necesita.
+                if atributo == '__str__':
+                    _registrar_str(modelo_actual, ruta_actual, multiple_actual, select, prefetch, columnas)
+                else:
+                    # Propiedad o método del modelo: puede leer cualquier columna.
+                    columnas.completa(ruta_actual, multiple_actual)
+                termina_en_modelo = False
+                break
+
+            if not relacion.is_relation:
+                columnas.agregar(ruta_actual + [atributo], multiple_actual)
+                termina_en_modelo = False
+                break
+
+            varios = relacion.many_to_many or relacion.one_to_many
+            # Una FK serializada solo como PK se lee desde la columna '<campo>_id'.
+            if (ultimo and not varios and isinstance(campo_base, RelatedField)
+                    and campo_base.use_pk_only_optimization()):
+                columnas.agregar(ruta_actual + [atributo], multiple_actual)
+                termina_en_modelo = False
+                break
+
+            ruta_actual.append(atributo)
+            multiple_actual = multiple_actual or varios
+            modelo_actual = relacion.related_model
+            _registrar(ruta_actual, multiple_actual, select, prefetch)
+            # La FK de un select_related no puede diferirse.
+            columnas.agregar(ruta_actual, multiple_actual)
+
+        if not termina_en_modelo:
+            continue
+
+        if isinstance(campo_base, serializers.BaseSerializer):
+            _recorrer(modelo_actual, campo_base, ruta_actual, multiple_actual, select, prefetch, columnas)
+        elif isinstance(campo_base, RelatedField) and not campo_base.use_pk_only_optimization():
+            # StringRelatedField y similares representan el objeto con __str__.
+            _registrar_str(modelo_actual, ruta_actual, multiple_actual, select, prefetch, columnas)
+        elif not isinstance(campo_base, RelatedField):
+            # Un campo que recibe el objeto relacionado entero (p. ej. ReadOnlyField(source='medico')).
+            columnas.completa(ruta_actual, multiple_actual)
+
+
+def planificar(serializer):
+    '''Calcula (y guarda en cache) el plan de relaciones para una instancia de serializer.'''
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    # Con CamposDinamicosMixin (api_vital/campos.py) los campos dependen solo de la clase y de la selección
+    # de ?fields= / ?expand=: la clave no necesita construirlos (se construyen solo al calcular el plan).
+    seleccion = getattr(serializer, 'seleccion', None)
+    if seleccion is not None:
+        clave = (type(serializer), seleccion)
+    else:
+        clave = (type(serializer), tuple(serializer.fields))
+    plan = _PLANES.get(clave)
+    if plan is None:
+        select, prefetch, columnas = set(), set(), _Columnas()
+        _recorrer(serializer.Meta.model, serializer, [], False, select, prefetch, columnas)
+        plan = _PLANES[clave] = PlanConsulta(select, prefetch, columnas.solo())
+    return plan
+
+
+class QueryPlannerMixin:
+    '''Mixin para ViewSets: aplica automáticamente el plan del serializer al queryset.
+    En las lecturas difiere además las columnas que el serializer no lee.'''
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        plan = planificar(self.get_serializer())
+        queryset = plan.aplicar(queryset)
+        request = getattr(self, 'request', None)
+        if request is not None and request.method in SAFE_METHODS:
+            queryset = plan.recortar(queryset, self.columnas_requeridas())
+        return queryset
+
+    def columnas_requeridas(self):
+        '''Columnas que la vista lee además de las del serializer: el orden de la paginación por cursor.'''
+        if not isinstance(self.paginator, CursorPagination):
+            return ()
+        orden = self.paginator.ordering
+        campos = [orden] if isinstance(orden, str) else list(orden)
+        # Con OrderingFilter, el cursor usa el orden pedido con ?ordering=.
+        ordenables = getattr(self, 'ordering_fields', None)
+        if isinstance(ordenables, (list, tuple)):
+            campos += ordenables
+        return tuple(campo.lstrip('-') for campo in campos)
@@ -0,0 +1,107 @@
+# api_vital/renderers.py
+
+'''Bloque de Comentarios:
+Módulo de Renderers para la API Salud Vital Ltda.
+- Respuestas de la API (REST_FRAMEWORK en settings, elegidos por Accept):
+  ORJSONRenderer produce los mismos bytes que el JSONRenderer de DRF con
+  orjson, varias veces más rápido; MessagePackRenderer es la alternativa
+  binaria compacta (application/msgpack). En ambos las fechas, horas y
+  decimales tienen la misma representación que en JSON (encoder de DRF).
+- Exportación masiva: NDJSON (un objeto JSON por línea) y CSV. Ambos pueden
+  producir filas una a una desde un generador, lo que permite transmitir
+  (streaming) exportaciones grandes con memoria constante.
+Los parsers equivalentes están en api_vital/parsers.py.
+Medición: 'manage.py benchmark_renderers'.
+'''
+
+import csv
+import json
+
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+# Tipos que orjson y msgpack no serializan solos (Decimal, textos traducibles, timedelta...): como en DRF.
+# En msgpack también las fechas y horas, para que lleguen como el mismo texto ISO 8601 que en JSON.
+_codificar = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    '''JSON con orjson. Con indentación (API navegable, Accept: application/json; indent=4)
+    o con UNICODE_JSON / COMPACT_JSON desactivados usa el JSONRenderer de DRF.'''
+    # 'Z' para UTC y claves no textuales convertidas a texto, como hace DRF con json.dumps.
+    opciones = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        contenido = orjson.dumps(data, default=_codificar, option=self.opciones)
+        # Como JSONRenderer: U+2028 y U+2029 escapados, para que el JSON sea válido también en JavaScript.
+        if b'\xe2\x80\xa8' in contenido or b'\xe2\x80\xa9' in contenido:
+            contenido = contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return contenido
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    '''MessagePack (binario): los mismos datos que el JSON de la respuesta, en menos bytes.'''
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_codificar, use_bin_type=True)
+
+
+class _Eco:
+    '''Pseudo-buffer para csv.writer: devuelve la línea escrita en vez de guardarla.'''
+
+    def write(self, valor):
+        return valor
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    '''Newline Delimited JSON: una fila (dict) por línea.'''
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def linea(self, fila):
+        return json.dumps(fila, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def filas(self, campos, filas):
+        '''Generador de líneas NDJSON a partir de un iterable de dicts.'''
+        for fila in filas:
+            yield self.linea(fila)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = data if isinstance(data, list) else [data]
+        return ''.join(self.linea(fila) for fila in filas).encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    '''CSV con encabezado; las columnas son los campos del serializer.'''
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def filas(self, campos, filas):
+        '''Generador de líneas CSV (encabezado incluido) a partir de un iterable de dicts.'''
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(campos)
+        for fila in filas:
+            yield escritor.writerow(['' if fila.get(campo) is None else fila[campo] for campo in campos])
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = data if isinstance(data, list) else [data]
+        campos = list(filas[0]) if filas else []
+        return ''.join(self.filas(campos, filas)).encode(self.charset)
@@ -0,0 +1,140 @@
+# api_vital/replicas.py
+
+'''Bloque de Comentarios:
+Módulo de Réplicas de Lectura para la API Salud Vital Ltda.
+Las réplicas son alias adicionales de DATABASES listados en REPLICAS_LECTURA
+(settings; DB_REPLICAS las agrega desde el entorno). Sin réplicas no cambia nada.
+- ReplicasMiddleware marca las solicitudes GET / HEAD / OPTIONS dirigidas a
+  un ViewSet o ListView de api_vital: sus lecturas de modelos de api_vital van
+  a una réplica elegida en ronda (una réplica repetida en la lista recibe
+  proporcionalmente más lecturas). El resto (escrituras, formularios de
+  edición, sesiones y usuarios) usa la primaria ('default').
+- Leer lo propio: una solicitud que escribe lee de la primaria desde ese
+  momento, y su respuesta fija la cookie 'lectura_primaria' durante
+  REPLICAS_PIN_SEGUNDOS, de modo que las siguientes solicitudes del mismo
+  cliente no lean una réplica atrasada. Con la primaria dentro de una
+  transacción (atomic, ATOMIC_REQUESTS) también se lee de ella.
+- Un ViewSet o vista con 'usar_replica = False' lee siempre de la primaria (las
+  respuestas en cache no deben guardarse desde una réplica atrasada).
+'''
+
+import itertools
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.views.generic import ListView
+from rest_framework.viewsets import ViewSetMixin
+
+COOKIE_PIN = 'lectura_primaria'
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+# Estado de la solicitud en curso. Es un objeto mutable: sync_to_async copia el contexto,
+# pero las copias comparten el mismo objeto y ven la marca de escritura.
+_solicitud = ContextVar('replicas_solicitud', default=None)
+_turno = itertools.count()
+
+
+def replicas():
+    return getattr(settings, 'REPLICAS_LECTURA', [])
+
+
+def elegir_replica():
+    '''Siguiente réplica en ronda (None si no hay réplicas).'''
+    disponibles = replicas()
+    if not disponibles:
+        return None
+    return disponibles[next(_turno) % len(disponibles)]
+
+
+class _EstadoSolicitud:
+    __slots__ = ('replica', 'escribio')
+
+    def __init__(self):
+        self.replica, self.escribio = None, False
+
+
+class RouterReplicas:
+    '''Router de base de datos: lecturas de api_vital a la réplica de la solicitud; escrituras a la primaria.'''
+
+    def db_for_read(self, model, **hints):
+        estado = _solicitud.get()
+        if (estado is None or estado.replica is None or estado.escribio
+                or model._meta.app_label != 'api_vital' or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return estado.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'api_vital':
+            return None
+        estado = _solicitud.get()
+        if estado is not None:
+            estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos.
+        bases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+
+def _lee_de_replica(vista):
+    clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+    return (
+        clase is not None and clase.__module__.startswith('api_vital.')
+        and issubclass(clase, (ViewSetMixin, ListView)) and getattr(clase, 'usar_replica', True)
+    )
+
+
+class ReplicasMiddleware:
+    '''Activa el router de réplicas en las lecturas de la API y de los listados de gestión (ver RouterReplicas).'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado = _EstadoSolicitud()
+        token = _solicitud.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _solicitud.reset(token)
+        return self._fijar_pin(estado, response)
+
+    async def __acall__(self, request):
+        estado = _EstadoSolicitud()
+        token = _solicitud.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _solicitud.reset(token)
+        return self._fijar_pin(estado, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._elegir(request, view_func)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # Bajo ASGI, un hook síncrono costaría un salto a otro hilo por solicitud.
+        self._elegir(request, view_func)
+
+    def _elegir(self, request, view_func):
+        estado = _solicitud.get()
+        if (estado is not None and request.method in METODOS_SEGUROS
+                and COOKIE_PIN not in request.COOKIES and _lee_de_replica(view_func)):
+            estado.replica = elegir_replica()
+
+    def _fijar_pin(self, estado, response):
+        if estado.escribio and replicas():
+            segundos = getattr(settings, 'REPLICAS_PIN_SEGUNDOS', 5)
+            response.set_cookie(COOKIE_PIN, '1', max_age=segundos, httponly=True, samesite='Lax')
+        return response
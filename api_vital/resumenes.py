@@ -0,0 +1,111 @@
+# api_vital/resumenes.py
+
+'''Bloque de Comentarios:
+Módulo de Resúmenes (tablas de agregados) para los tableros de gestión.
+- ResumenConsultaDiaria: consultas por día, especialidad del médico y estado.
+- ResumenTratamientoTipo: tratamientos por tipo.
+Se mantienen de forma incremental desde las señales (api_vital/signals.py): cada
+alta, cambio (p. ej. PENDIENTE -> REALIZADA, otra fecha u otro médico) o baja
+suma o resta 1 en la fila de su clave con un UPDATE atómico (F('cantidad') + n),
+así leer las estadísticas no depende del tamaño del historial.
+Las escrituras que no emiten señales (bulk_create, QuerySet.update, loaddata)
+no se reflejan: después de usarlas se ejecuta 'manage.py reconstruir_resumenes'.
+La carga masiva de médicos (POST medicos/bulk/) sí traslada sus consultas al
+cambiar la especialidad (MedicoViewSet.despues_de_bulk).
+'''
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .conditional import incrementar_version
+from .models import ConsultaMedica, Tratamiento, ResumenConsultaDiaria, ResumenTratamientoTipo
+
+
+def _sumar(modelo, delta, **clave):
+    if not delta:
+        return
+    if not modelo.objects.filter(**clave).update(cantidad=F('cantidad') + delta):
+        try:
+            with transaction.atomic():
+                modelo.objects.create(cantidad=delta, **clave)
+        except IntegrityError:
+            # Otra transacción creó la fila al mismo tiempo.
+            modelo.objects.filter(**clave).update(cantidad=F('cantidad') + delta)
+    # QuerySet.update no emite post_save: se versiona la tabla para los ETag.
+    incrementar_version(modelo)
+
+
+def clave_consulta(fecha_hora, especialidad_id, estado):
+    '''Clave del resumen diario de una consulta (el día se toma en la zona horaria local).'''
+    return timezone.localtime(fecha_hora).date(), especialidad_id, estado
+
+
+def sumar_consulta(clave, delta):
+    fecha, especialidad_id, estado = clave
+    _sumar(ResumenConsultaDiaria, delta, fecha=fecha, especialidad_id=especialidad_id, estado=estado)
+
+
+def mover_consulta(anterior, nueva):
+    '''Traslada una consulta de la clave 'anterior' a la 'nueva' (cualquiera puede ser None).'''
+    if anterior == nueva:
+        return
+    if anterior is not None:
+        sumar_consulta(anterior, -1)
+    if nueva is not None:
+        sumar_consulta(nueva, 1)
+
+
+def mover_especialidad(medico_id, anterior, nueva):
+    '''El médico cambió de especialidad: sus consultas pasan a contar en la nueva.'''
+    filas = (
+        ConsultaMedica.objects.filter(medico_id=medico_id)
+        .annotate(fecha=TruncDate('fecha_hora')).values('fecha', 'estado').annotate(total=Count('id'))
+    )
+    for fila in filas:
+        _sumar(ResumenConsultaDiaria, -fila['total'], fecha=fila['fecha'], especialidad_id=anterior, estado=fila['estado'])
+        _sumar(ResumenConsultaDiaria, fila['total'], fecha=fila['fecha'], especialidad_id=nueva, estado=fila['estado'])
+
+
+def mover_tratamiento(tipo_anterior, tipo_nuevo):
+    '''Traslada un tratamiento entre tipos (None para altas y bajas).'''
+    if tipo_anterior == tipo_nuevo:
+        return
+    if tipo_anterior is not None:
+        _sumar(ResumenTratamientoTipo, -1, tipo_id=tipo_anterior)
+    if tipo_nuevo is not None:
+        _sumar(ResumenTratamientoTipo, 1, tipo_id=tipo_nuevo)
+
+
+def reconstruir_resumenes():
+    '''Recalcula ambos resúmenes desde cero con un GROUP BY sobre las tablas completas.
+
+    Las escrituras concurrentes durante la reconstrucción pueden perderse: conviene
+    ejecutarla con poca actividad. Devuelve (filas de consultas, filas de tratamientos).
+    '''
+    with transaction.atomic():
+        return _reconstruir()
+
+
+def _reconstruir():
+    consultas = [
+        ResumenConsultaDiaria(
+            fecha=fila['fecha'], especialidad_id=fila['medico__especialidad'], estado=fila['estado'],
+            cantidad=fila['total'],
+        )
+        for fila in ConsultaMedica.objects.order_by()
+        .annotate(fecha=TruncDate('fecha_hora')).values('fecha', 'medico__especialidad', 'estado')
+        .annotate(total=Count('id'))
+    ]
+    tratamientos = [
+        ResumenTratamientoTipo(tipo_id=fila['tipo'], cantidad=fila['total'])
+        for fila in Tratamiento.objects.order_by().values('tipo').annotate(total=Count('id'))
+    ]
+    ResumenConsultaDiaria.objects.all().delete()
+    ResumenTratamientoTipo.objects.all().delete()
+    ResumenConsultaDiaria.objects.bulk_create(consultas, batch_size=1000)
+    ResumenTratamientoTipo.objects.bulk_create(tratamientos)
+    incrementar_version(ResumenConsultaDiaria)
+    incrementar_version(ResumenTratamientoTipo)
+    return len(consultas), len(tratamientos)
@@ -0,0 +1,114 @@
+# api_vital/search.py
+
+'''Bloque de Comentarios:
+Módulo de Búsqueda para la API Salud Vital Ltda.
+- Búsqueda de texto completo en las notas clínicas de ConsultaMedica
+  (diagnóstico y motivo de consulta) sobre la columna 'busqueda' (tsvector con
+  configuración 'spanish' e índice GIN), con resultados ordenados por relevancia.
+- Búsqueda difusa (tolerante a errores de tipeo) de pacientes y médicos por
+  nombre, apellido o RUT (y de medicamentos en el autocompletado de gestión)
+  con índices GIN de pg_trgm, ordenada por similitud.
+En motores sin estas capacidades se usa un respaldo con icontains sin ranking.
+'''
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q, Value, FloatField
+from django.db.models.functions import Greatest
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+# Configuración de text search de PostgreSQL (las notas clínicas están en español).
+CONFIG_TEXTO = 'spanish'
+
+
+def buscar_consultas(queryset, texto):
+    '''Filtra las consultas que coinciden con 'texto' y las ordena por relevancia (anotada como 'relevancia').'''
+    if connection.vendor == 'postgresql':
+        # websearch: admite "frases", OR y -exclusiones como un buscador web.
+        consulta = SearchQuery(texto, config=CONFIG_TEXTO, search_type='websearch')
+        return queryset.filter(busqueda=consulta).annotate(
+            relevancia=SearchRank(F('busqueda'), consulta),
+        ).order_by('-relevancia', '-fecha_hora', '-id')
+
+    filtro = Q()
+    for palabra in texto.split():
+        filtro &= Q(diagnostico__icontains=palabra) | Q(motivo_consulta__icontains=palabra)
+    return queryset.filter(filtro).annotate(
+        relevancia=Value(0.0, output_field=FloatField()),
+    ).order_by('-fecha_hora', '-id')
+
+
+def leer_limite(request, defecto=20, maximo=100):
+    '''Lee ?limite= de la solicitud, acotado a [1, maximo].'''
+    try:
+        limite = int(request.query_params.get('limite', defecto))
+    except (TypeError, ValueError):
+        limite = defecto
+    return max(1, min(limite, maximo))
+
+
+# --- Búsqueda difusa con trigramas (pg_trgm) ---
+
+_PG_TRGM = {}
+
+
+def trigramas_disponibles():
+    '''Indica si la extensión pg_trgm está instalada en la base de datos (se consulta una vez por proceso).'''
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _PG_TRGM:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _PG_TRGM[connection.alias] = cursor.fetchone() is not None
+    return _PG_TRGM[connection.alias]
+
+
+def buscar_similares(queryset, texto, campos_similitud, campos_contiene=()):
+    '''Filtra por similitud de palabras (operador %> de pg_trgm) y ordena por la mayor similitud (anotada como 'similitud').
+
+    'campos_contiene' se comparan con LIKE '%texto%' (útil para el RUT), también acelerado por el índice trigram.
+    '''
+    filtro = Q()
+    if trigramas_disponibles():
+        for campo in campos_similitud:
+            filtro |= Q(**{f'{campo}__trigram_word_similar': texto})
+        for campo in campos_contiene:
+            filtro |= Q(**{f'{campo}__contains': texto})
+        similitudes = [TrigramWordSimilarity(texto, campo) for campo in campos_similitud]
+        similitud = Greatest(*similitudes) if len(similitudes) > 1 else similitudes[0]
+        return queryset.filter(filtro).annotate(similitud=similitud).order_by('-similitud', 'pk')
+
+    for campo in (*campos_similitud, *campos_contiene):
+        filtro |= Q(**{f'{campo}__icontains': texto})
+    return queryset.filter(filtro).annotate(similitud=Value(0.0, output_field=FloatField()))
+
+
+def buscar_palabras(queryset, texto, campos):
+    '''Filtra las filas en que cada palabra de 'texto' aparece (icontains) en alguno de los 'campos'.
+
+    En PostgreSQL los índices trigram aceleran estos LIKE '%palabra%' (no hay orden por similitud).
+    '''
+    for palabra in texto.split():
+        queryset = queryset.filter(Q.create([(f'{campo}__icontains', palabra) for campo in campos], connector=Q.OR))
+    return queryset
+
+
+class TrigramSearchMixin:
+    '''Mixin para ViewSets: GET <recurso>/buscar/?q=&limite= con búsqueda difusa para autocompletar.'''
+    trigram_fields = ()
+    trigram_contains_fields = ()
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        '''Búsqueda tolerante a errores de tipeo (?q=), ordenada por similitud. ?limite= (máx. 50).'''
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({'detail': "Debe indicar el parámetro 'q'."}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = buscar_similares(self.get_queryset(), texto, self.trigram_fields, self.trigram_contains_fields)
+        objetos = list(queryset[:leer_limite(request, defecto=10, maximo=50)])
+        datos = self.get_serializer(objetos, many=True).data
+        for objeto, fila in zip(objetos, datos):
+            fila['similitud'] = objeto.similitud
+        return Response({'results': datos})
@@ -4,80 +4,206 @@
 Módulo de Serializers para la API Salud Vital Ltda.
 Define la forma en que los datos de los modelos son serializados (convertidos a JSON)
 y deserializados (convertidos a objetos Python) para la comunicación con el cliente.
+Los serializers del CRUD aceptan ?fields=, ?omit= y ?expand= en las lecturas
+(CamposDinamicosMixin, api_vital/campos.py).
 '''
 
 from rest_framework import serializers
 from .models import (
     Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento,
-    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento, HorarioAtencion,
+    ResumenConsultaDiaria, ResumenTratamientoTipo, ConsultaLenta
 )
+from .agenda import HorarioOcupado
+from .campos import CamposDinamicosMixin
+from .stock import StockInsuficiente
 
 # ----------------- ENTIDADES INDEPENDIENTES -----------------
 
-class EspecialidadSerializer(serializers.ModelSerializer):
+class EspecialidadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Especialidad
         fields = '__all__' # CRUD completo
 
-class TipoTratamientoSerializer(serializers.ModelSerializer):
+class TipoTratamientoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Serializer para la nueva tabla de mejora
     class Meta:
         model = TipoTratamiento
         fields = '__all__'
 
-class PacienteSerializer(serializers.ModelSerializer):
+class PacienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # El campo 'sexo' utilizará automáticamente los CHOICES definidos en el modelo.
     class Meta:
         model = Paciente
         fields = '__all__'
 
-class MedicoSerializer(serializers.ModelSerializer):
+class MedicoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Muestra el nombre de la especialidad en la lista/detalle
     especialidad_nombre = serializers.ReadOnlyField(source='especialidad.nombre')
+    expandibles = {'especialidad': EspecialidadSerializer}
     
     class Meta:
         model = Medico
         fields = '__all__'
         read_only_fields = ['especialidad_nombre'] # Para evitar que se pueda modificar desde aquí
 
-class MedicamentoSerializer(serializers.ModelSerializer):
+class HorarioAtencionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # Bloque semanal de atención; no puede superponerse con otro del mismo médico y día.
+    medico_nombre = serializers.ReadOnlyField(source='medico.__str__')
+    expandibles = {'medico': MedicoSerializer}
+
+    class Meta:
+        model = HorarioAtencion
+        fields = '__all__'
+        read_only_fields = ['medico_nombre']
+
+    def validate(self, attrs):
+        medico = attrs.get('medico', getattr(self.instance, 'medico', None))
+        dia = attrs.get('dia_semana', getattr(self.instance, 'dia_semana', None))
+        inicio = attrs.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        fin = attrs.get('hora_fin', getattr(self.instance, 'hora_fin', None))
+        if fin <= inicio:
+            raise serializers.ValidationError({'hora_fin': ['Debe ser posterior a hora_inicio.']})
+        superpuestos = HorarioAtencion.objects.filter(
+            medico=medico, dia_semana=dia, hora_inicio__lt=fin, hora_fin__gt=inicio,
+        )
+        if self.instance is not None:
+            superpuestos = superpuestos.exclude(pk=self.instance.pk)
+        if superpuestos.exists():
+            raise serializers.ValidationError('Se superpone con otro horario del médico en el mismo día.')
+        return attrs
+
+class MedicamentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Medicamento
         fields = '__all__'
 
+    def update(self, instance, validated_data):
+        # El stock inicial se fija al crear; después solo cambia con UPDATE ... SET stock = stock ± n
+        # (reservas y ajustar-stock, api_vital/stock.py): escribirlo con PUT/PATCH pisaría las reservas concurrentes.
+        validated_data.pop('stock', None)
+        return super().update(instance, validated_data)
+
+
+class AjusteStockSerializer(serializers.Serializer):
+    '''Cuerpo de POST medicamentos/<id>/ajustar-stock/.'''
+    delta = serializers.IntegerField()
+
 
 # ----------------- ENTIDADES DEPENDIENTES -----------------
 
-class RecetaMedicaSerializer(serializers.ModelSerializer):
+class ConsultaMedicaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # Muestra los nombres del paciente y médico
+    paciente_nombre = serializers.ReadOnlyField(source='paciente.__str__')
+    medico_nombre = serializers.ReadOnlyField(source='medico.__str__')
+    expandibles = {'paciente': PacienteSerializer, 'medico': MedicoSerializer}
+    
+    class Meta:
+        model = ConsultaMedica
+        exclude = ['busqueda'] # Vector de búsqueda interno (tsvector), no se expone
+        read_only_fields = ['paciente_nombre', 'medico_nombre']
+
+    def save(self, **kwargs):
+        # Guardar la consulta rechaza choques con otras citas del médico (api_vital/agenda.py).
+        try:
+            return super().save(**kwargs)
+        except HorarioOcupado as error:
+            raise serializers.ValidationError({'fecha_hora': [str(error)]})
+
+class RecetaMedicaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Se utiliza OneToOneField, por lo que se serializa la consulta
+    expandibles = {'consulta': ConsultaMedicaSerializer}
+
     class Meta:
         model = RecetaMedica
         fields = '__all__'
 
-class DetalleRecetaSerializer(serializers.ModelSerializer):
+class DetalleRecetaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Mostrar el nombre del medicamento en lugar del ID
     medicamento_nombre = serializers.ReadOnlyField(source='medicamento.nombre_comercial')
+    expandibles = {'receta': RecetaMedicaSerializer, 'medicamento': MedicamentoSerializer}
     
     class Meta:
         model = DetalleReceta
         fields = '__all__'
         read_only_fields = ['medicamento_nombre']
 
-class TratamientoSerializer(serializers.ModelSerializer):
+    def save(self, **kwargs):
+        # Guardar el detalle reserva stock del medicamento (api_vital/stock.py).
+        try:
+            return super().save(**kwargs)
+        except StockInsuficiente as error:
+            raise serializers.ValidationError({'cantidad': [str(error)]})
+
+class TratamientoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Muestra el nombre del tipo de tratamiento
     tipo_nombre = serializers.ReadOnlyField(source='tipo.nombre')
+    expandibles = {'consulta': ConsultaMedicaSerializer, 'tipo': TipoTratamientoSerializer}
     
     class Meta:
         model = Tratamiento
         fields = '__all__'
         read_only_fields = ['tipo_nombre']
 
-class ConsultaMedicaSerializer(serializers.ModelSerializer):
-    # Muestra los nombres del paciente y médico
-    paciente_nombre = serializers.ReadOnlyField(source='paciente.__str__')
+
+# ----------------- HISTORIAL DEL PACIENTE (TIMELINE) -----------------
+# Representaciones anidadas de solo lectura para GET pacientes/<id>/timeline/.
+# Las relaciones se cargan con Prefetch en la vista: aquí no se consulta la base de datos.
+
+class DetalleRecetaTimelineSerializer(serializers.ModelSerializer):
+    medicamento_nombre = serializers.ReadOnlyField(source='medicamento.nombre_comercial')
+
+    class Meta:
+        model = DetalleReceta
+        fields = ['id', 'medicamento', 'medicamento_nombre', 'cantidad', 'dosis', 'frecuencia', 'duracion']
+
+class RecetaTimelineSerializer(serializers.ModelSerializer):
+    detalles = DetalleRecetaTimelineSerializer(source='detallereceta_set', many=True, read_only=True)
+
+    class Meta:
+        model = RecetaMedica
+        fields = ['id', 'fecha_emision', 'indicaciones_generales', 'detalles']
+
+class TratamientoTimelineSerializer(serializers.ModelSerializer):
+    tipo_nombre = serializers.ReadOnlyField(source='tipo.nombre')
+
+    class Meta:
+        model = Tratamiento
+        fields = ['id', 'tipo', 'tipo_nombre', 'nombre', 'descripcion', 'fecha_inicio', 'fecha_fin']
+
+class ConsultaTimelineSerializer(serializers.ModelSerializer):
     medico_nombre = serializers.ReadOnlyField(source='medico.__str__')
-    
+    tratamientos = TratamientoTimelineSerializer(source='tratamiento_set', many=True, read_only=True)
+    # Relación uno a uno inversa: null si la consulta no tiene receta.
+    receta = RecetaTimelineSerializer(source='recetamedica', read_only=True, allow_null=True)
+
     class Meta:
         model = ConsultaMedica
+        fields = [
+            'id', 'fecha_hora', 'estado', 'motivo_consulta', 'diagnostico',
+            'medico', 'medico_nombre', 'tratamientos', 'receta',
+        ]
+
+
+# ----------------- ESTADÍSTICAS (RESÚMENES, SOLO LECTURA) -----------------
+
+class ResumenConsultaDiariaSerializer(serializers.ModelSerializer):
+    especialidad_nombre = serializers.ReadOnlyField(source='especialidad.nombre')
+
+    class Meta:
+        model = ResumenConsultaDiaria
+        fields = ['fecha', 'especialidad', 'especialidad_nombre', 'estado', 'cantidad']
+
+class ResumenTratamientoTipoSerializer(serializers.ModelSerializer):
+    tipo_nombre = serializers.ReadOnlyField(source='tipo.nombre')
+
+    class Meta:
+        model = ResumenTratamientoTipo
+        fields = ['tipo', 'tipo_nombre', 'cantidad']
+
+# ----------------- DIAGNÓSTICO (SOLO STAFF) -----------------
+
+class ConsultaLentaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ConsultaLenta
         fields = '__all__'
-        read_only_fields = ['paciente_nombre', 'medico_nombre']
\ No newline at end of file
@@ -0,0 +1,110 @@
+# api_vital/signals.py
+
+'''Bloque de Comentarios:
+Módulo de Señales (signals) de la API Salud Vital Ltda.
+Conecta los eventos post_save / post_delete de los modelos con la
+invalidación de las respuestas guardadas en cache (api_vital/cache.py) y con
+el contador de versión de la tabla que alimenta los ETag (api_vital/conditional.py).
+Las escrituras masivas (bulk_create, QuerySet.update) no emiten estas
+señales; quien las use debe llamar a invalidar_modelo() e incrementar_version()
+explícitamente.
+Al borrar un DetalleReceta (también en cascada desde su receta) se devuelve
+al stock del medicamento la cantidad que tenía reservada (api_vital/stock.py).
+Las altas, cambios y bajas de consultas y tratamientos actualizan los resúmenes
+de estadísticas (api_vital/resumenes.py); pre_save recuerda la clave anterior.
+'''
+
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .cache import invalidar_modelo
+from .conditional import incrementar_version
+from .stock import liberar_stock
+from .resumenes import clave_consulta, mover_consulta, mover_especialidad, mover_tratamiento
+from .models import (
+    Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento,
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento, HorarioAtencion
+)
+
+MODELOS = (
+    Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento,
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento, HorarioAtencion,
+)
+
+
+def invalidar_cache(sender, **kwargs):
+    invalidar_modelo(sender)
+    incrementar_version(sender)
+
+
+for modelo in MODELOS:
+    post_save.connect(invalidar_cache, sender=modelo, dispatch_uid=f'cache-save-{modelo._meta.label_lower}')
+    post_delete.connect(invalidar_cache, sender=modelo, dispatch_uid=f'cache-delete-{modelo._meta.label_lower}')
+
+
+def liberar_stock_detalle(sender, instance, **kwargs):
+    # Se ejecuta dentro de la transacción del borrado (Collector.delete es atómico).
+    liberar_stock(instance.medicamento_id, instance.cantidad)
+
+
+post_delete.connect(liberar_stock_detalle, sender=DetalleReceta, dispatch_uid='stock-liberar-detalle')
+
+
+# --- Resúmenes de estadísticas ---
+# Las cargas de fixtures (raw=True) no se resumen: ver 'manage.py reconstruir_resumenes'.
+
+def recordar_consulta(sender, instance, raw=False, **kwargs):
+    instance._clave_resumen = None
+    if not raw and not instance._state.adding:
+        fila = ConsultaMedica.objects.filter(pk=instance.pk).values_list(
+            'fecha_hora', 'medico__especialidad_id', 'estado',
+        ).first()
+        instance._clave_resumen = clave_consulta(*fila) if fila else None
+
+
+def resumir_consulta(sender, instance, raw=False, **kwargs):
+    if not raw:
+        nueva = clave_consulta(instance.fecha_hora, instance.medico.especialidad_id, instance.estado)
+        mover_consulta(getattr(instance, '_clave_resumen', None), nueva)
+
+
+def descontar_consulta(sender, instance, **kwargs):
+    mover_consulta(clave_consulta(instance.fecha_hora, instance.medico.especialidad_id, instance.estado), None)
+
+
+def recordar_especialidad(sender, instance, raw=False, **kwargs):
+    instance._especialidad_anterior = None
+    if not raw and not instance._state.adding:
+        instance._especialidad_anterior = (
+            Medico.objects.filter(pk=instance.pk).values_list('especialidad_id', flat=True).first()
+        )
+
+
+def resumir_especialidad(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_especialidad_anterior', None)
+    if not raw and anterior is not None and anterior != instance.especialidad_id:
+        mover_especialidad(instance.pk, anterior, instance.especialidad_id)
+
+
+def recordar_tipo(sender, instance, raw=False, **kwargs):
+    instance._tipo_anterior = None
+    if not raw and not instance._state.adding:
+        instance._tipo_anterior = Tratamiento.objects.filter(pk=instance.pk).values_list('tipo_id', flat=True).first()
+
+
+def resumir_tratamiento(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mover_tratamiento(getattr(instance, '_tipo_anterior', None), instance.tipo_id)
+
+
+def descontar_tratamiento(sender, instance, **kwargs):
+    mover_tratamiento(instance.tipo_id, None)
+
+
+pre_save.connect(recordar_consulta, sender=ConsultaMedica, dispatch_uid='resumen-recordar-consulta')
+post_save.connect(resumir_consulta, sender=ConsultaMedica, dispatch_uid='resumen-consulta')
+post_delete.connect(descontar_consulta, sender=ConsultaMedica, dispatch_uid='resumen-descontar-consulta')
+pre_save.connect(recordar_especialidad, sender=Medico, dispatch_uid='resumen-recordar-especialidad')
+post_save.connect(resumir_especialidad, sender=Medico, dispatch_uid='resumen-especialidad')
+pre_save.connect(recordar_tipo, sender=Tratamiento, dispatch_uid='resumen-recordar-tipo')
+post_save.connect(resumir_tratamiento, sender=Tratamiento, dispatch_uid='resumen-tratamiento')
+post_delete.connect(descontar_tratamiento, sender=Tratamiento, dispatch_uid='resumen-descontar-tratamiento')
@@ -0,0 +1,51 @@
+// api_vital/static/api_vital/autocompletar.js
+// Autocompletado de los <select data-autocompletar="url"> (ver api_vital/autocompletar.py):
+// agrega un campo de búsqueda sobre el <select> y reemplaza sus opciones por los resultados de la url.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocompletar]').forEach(function (select) {
+        var buscador = document.createElement('input');
+        buscador.type = 'search';
+        buscador.className = 'form-control mb-1';
+        buscador.placeholder = 'Buscar (mínimo 2 caracteres)…';
+        buscador.autocomplete = 'off';
+        select.parentNode.insertBefore(buscador, select);
+
+        var espera = null;
+        var controlador = null;
+        buscador.addEventListener('input', function () {
+            clearTimeout(espera);
+            var texto = buscador.value.trim();
+            if (texto.length < 2) {
+                return;
+            }
+            // Una solicitud por pausa al escribir; la anterior se cancela.
+            espera = setTimeout(function () {
+                if (controlador) {
+                    controlador.abort();
+                }
+                controlador = new AbortController();
+                fetch(select.dataset.autocompletar + '?q=' + encodeURIComponent(texto), {signal: controlador.signal})
+                    .then(function (respuesta) { return respuesta.json(); })
+                    .then(function (datos) {
+                        var elegido = select.value;
+                        // Se conservan la opción vacía y la elegida.
+                        Array.from(select.options).forEach(function (opcion) {
+                            if (opcion.value && opcion.value !== elegido) {
+                                opcion.remove();
+                            }
+                        });
+                        datos.resultados.forEach(function (fila) {
+                            if (String(fila.id) !== elegido) {
+                                select.add(new Option(fila.texto, fila.id));
+                            }
+                        });
+                        select.size = Math.min(select.options.length, 8);
+                    })
+                    .catch(function () {});
+            }, 250);
+        });
+        select.addEventListener('change', function () {
+            select.size = 0;
+        });
+    });
+});
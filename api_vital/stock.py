@@ -0,0 +1,79 @@
+# api_vital/stock.py
+
+'''Bloque de Comentarios:
+Módulo de Reserva de Stock de Medicamentos para la API Salud Vital Ltda.
+Al emitir un DetalleReceta se descuenta su 'cantidad' del stock del
+medicamento con un UPDATE condicional (SET stock = stock - n WHERE stock >= n):
+la base de datos resuelve la concurrencia con el bloqueo de la fila afectada,
+sin bloqueos de tabla ni lecturas previas, de modo que no hay actualizaciones
+perdidas ni stock negativo. Si la fila no cumple la condición se lanza
+StockInsuficiente y la transacción del detalle se revierte.
+'''
+
+from django.db.models import F
+from django.db.models.functions import Now
+
+from .cache import invalidar_modelo
+from .conditional import incrementar_version
+from .models import Medicamento, DetalleReceta
+
+
+class StockInsuficiente(Exception):
+    '''El medicamento no tiene stock suficiente para la reserva solicitada.'''
+
+    def __init__(self, medicamento_id, cantidad):
+        self.medicamento_id = medicamento_id
+        self.cantidad = cantidad
+        super().__init__(f'Stock insuficiente del medicamento {medicamento_id} para reservar {cantidad} unidad(es).')
+
+
+def _stock_modificado():
+    # QuerySet.update no emite post_save: se invalida la cache y se versiona la tabla a mano.
+    invalidar_modelo(Medicamento)
+    incrementar_version(Medicamento)
+
+
+def reservar_stock(medicamento_id, cantidad):
+    '''Descuenta 'cantidad' del stock solo si alcanza; si no, lanza StockInsuficiente.'''
+    if cantidad <= 0:
+        return
+    actualizadas = Medicamento.objects.filter(pk=medicamento_id, stock__gte=cantidad).update(
+        stock=F('stock') - cantidad, updated_at=Now(),
+    )
+    if not actualizadas:
+        raise StockInsuficiente(medicamento_id, cantidad)
+    _stock_modificado()
+
+
+def liberar_stock(medicamento_id, cantidad):
+    '''Devuelve 'cantidad' unidades al stock del medicamento.'''
+    if cantidad <= 0:
+        return
+    Medicamento.objects.filter(pk=medicamento_id).update(stock=F('stock') + cantidad, updated_at=Now())
+    _stock_modificado()
+
+
+def ajustar_reserva(detalle):
+    '''Reserva (o libera) la diferencia entre el detalle a guardar y lo que ya tenía reservado.
+
+    Debe llamarse dentro de la transacción que guarda el detalle: la fila anterior se
+    bloquea (SELECT ... FOR UPDATE) para que dos ediciones del mismo detalle no se pisen.
+    '''
+    anterior = None
+    if not detalle._state.adding and detalle.pk is not None:
+        anterior = (
+            DetalleReceta.objects.select_for_update().filter(pk=detalle.pk)
+            .values_list('medicamento_id', 'cantidad').first()
+        )
+    if anterior is None:
+        reservar_stock(detalle.medicamento_id, detalle.cantidad)
+    elif anterior[0] == detalle.medicamento_id:
+        diferencia = detalle.cantidad - anterior[1]
+        if diferencia > 0:
+            reservar_stock(detalle.medicamento_id, diferencia)
+        else:
+            liberar_stock(detalle.medicamento_id, -diferencia)
+    else:
+        # Cambió el medicamento: se reserva el nuevo antes de devolver el anterior.
+        reservar_stock(detalle.medicamento_id, detalle.cantidad)
+        liberar_stock(*anterior)
@@ -5,10 +5,18 @@ Módulo de Vistas basadas en Templates (HTML) para el CRUD.
 Utiliza Clases de Vistas Genéricas (CBV) para implementar
 las operaciones de crear, listar, actualizar y eliminar para
 cada entidad, cumpliendo con el requisito de no usar el admin de DRF.
+Los listados son paginados, con filtros y orden del lado del servidor
+(ListadoGestionMixin, ver api_vital/gestion.py).
 '''
 
+import django_filters
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
+from django_filters.widgets import DateRangeWidget
+from .cache import CachedListViewMixin
+from .gestion import BusquedaFilterSet, ListadoGestionMixin
+from .agenda import HorarioOcupado
+from .stock import StockInsuficiente
 from .models import (
     Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento, 
     Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento
@@ -19,13 +27,94 @@ from .forms import (
     TipoTratamientoForm
 )
 
+class ConflictoReservaFormMixin:
+    '''Muestra un conflicto al guardar (sin stock, horario ocupado) como error del formulario en vez de un error 500.'''
+    errores_reserva = {StockInsuficiente: 'cantidad', HorarioOcupado: 'fecha_hora'}
+
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except tuple(self.errores_reserva) as error:
+            form.add_error(self.errores_reserva[type(error)], str(error))
+            return self.form_invalid(form)
+
+# --- Filtros de los listados (parámetros GET) ---
+
+# Rango de fechas con el selector del navegador (?<nombre>_after= / ?<nombre>_before=).
+RANGO_FECHAS = DateRangeWidget(attrs={'type': 'date'})
+
+
+class PacienteGestionFilter(BusquedaFilterSet):
+    campos_busqueda = ('rut', 'nombre', 'apellido')
+
+    class Meta:
+        model = Paciente
+        fields = ['sexo']
+
+
+class MedicoGestionFilter(BusquedaFilterSet):
+    campos_busqueda = ('rut', 'nombre', 'apellido')
+
+    class Meta:
+        model = Medico
+        fields = ['especialidad']
+
+
+class MedicamentoGestionFilter(BusquedaFilterSet):
+    campos_busqueda = ('nombre_comercial', 'principio_activo')
+
+    class Meta:
+        model = Medicamento
+        fields = []
+
+
+class ConsultaMedicaGestionFilter(django_filters.FilterSet):
+    # Por RUT (índice único) y no con un <select> de todos los pacientes o médicos.
+    paciente_rut = django_filters.CharFilter(field_name='paciente__rut', label='RUT paciente')
+    medico_rut = django_filters.CharFilter(field_name='medico__rut', label='RUT médico')
+    especialidad = django_filters.ModelChoiceFilter(
+        field_name='medico__especialidad', queryset=Especialidad.objects.all(), label='Especialidad',
+    )
+    fecha = django_filters.DateFromToRangeFilter(field_name='fecha_hora', label='Fecha', widget=RANGO_FECHAS)
+
+    class Meta:
+        model = ConsultaMedica
+        fields = ['estado']
+
+
+class TratamientoGestionFilter(django_filters.FilterSet):
+    fecha_inicio = django_filters.DateFromToRangeFilter(label='Inicio', widget=RANGO_FECHAS)
+
+    class Meta:
+        model = Tratamiento
+        fields = ['tipo']
+
+
+class RecetaMedicaGestionFilter(django_filters.FilterSet):
+    paciente_rut = django_filters.CharFilter(field_name='consulta__paciente__rut', label='RUT paciente')
+    fecha_emision = django_filters.DateFromToRangeFilter(label='Emisión', widget=RANGO_FECHAS)
+
+    class Meta:
+        model = RecetaMedica
+        fields = []
+
+
+class DetalleRecetaGestionFilter(django_filters.FilterSet):
+    receta = django_filters.NumberFilter(label='Receta ID')
+
+    class Meta:
+        model = DetalleReceta
+        fields = ['medicamento']
+
+
 # Definimos el patrón de implementación para todas las entidades
 
 # --- 1. Especialidad ---
-class EspecialidadListView(ListView):
+class EspecialidadListView(CachedListViewMixin, ListadoGestionMixin, ListView):
     model = Especialidad
     template_name = 'api_vital/especialidad_list.html'
     context_object_name = 'especialidades'
+    ordenes = {'nombre': ('Nombre', ('nombre',))}
 class EspecialidadCreateView(CreateView):
     model = Especialidad; form_class = EspecialidadForm; template_name = 'api_vital/especialidad_form.html'; success_url = reverse_lazy('especialidad_list')
 class EspecialidadUpdateView(UpdateView):
@@ -34,10 +123,11 @@ class EspecialidadDeleteView(DeleteView):
     model = Especialidad; template_name = 'api_vital/especialidad_confirm_delete.html'; success_url = reverse_lazy('especialidad_list')
 
 # --- 2. TipoTratamiento (Nueva entidad de mejora) ---
-class TipoTratamientoListView(ListView):
+class TipoTratamientoListView(CachedListViewMixin, ListadoGestionMixin, ListView):
     model = TipoTratamiento
     template_name = 'api_vital/tipotratamiento_list.html'
     context_object_name = 'tipos_tratamiento'
+    ordenes = {'nombre': ('Nombre', ('nombre',))}
 class TipoTratamientoCreateView(CreateView):
     model = TipoTratamiento; form_class = TipoTratamientoForm; template_name = 'api_vital/tipotratamiento_form.html'; success_url = reverse_lazy('tipotratamiento_list')
 class TipoTratamientoUpdateView(UpdateView):
@@ -46,8 +136,11 @@ class TipoTratamientoDeleteView(DeleteView):
     model = TipoTratamiento; template_name = 'api_vital/tipotratamiento_confirm_delete.html'; success_url = reverse_lazy('tipotratamiento_list')
 
 # --- 3. Paciente ---
-class PacienteListView(ListView):
+class PacienteListView(ListadoGestionMixin, ListView):
     model = Paciente; template_name = 'api_vital/paciente_list.html'; context_object_name = 'pacientes'
+    filterset_class = PacienteGestionFilter
+    diferidos = ('direccion', 'telefono')
+    ordenes = {'apellido': ('Apellido', ('apellido', 'nombre', 'id')), 'rut': ('RUT', ('rut',))}
 class PacienteCreateView(CreateView):
     model = Paciente; form_class = PacienteForm; template_name = 'api_vital/paciente_form.html'; success_url = reverse_lazy('paciente_list')
 class PacienteUpdateView(UpdateView):
@@ -56,8 +149,11 @@ class PacienteDeleteView(DeleteView):
     model = Paciente; template_name = 'api_vital/paciente_confirm_delete.html'; success_url = reverse_lazy('paciente_list')
 
 # --- 4. Medico ---
-class MedicoListView(ListView):
+class MedicoListView(ListadoGestionMixin, ListView):
     model = Medico; template_name = 'api_vital/medico_list.html'; context_object_name = 'medicos'
+    filterset_class = MedicoGestionFilter
+    relaciones = ('especialidad',)
+    ordenes = {'apellido': ('Apellido', ('apellido', 'nombre', 'id')), 'rut': ('RUT', ('rut',))}
 class MedicoCreateView(CreateView):
     model = Medico; form_class = MedicoForm; template_name = 'api_vital/medico_form.html'; success_url = reverse_lazy('medico_list')
 class MedicoUpdateView(UpdateView):
@@ -66,8 +162,10 @@ class MedicoDeleteView(DeleteView):
     model = Medico; template_name = 'api_vital/medico_confirm_delete.html'; success_url = reverse_lazy('medico_list')
 
 # --- 5. Medicamento ---
-class MedicamentoListView(ListView):
+class MedicamentoListView(CachedListViewMixin, ListadoGestionMixin, ListView):
     model = Medicamento; template_name = 'api_vital/medicamento_list.html'; context_object_name = 'medicamentos'
+    filterset_class = MedicamentoGestionFilter
+    ordenes = {'nombre': ('Nombre comercial', ('nombre_comercial',)), 'stock': ('Stock', ('stock', 'id'))}
 class MedicamentoCreateView(CreateView):
     model = Medicamento; form_class = MedicamentoForm; template_name = 'api_vital/medicamento_form.html'; success_url = reverse_lazy('medicamento_list')
 class MedicamentoUpdateView(UpdateView):
@@ -76,18 +174,33 @@ class MedicamentoDeleteView(DeleteView):
     model = Medicamento; template_name = 'api_vital/medicamento_confirm_delete.html'; success_url = reverse_lazy('medicamento_list')
 
 # --- 6. ConsultaMedica (Requiere manejar Foráneas) ---
-class ConsultaMedicaListView(ListView):
+class ConsultaMedicaListView(ListadoGestionMixin, ListView):
     model = ConsultaMedica; template_name = 'api_vital/consultamedica_list.html'; context_object_name = 'consultas'
-class ConsultaMedicaCreateView(CreateView):
+    filterset_class = ConsultaMedicaGestionFilter
+    relaciones = ('paciente', 'medico')
+    diferidos = ('motivo_consulta', 'busqueda')
+    # Ambos recorren el índice consulta_fecha_id_idx.
+    ordenes = {
+        'recientes': ('Más recientes', ('-fecha_hora', '-id')),
+        'antiguas': ('Más antiguas', ('fecha_hora', 'id')),
+    }
+class ConsultaMedicaCreateView(ConflictoReservaFormMixin, CreateView):
     model = ConsultaMedica; form_class = ConsultaMedicaForm; template_name = 'api_vital/consultamedica_form.html'; success_url = reverse_lazy('consultamedica_list')
-class ConsultaMedicaUpdateView(UpdateView):
+class ConsultaMedicaUpdateView(ConflictoReservaFormMixin, UpdateView):
     model = ConsultaMedica; form_class = ConsultaMedicaForm; template_name = 'api_vital/consultamedica_form.html'; success_url = reverse_lazy('consultamedica_list')
 class ConsultaMedicaDeleteView(DeleteView):
     model = ConsultaMedica; template_name = 'api_vital/consultamedica_confirm_delete.html'; success_url = reverse_lazy('consultamedica_list')
 
 # --- 7. Tratamiento ---
-class TratamientoListView(ListView):
+class TratamientoListView(ListadoGestionMixin, ListView):
     model = Tratamiento; template_name = 'api_vital/tratamiento_list.html'; context_object_name = 'tratamientos'
+    filterset_class = TratamientoGestionFilter
+    relaciones = ('consulta__paciente', 'tipo')
+    diferidos = ('descripcion', 'consulta__motivo_consulta', 'consulta__diagnostico', 'consulta__busqueda')
+    ordenes = {
+        'recientes': ('Más recientes', ('-fecha_inicio', '-id')),
+        'antiguos': ('Más antiguos', ('fecha_inicio', 'id')),
+    }
 class TratamientoCreateView(CreateView):
     model = Tratamiento; form_class = TratamientoForm; template_name = 'api_vital/tratamiento_form.html'; success_url = reverse_lazy('tratamiento_list')
 class TratamientoUpdateView(UpdateView):
@@ -96,8 +209,15 @@ class TratamientoDeleteView(DeleteView):
     model = Tratamiento; template_name = 'api_vital/tratamiento_confirm_delete.html'; success_url = reverse_lazy('tratamiento_list')
 
 # --- 8. RecetaMedica ---
-class RecetaMedicaListView(ListView):
+class RecetaMedicaListView(ListadoGestionMixin, ListView):
     model = RecetaMedica; template_name = 'api_vital/recetamedica_list.html'; context_object_name = 'recetas'
+    filterset_class = RecetaMedicaGestionFilter
+    relaciones = ('consulta__paciente', 'consulta__medico')
+    diferidos = ('consulta__motivo_consulta', 'consulta__diagnostico', 'consulta__busqueda')
+    ordenes = {
+        'recientes': ('Más recientes', ('-fecha_emision', '-id')),
+        'antiguas': ('Más antiguas', ('fecha_emision', 'id')),
+    }
 class RecetaMedicaCreateView(CreateView):
     model = RecetaMedica; form_class = RecetaMedicaForm; template_name = 'api_vital/recetamedica_form.html'; success_url = reverse_lazy('recetamedica_list')
 class RecetaMedicaUpdateView(UpdateView):
@@ -106,11 +226,16 @@ class RecetaMedicaDeleteView(DeleteView):
     model = RecetaMedica; template_name = 'api_vital/recetamedica_confirm_delete.html'; success_url = reverse_lazy('recetamedica_list')
     
 # --- 9. DetalleReceta (Auxiliar de Receta) ---
-class DetalleRecetaListView(ListView):
+class DetalleRecetaListView(ListadoGestionMixin, ListView):
     model = DetalleReceta; template_name = 'api_vital/detallereceta_list.html'; context_object_name = 'detalles_receta'
-class DetalleRecetaCreateView(CreateView):
+    filterset_class = DetalleRecetaGestionFilter
+    relaciones = ('receta__consulta__paciente', 'medicamento')
+    diferidos = ('receta__indicaciones_generales', 'receta__consulta__motivo_consulta',
+                 'receta__consulta__diagnostico', 'receta__consulta__busqueda')
+    ordenes = {'recientes': ('Más recientes', ('-id',)), 'receta': ('Receta', ('-receta_id', '-medicamento_id'))}
+class DetalleRecetaCreateView(ConflictoReservaFormMixin, CreateView):
     model = DetalleReceta; form_class = DetalleRecetaForm; template_name = 'api_vital/detallereceta_form.html'; success_url = reverse_lazy('detallereceta_list')
-class DetalleRecetaUpdateView(UpdateView):
+class DetalleRecetaUpdateView(ConflictoReservaFormMixin, UpdateView):
     model = DetalleReceta; form_class = DetalleRecetaForm; template_name = 'api_vital/detallereceta_form.html'; success_url = reverse_lazy('detallereceta_list')
 class DetalleRecetaDeleteView(DeleteView):
     model = DetalleReceta; template_name = 'api_vital/detallereceta_confirm_delete.html'; success_url = reverse_lazy('detallereceta_list')
@@ -0,0 +1,86 @@
+# api_vital/templatetags/admin_vital.py
+
+'''Bloque de Comentarios:
+Etiquetas de template para el admin de api_vital (ver api_vital/admin.py).
+jerarquia_fechas reemplaza a date_hierarchy en los listados: el admin arma
+los años, meses o días con un SELECT DISTINCT date_trunc(...) que recorre
+todas las filas filtradas; aquí salen del MIN / MAX del campo, que resuelve
+su índice. Se listan todos los períodos entre la primera y la última fecha,
+aunque alguno no tenga filas.
+'''
+
+from datetime import date, datetime
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.db.models import Max, Min
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _fecha_local(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).date() if timezone.is_aware(valor) else valor.date()
+    return valor
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def jerarquia_fechas(cl):
+    '''Contexto de admin/date_hierarchy.html (el mismo que date_hierarchy) desde MIN / MAX del campo.'''
+    campo = cl.date_hierarchy
+    anio, mes, dia = (cl.params.get(f'{campo}__{parte}') for parte in ('year', 'month', 'day'))
+    if anio and mes and dia:
+        # Un día elegido: el admin no consulta la base.
+        return date_hierarchy(cl)
+
+    def link(filtros):
+        return cl.get_query_string(filtros, [f'{campo}__'])
+
+    rango = cl.queryset.aggregate(primero=Min(campo), ultimo=Max(campo))
+    if rango['primero'] is None:
+        volver = {'link': link({}), 'title': _('All dates')} if anio else None
+        return {'show': True, 'back': volver, 'choices': []}
+    # El queryset ya está filtrado por el año / mes elegidos: el rango queda dentro de ellos.
+    primero, ultimo = _fecha_local(rango['primero']), _fecha_local(rango['ultimo'])
+    if not anio and primero.year == ultimo.year:
+        anio = primero.year
+        if primero.month == ultimo.month:
+            mes = primero.month
+
+    if anio and mes:
+        return {
+            'show': True,
+            'back': {'link': link({f'{campo}__year': anio}), 'title': str(anio)},
+            'choices': [
+                {
+                    'link': link({f'{campo}__year': anio, f'{campo}__month': mes, f'{campo}__day': numero}),
+                    'title': capfirst(formats.date_format(
+                        date(primero.year, primero.month, numero), 'MONTH_DAY_FORMAT',
+                    )),
+                }
+                for numero in range(primero.day, ultimo.day + 1)
+            ],
+        }
+    if anio:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({f'{campo}__year': anio, f'{campo}__month': numero}),
+                    'title': capfirst(formats.date_format(date(primero.year, numero, 1), 'YEAR_MONTH_FORMAT')),
+                }
+                for numero in range(primero.month, ultimo.month + 1)
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({f'{campo}__year': str(numero)}), 'title': str(numero)}
+            for numero in range(primero.year, ultimo.year + 1)
+        ],
+    }
@@ -1,3 +1,1727 @@
 from django.test import TestCase
 
 # Create your tests here.
+# api_vital/tests.py
+
+'''Bloque de Comentarios:
+Módulo de Pruebas de la API Salud Vital Ltda.
+Verifica el comportamiento y el rendimiento (cantidad de consultas SQL)
+de los endpoints de la API y de las vistas de gestión.
+'''
+
+import asyncio
+import csv
+import io
+import json
+import tempfile
+import threading
+import warnings
+from datetime import date, datetime, time, timedelta, timezone as tz
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import msgpack
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, connections, router as router_bd, transaction
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import (
+    Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento,
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento, VersionTabla, HorarioAtencion, ESTADOS_ABIERTOS,
+    ResumenConsultaDiaria, ResumenTratamientoTipo, ConsultaLenta
+)
+from .asincrono import LecturaAsincronaMixin
+from .consultas_lentas import MAXIMO_POR_SOLICITUD, ConsultasLentasMiddleware, explicar
+from .generador import digito_verificador, formatear_rut
+from .campos import leer_seleccion
+from .export import ExportMixin
+from .lectura_rapida import LecturaRapidaMixin, plan_lectura
+from .metricas import REGISTRO, TIPO_CONTENIDO
+from .parsers import MessagePackParser, ORJSONParser
+from .pagination import ConsultaMedicaPagination, ConteoEstimadoPaginator, TratamientoPagination, RecetaMedicaPagination
+from .query_planner import planificar
+from .renderers import MessagePackRenderer, ORJSONRenderer
+from .replicas import COOKIE_PIN, ReplicasMiddleware
+from .search import buscar_consultas, trigramas_disponibles
+from .serializers import ConsultaMedicaSerializer, MedicoSerializer, PacienteSerializer
+from .stock import StockInsuficiente
+from .template_views import ConsultaMedicaListView
+from .urls import router, urlpatterns
+from .views import ConsultaMedicaViewSet, PacienteViewSet
+
+
+API = '/api/v1/endpoints/'
+
+
+class VitalTestCase(TestCase):
+    '''Base de las pruebas: cada prueba parte con la cache de respuestas vacía.'''
+
+    def setUp(self):
+        super().setUp()
+        caches['respuestas'].clear()
+
+
+def crear_datos(cantidad, inicio=0):
+    '''Crea 'cantidad' registros encadenados de cada entidad (consulta, receta, tratamiento...).'''
+    especialidad, _ = Especialidad.objects.get_or_create(nombre='Cardiología')
+    tipo, _ = TipoTratamiento.objects.get_or_create(nombre='Farmacológico')
+    base = timezone.make_aware(datetime(2025, 1, 6, 9, 0))
+    for i in range(inicio, inicio + cantidad):
+        paciente = Paciente.objects.create(
+            rut=f'{10000000 + i}-{i % 10}', nombre=f'Paciente{i}', apellido='Prueba',
+            fecha_nacimiento=date(1990, 1, 1), sexo='F',
+        )
+        medico = Medico.objects.create(
+            rut=f'{20000000 + i}-{i % 10}', nombre=f'Medico{i}', apellido='Prueba',
+            especialidad=especialidad, telefono='123', email=f'medico{i}@vital.cl',
+        )
+        HorarioAtencion.objects.create(medico=medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(13))
+        consulta = ConsultaMedica.objects.create(
+            paciente=paciente, medico=medico, fecha_hora=base + timedelta(days=i),
+            motivo_consulta='Control', estado='PENDIENTE',
+        )
+        Tratamiento.objects.create(
+            consulta=consulta, tipo=tipo, nombre='Reposo', descripcion='Reposo relativo',
+            fecha_inicio=date(2025, 1, 6) + timedelta(days=i),
+        )
+        medicamento = Medicamento.objects.create(
+            nombre_comercial=f'Medicamento{i}', principio_activo='Paracetamol',
+            concentracion='500 mg', presentacion='Comprimido', stock=100,
+        )
+        receta = RecetaMedica.objects.create(consulta=consulta)
+        DetalleReceta.objects.create(
+            receta=receta, medicamento=medicamento, dosis='1', frecuencia='8 h', duracion='5 días',
+        )
+
+
+class PlanificadorConsultasTests(VitalTestCase):
+    '''El planificador deduce select_related/prefetch_related desde los serializers.'''
+
+    def test_plan_consulta_medica(self):
+        plan = planificar(ConsultaMedicaSerializer())
+        self.assertEqual(plan.select, ('medico', 'medico__especialidad', 'paciente'))
+        self.assertEqual(plan.prefetch, ())
+
+    def test_plan_medico(self):
+        self.assertEqual(planificar(MedicoSerializer()).select, ('especialidad',))
+
+    def test_columnas_para_only(self):
+        # El vector de búsqueda no se serializa; paciente y médico se leen completos (__str__).
+        solo = planificar(ConsultaMedicaSerializer()).solo
+        self.assertNotIn('busqueda', solo)
+        self.assertIn('medico', solo)
+        self.assertFalse([ruta for ruta in solo if ruta.startswith(('paciente__', 'medico__'))])
+        self.assertEqual(planificar(MedicoSerializer()).solo, (
+            'apellido', 'duracion_consulta', 'email', 'especialidad', 'especialidad__nombre',
+            'id', 'nombre', 'rut', 'telefono', 'updated_at',
+        ))
+
+
+class CantidadConsultasConstanteTests(VitalTestCase):
+    '''Cada listado del router ejecuta la misma cantidad de consultas SQL sin importar las filas.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # Staff: incluye los endpoints de diagnóstico (force_authenticate no agrega consultas).
+        self.client.force_authenticate(User(username='staff', is_staff=True))
+
+    def contar_consultas(self, url):
+        # Se mide el camino sin cache (las respuestas de referencia podrían venir de la cache).
+        caches['respuestas'].clear()
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def test_listados_sin_n_mas_uno(self):
+        crear_datos(2)
+        pocas = {prefijo: self.contar_consultas(f'{API}{prefijo}/') for prefijo, _, _ in router.registry}
+        crear_datos(5, inicio=2)
+        for prefijo, _, _ in router.registry:
+            with self.subTest(endpoint=prefijo):
+                self.assertEqual(self.contar_consultas(f'{API}{prefijo}/'), pocas[prefijo])
+
+
+class PaginacionCursorTests(VitalTestCase):
+    '''Los listados de consultas, tratamientos y recetas se paginan por cursor.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(7)
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        url, vistas = f'{API}consultas-medicas/?page_size=3', []
+        with CaptureQueriesContext(connection) as primera:
+            respuesta = self.client.get(url)
+        while True:
+            self.assertLessEqual(len(respuesta.data['results']), 3)
+            vistas += [fila['id'] for fila in respuesta.data['results']]
+            if not respuesta.data['next']:
+                break
+            with CaptureQueriesContext(connection) as profunda:
+                respuesta = self.client.get(respuesta.data['next'])
+            # Una página profunda ejecuta las mismas consultas que la primera.
+            self.assertEqual(len(profunda.captured_queries), len(primera.captured_queries))
+        esperadas = list(ConsultaMedica.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        self.assertEqual(vistas, esperadas)
+
+    def test_empates_de_fecha_sin_duplicados(self):
+        # Más filas empatadas en fecha_emision que el OFFSET máximo del cursor de DRF (1000).
+        consulta = ConsultaMedica.objects.first()
+        consultas = ConsultaMedica.objects.bulk_create(
+            ConsultaMedica(paciente=consulta.paciente, medico=consulta.medico, estado='PENDIENTE',
+                           fecha_hora=consulta.fecha_hora, motivo_consulta='Control')
+            for _ in range(1300)
+        )
+        RecetaMedica.objects.bulk_create(RecetaMedica(consulta=consulta) for consulta in consultas)
+        esperadas = list(RecetaMedica.objects.order_by('-fecha_emision', '-id').values_list('id', flat=True))
+        self.assertEqual(len(set(RecetaMedica.objects.values_list('fecha_emision', flat=True))), 1)
+
+        url, vistas, paginas = f'{API}recetas-medicas/?page_size=200', [], []
+        while url:
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self.client.get(url).json()
+            # Sin OFFSET: la consulta de la página no crece con la profundidad.
+            self.assertNotIn('OFFSET', contexto.captured_queries[-1]['sql'])
+            vistas += [fila['id'] for fila in respuesta['results']]
+            paginas.append(respuesta)
+            url = respuesta['next']
+        self.assertEqual(vistas, esperadas)
+        self.assertEqual(len(paginas), 7)
+        self.assertIsNone(paginas[-1]['next'])
+
+        # Hacia atrás desde la última página se recorren las mismas filas.
+        url, atras = paginas[-1]['previous'], []
+        while url:
+            respuesta = self.client.get(url).json()
+            atras = [fila['id'] for fila in respuesta['results']] + atras
+            url = respuesta['previous']
+        self.assertEqual(atras, esperadas[:-len(paginas[-1]['results'])])
+
+    def test_cursor_invalido(self):
+        for cursor in ('no-es-base64', 'cD14', 'cD14JnA9MQ=='):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'{API}recetas-medicas/?cursor={cursor}').status_code, 404)
+
+    def test_tamano_de_pagina_acotado(self):
+        solicitud = Request(APIRequestFactory().get('/', {'page_size': 100000}))
+        for paginacion in (ConsultaMedicaPagination, TratamientoPagination, RecetaMedicaPagination):
+            with self.subTest(paginacion=paginacion.__name__):
+                self.assertEqual(paginacion().get_page_size(solicitud), paginacion.max_page_size)
+        for prefijo in ('consultas-medicas', 'tratamientos', 'recetas-medicas'):
+            with self.subTest(endpoint=prefijo):
+                respuesta = self.client.get(f'{API}{prefijo}/')
+                self.assertIsNone(respuesta.data['next'])
+                self.assertEqual(len(respuesta.data['results']), 7)
+
+
+class ListadosGestionTests(VitalTestCase):
+    '''Los listados de gestion/ se paginan, filtran y ordenan en la base de datos.'''
+
+    def contar_consultas(self, url):
+        caches['respuestas'].clear()
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def test_listados_sin_n_mas_uno(self):
+        urls = [
+            f'/{patron.pattern}' for patron in urlpatterns
+            if str(patron.pattern).startswith('gestion/') and patron.name.endswith('_list')
+        ]
+        crear_datos(2)
+        pocas = {url: self.contar_consultas(url) for url in urls}
+        crear_datos(5, inicio=2)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.contar_consultas(url), pocas[url])
+
+    @mock.patch.object(ConsultaMedicaListView, 'paginate_by', 3)
+    def test_paginas_filtros_y_orden(self):
+        crear_datos(7)
+        ids = list(ConsultaMedica.objects.order_by('fecha_hora', 'id').values_list('id', flat=True))
+        respuesta = self.client.get('/gestion/consultas/', {'orden': 'antiguas', 'page': 2})
+        self.assertEqual([consulta.pk for consulta in respuesta.context['consultas']], ids[3:6])
+        self.assertContains(respuesta, 'Mostrando 4–6 de 7')
+        self.assertContains(respuesta, 'orden=antiguas&amp;page=3')
+        self.assertEqual(self.client.get('/gestion/consultas/', {'page': 4}).status_code, 404)
+
+        respuesta = self.client.get('/gestion/consultas/', {'paciente_rut': '10000002-2'})
+        self.assertEqual([consulta.paciente.rut for consulta in respuesta.context['consultas']], ['10000002-2'])
+        respuesta = self.client.get('/gestion/consultas/', {'fecha_after': '2025-01-07', 'fecha_before': '2025-01-08'})
+        self.assertEqual(len(respuesta.context['consultas']), 2)
+        self.assertFalse(self.client.get('/gestion/consultas/', {'estado': 'REALIZADA'}).context['consultas'])
+        respuesta = self.client.get('/gestion/pacientes/', {'buscar': 'paciente3'})
+        self.assertEqual([paciente.nombre for paciente in respuesta.context['pacientes']], ['Paciente3'])
+
+    def test_conteo_estimado(self):
+        crear_datos(7)
+        paginador = ConteoEstimadoPaginator(ConsultaMedica.objects.all(), 3)
+        paginador.limite_exacto = 4
+        if connection.vendor == 'postgresql':
+            # Más filas que el límite: el total es la estimación del planificador (al menos límite + 1).
+            self.assertGreaterEqual(paginador.count, 5)
+            self.assertTrue(paginador.estimado)
+        else:
+            self.assertEqual(paginador.count, 7)
+            self.assertFalse(paginador.estimado)
+        paginador = ConteoEstimadoPaginator(ConsultaMedica.objects.filter(estado='PENDIENTE')[:2], 3)
+        self.assertEqual((paginador.count, paginador.estimado), (2, False))
+
+
+class AutocompletadoTests(VitalTestCase):
+    '''Los formularios de gestión no listan las tablas grandes: las claves foráneas se autocompletan.'''
+    formularios = ('consultas', 'tratamientos', 'recetas', 'detalles-receta')
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(contexto.captured_queries)
+
+    def urls(self):
+        ultimos = {
+            'consultas': ConsultaMedica, 'tratamientos': Tratamiento, 'recetas': RecetaMedica,
+            'detalles-receta': DetalleReceta,
+        }
+        for ruta in self.formularios:
+            yield f'/gestion/{ruta}/crear/'
+            yield f'/gestion/{ruta}/editar/{ultimos[ruta].objects.latest("pk").pk}/'
+
+    def test_formularios_sin_n_mas_uno(self):
+        crear_datos(2)
+        pocas = [self.contar_consultas(url) for url in self.urls()]
+        crear_datos(5, inicio=2)
+        self.assertEqual([self.contar_consultas(url) for url in self.urls()], pocas)
+
+        consulta = ConsultaMedica.objects.select_related('paciente').latest('pk')
+        respuesta = self.client.get(f'/gestion/consultas/editar/{consulta.pk}/')
+        self.assertContains(respuesta, f'<option value="{consulta.paciente_id}" selected>{consulta.paciente}</option>', html=True)
+        self.assertContains(respuesta, 'data-autocompletar="/gestion/autocompletar/pacientes/"')
+        self.assertNotContains(respuesta, 'Paciente1 ')
+
+    def test_busquedas(self):
+        crear_datos(3)
+        consulta = ConsultaMedica.objects.get(paciente__nombre='Paciente1')
+        casos = {
+            'pacientes/?q=Paciente1 Prueba': [consulta.paciente_id],
+            'medicos/?q=Medico2 prueba': [Medico.objects.get(nombre='Medico2').pk],
+            f'consultas/?q={consulta.pk}': [consulta.pk],
+            'consultas/?q=Paciente1 Prueba': [consulta.pk],
+            'recetas/?q=Paciente1 Prueba': [consulta.recetamedica.pk],
+            'medicamentos/?q=medicamento2 paracetamol': [Medicamento.objects.get(nombre_comercial='Medicamento2').pk],
+            'pacientes/?q=P': [],
+        }
+        for ruta, esperados in casos.items():
+            with self.subTest(ruta=ruta):
+                with self.assertNumQueries(1 if esperados else 0):
+                    resultados = self.client.get(f'/gestion/autocompletar/{ruta}').json()['resultados']
+                self.assertEqual([fila['id'] for fila in resultados], esperados)
+        fila = self.client.get(f'/gestion/autocompletar/consultas/?q={consulta.pk}').json()['resultados'][0]
+        self.assertEqual(fila['texto'], str(consulta))
+        # Una palabra: por similitud (con pg_trgm) o icontains; primero el medicamento que coincide.
+        fila = self.client.get('/gestion/autocompletar/medicamentos/?q=medicamento2').json()['resultados'][0]
+        self.assertEqual(fila['texto'], str(Medicamento.objects.get(nombre_comercial='Medicamento2')))
+
+
+class AdminTests(VitalTestCase):
+    '''Los listados del admin ejecutan las mismas consultas sin importar las filas y no recorren la tabla.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@vital.cl', 'clave'))
+
+    def consultas_sql(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, [consulta['sql'] for consulta in contexto.captured_queries]
+
+    def test_listados_sin_n_mas_uno(self):
+        modelos = [modelo for modelo in admin.site._registry if modelo._meta.app_label == 'api_vital']
+        self.assertEqual(len(modelos), 9)
+        urls = [f'/admin/api_vital/{modelo._meta.model_name}/' for modelo in modelos]
+        crear_datos(2)
+        pocas = {url: len(self.consultas_sql(url)[1]) for url in urls}
+        crear_datos(5, inicio=2)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(len(self.consultas_sql(url)[1]), pocas[url])
+
+    def test_jerarquia_de_fechas_sin_distinct(self):
+        crear_datos(3)
+        # Las tres consultas son de enero de 2025: se ofrecen directamente los días.
+        respuesta, sentencias = self.consultas_sql('/admin/api_vital/consultamedica/')
+        self.assertContains(respuesta, 'fecha_hora__day=8')
+        self.assertNotContains(respuesta, 'fecha_hora__day=9')
+        self.assertFalse([sql for sql in sentencias if 'DISTINCT' in sql.upper()])
+        respuesta, _ = self.consultas_sql('/admin/api_vital/consultamedica/?fecha_hora__year=2025&fecha_hora__month=1&fecha_hora__day=7')
+        self.assertEqual(len(respuesta.context['cl'].result_list), 1)
+
+    def test_busqueda_de_consultas(self):
+        crear_datos(3)
+        consulta = ConsultaMedica.objects.get(paciente__rut='10000001-1')
+        for termino in ('10000001-1', str(consulta.pk)):
+            with self.subTest(termino=termino):
+                respuesta, _ = self.consultas_sql(f'/admin/api_vital/consultamedica/?q={termino}')
+                self.assertEqual(list(respuesta.context['cl'].result_list), [consulta])
+
+
+    def test_conflictos_de_reserva_como_error_del_formulario(self):
+        crear_datos(1)
+        consulta, detalle = ConsultaMedica.objects.get(), DetalleReceta.objects.get()
+        respuesta = self.client.post('/admin/api_vital/consultamedica/add/', {
+            'paciente': consulta.paciente_id, 'medico': consulta.medico_id, 'motivo_consulta': 'Control',
+            'fecha_hora_0': '2025-01-06', 'fecha_hora_1': '09:00:00', 'estado': 'PENDIENTE',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('ya tiene una cita', str(respuesta.context['adminform'].form.errors['fecha_hora']))
+        self.assertEqual(ConsultaMedica.objects.count(), 1)
+
+        # Un medicamento recién creado en el admin con stock inicial 3.
+        self.client.post('/admin/api_vital/medicamento/add/', {
+            'nombre_comercial': 'Nuevo', 'principio_activo': 'Nuevo', 'concentracion': '1 mg',
+            'presentacion': 'Comprimido', 'stock': 3,
+        })
+        medicamento = Medicamento.objects.get(nombre_comercial='Nuevo')
+        self.assertEqual(medicamento.stock, 3)
+        datos = {'receta': detalle.receta_id, 'medicamento': medicamento.pk, 'dosis': '1', 'frecuencia': '8 h',
+                 'duracion': '5 días', 'cantidad': 5}
+        respuesta = self.client.post('/admin/api_vital/detallereceta/add/', datos)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('cantidad', respuesta.context['adminform'].form.errors)
+        self.assertEqual((DetalleReceta.objects.count(), Medicamento.objects.get(pk=medicamento.pk).stock), (1, 3))
+        respuesta = self.client.post('/admin/api_vital/detallereceta/add/', {**datos, 'cantidad': 2})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(Medicamento.objects.get(pk=medicamento.pk).stock, 1)
+
+
+class CamposDinamicosTests(VitalTestCase):
+    '''?fields=, ?omit= y ?expand= recortan la respuesta y también las columnas leídas.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(3)
+
+    def obtener(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json(), contexto.captured_queries[-1]['sql']
+
+    def test_fields_y_omit_recortan_columnas(self):
+        datos, sql = self.obtener(f'{API}consultas-medicas/?fields=id,estado')
+        self.assertEqual([set(fila) for fila in datos['results']], [{'id', 'estado'}] * 3)
+        self.assertNotIn('diagnostico', sql)
+        self.assertNotIn('api_vital_paciente', sql)
+        # El orden del cursor se sigue leyendo: la página siguiente no agrega consultas.
+        self.assertIn('fecha_hora', sql)
+
+        datos, sql = self.obtener(f'{API}consultas-medicas/?omit=diagnostico,motivo_consulta')
+        self.assertNotIn('diagnostico', datos['results'][0])
+        self.assertIn('paciente_nombre', datos['results'][0])
+        self.assertNotIn('"diagnostico"', sql)
+
+    def test_expand_anidado(self):
+        consulta = ConsultaMedica.objects.select_related('paciente', 'medico').first()
+        datos, sql = self.obtener(
+            f'{API}consultas-medicas/{consulta.pk}/?expand=paciente,medico.especialidad'
+            '&fields=id,paciente.rut,medico&omit=medico.telefono'
+        )
+        self.assertEqual(datos['paciente'], {'rut': consulta.paciente.rut})
+        self.assertEqual(datos['medico']['especialidad']['nombre'], 'Cardiología')
+        self.assertNotIn('telefono', datos['medico'])
+        self.assertNotIn('"api_vital_paciente"."nombre"', sql)
+
+        with self.assertNumQueries(2):  # versiones (ETag) + tratamientos con consulta y paciente
+            datos = self.client.get(f'{API}tratamientos/?expand=consulta.paciente&fields=consulta.paciente').json()
+        self.assertEqual(len(datos['results']), 3)
+        self.assertIn('rut', datos['results'][0]['consulta']['paciente'])
+
+    def test_nombres_invalidos(self):
+        for consulta in ('fields=nada', 'omit=nada', 'expand=estado', 'fields=paciente.rut'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(self.client.get(f'{API}consultas-medicas/?{consulta}').status_code, 400)
+
+    def test_escrituras_ignoran_la_seleccion(self):
+        respuesta = self.client.post(f'{API}especialidades/?fields=id', {'nombre': 'Neurología'}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['nombre'], 'Neurología')
+
+
+@override_settings(LECTURA_RAPIDA=True)
+class LecturaRapidaTests(VitalTestCase):
+    '''list y export con values_list() producen los mismos bytes que el serializer.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(4)
+        Paciente.objects.filter(pk=Paciente.objects.first().pk).update(direccion='Calle 1', telefono=None)
+        ConsultaMedica.objects.filter(pk=ConsultaMedica.objects.first().pk).update(diagnostico=None)
+
+    def contenido(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+
+    def assertMismaSalida(self, url):
+        with CaptureQueriesContext(connection) as rapida:
+            esperado = self.contenido(url)
+        with self.settings(LECTURA_RAPIDA=False):
+            with CaptureQueriesContext(connection) as normal:
+                self.assertEqual(self.contenido(url), esperado)
+        self.assertEqual(len(rapida.captured_queries), len(normal.captured_queries))
+
+    def test_desactivada_por_defecto(self):
+        with self.settings():
+            del settings.LECTURA_RAPIDA
+            vista = PacienteViewSet(request=Request(APIRequestFactory().get('/')), format_kwarg=None)
+            self.assertIsNone(vista.plan_lectura_rapida())
+
+    def test_misma_salida_en_cada_viewset(self):
+        viewsets = [(prefijo, viewset) for prefijo, viewset, _ in router.registry if issubclass(viewset, LecturaRapidaMixin)]
+        self.assertEqual({prefijo for prefijo, _ in viewsets}, {'pacientes', 'consultas-medicas'})
+        for prefijo, viewset in viewsets:
+            self.assertIsNotNone(plan_lectura(viewset.serializer_class))
+            urls = [f'{API}{prefijo}/', f'{API}{prefijo}/?page_size=2', f'{API}{prefijo}/?fields=id']
+            if issubclass(viewset, ExportMixin):
+                urls += [f'{API}{prefijo}/export/?format=csv', f'{API}{prefijo}/export/?format=ndjson']
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assertMismaSalida(url)
+
+    def test_misma_respuesta_con_filtros_y_orden(self):
+        for url in (f'{API}pacientes/?fields=id,rut&search=Paciente1',
+                    f'{API}consultas-medicas/?page_size=3', f'{API}consultas-medicas/?omit=diagnostico&ordering=id'):
+            with self.subTest(url=url):
+                self.assertMismaSalida(url)
+
+    def test_cursor_y_campos_no_admitidos(self):
+        siguiente = self.client.get(f'{API}consultas-medicas/?page_size=3&fields=id').json()['next']
+        self.assertEqual(len(self.client.get(siguiente).json()['results']), 1)
+        # ?expand= anida serializers: se usa el serializer.
+        solicitud = Request(APIRequestFactory().get('/', {'expand': 'paciente'}))
+        self.assertIsNone(plan_lectura(ConsultaMedicaSerializer, leer_seleccion(solicitud)))
+        self.assertIn('rut', self.client.get(f'{API}consultas-medicas/?expand=paciente').json()['results'][0]['paciente'])
+
+    def test_benchmark_serializacion(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f'{directorio}/reporte.json'
+            call_command('benchmark_serializacion', '--filas', '3', '--repeticiones', '1', '--salida', salida,
+                         stdout=io.StringIO())
+            with open(salida, encoding='utf-8') as archivo:
+                resultados = json.load(archivo)['resultados']
+        self.assertTrue(all(medicion['identica'] for caso in resultados.values() for medicion in caso.values()))
+        self.assertEqual(resultados['consultas-medicas']['3']['filas'], 3)
+
+
+class FormatosRespuestaTests(VitalTestCase):
+    '''orjson y MessagePack: mismos datos que el JSON de DRF, elegidos por Accept / Content-Type.'''
+
+    datos = {
+        'fecha_hora': datetime(2025, 1, 6, 9, 0, 0, 123456, tzinfo=tz.utc),
+        'desde': date(2025, 1, 6), 'hora': time(9, 30), 'dosis': Decimal('1.50'),
+        'texto': 'Ñuñoa \u2028 línea', 'detalle': gettext_lazy('Not found.'), 1: [None, True, 2.5],
+    }
+
+    def test_orjson_mismos_bytes_que_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.datos), JSONRenderer().render(self.datos))
+        indentado = {'indent': 4}
+        self.assertEqual(ORJSONRenderer().render(self.datos, renderer_context=indentado),
+                         JSONRenderer().render(self.datos, renderer_context=indentado))
+        contenido = ORJSONRenderer().render(self.datos)
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(contenido)), json.loads(contenido))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+    def test_msgpack_mismos_datos_que_json(self):
+        datos = {clave: valor for clave, valor in self.datos.items() if isinstance(clave, str)}
+        contenido = MessagePackRenderer().render(datos)
+        esperado = json.loads(JSONRenderer().render(datos))
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(contenido)), esperado)
+        # El tipo timestamp de MessagePack llega como datetime con zona.
+        instante = datetime(2025, 1, 6, 12, 0, tzinfo=tz.utc)
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(msgpack.packb({'t': instante}, datetime=True))),
+                         {'t': instante})
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+    def test_negociacion_en_la_api(self):
+        crear_datos(2)
+        client = APIClient()
+        url = f'{API}consultas-medicas/'
+        json_ = client.get(url)
+        binario = client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(binario['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(binario.content), json_.json())
+        self.assertNotEqual(binario['ETag'], json_['ETag'])
+
+        cuerpo = msgpack.packb({'rut': '30000000-1', 'nombre': 'Ana', 'apellido': 'Rojas',
+                                'fecha_nacimiento': '1990-01-01', 'sexo': 'F'})
+        respuesta = client.post(f'{API}pacientes/', cuerpo, content_type='application/msgpack',
+                                HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(msgpack.unpackb(respuesta.content)['fecha_nacimiento'], '1990-01-01')
+        respuesta = client.post(f'{API}pacientes/', b'{"rut": ', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('JSON parse error', respuesta.json()['detail'])
+
+    def test_benchmark_renderers(self):
+        crear_datos(3)
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f'{directorio}/reporte.json'
+            call_command('benchmark_renderers', '--filas', '3', '--repeticiones', '1', '--salida', salida,
+                         stdout=io.StringIO())
+            with open(salida, encoding='utf-8') as archivo:
+                medicion = json.load(archivo)['resultados']['consultas-medicas']['3']
+        self.assertEqual(medicion['orjson']['bytes'], medicion['json']['bytes'])
+        self.assertTrue(all(medicion[formato]['iguales'] for formato in ('json', 'orjson', 'msgpack')))
+
+
+class ExportacionTests(VitalTestCase):
+    '''La acción export/ transmite NDJSON o CSV respetando los filtros del listado.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(4)
+        ConsultaMedica.objects.filter(fecha_hora__day=7).update(estado='REALIZADA')
+
+    def leer(self, url, **extra):
+        respuesta = self.client.get(url, **extra)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b''.join(respuesta.streaming_content).decode()
+
+    def test_ndjson_con_filtros(self):
+        respuesta, cuerpo = self.leer(f'{API}consultas-medicas/export/?estado=PENDIENTE&fecha_desde=2025-01-07')
+        self.assertTrue(respuesta['Content-Type'].startswith('application/x-ndjson'))
+        filas = [json.loads(linea) for linea in cuerpo.splitlines()]
+        esperadas = ConsultaMedicaSerializer(
+            ConsultaMedica.objects.filter(estado='PENDIENTE', fecha_hora__date__gte=date(2025, 1, 7)), many=True
+        ).data
+        self.assertEqual(filas, json.loads(json.dumps(esperadas)))
+        self.assertEqual(len(filas), 2)
+
+    def test_csv_por_accept(self):
+        respuesta, cuerpo = self.leer(f'{API}pacientes/export/', HTTP_ACCEPT='text/csv')
+        self.assertTrue(respuesta['Content-Type'].startswith('text/csv'))
+        filas = list(csv.DictReader(io.StringIO(cuerpo)))
+        self.assertEqual(len(filas), Paciente.objects.count())
+        self.assertEqual(list(filas[0]), list(PacienteSerializer().fields))
+
+
+class ExportacionAsgiTests(TransactionTestCase):
+    '''Bajo el handler ASGI la exportación se envía por bloques a medida que se lee, no toda al final.'''
+
+    def llamar_asgi(self, ruta, consulta=''):
+        mensajes, pendientes = [], [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def recibir():
+            if pendientes:
+                return pendientes.pop()
+            # El cliente sigue conectado: Django cancela esta espera al terminar la respuesta.
+            await asyncio.Event().wait()
+
+        async def enviar(mensaje):
+            mensajes.append((mensaje, len(self.leidas)))
+
+        alcance = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': ruta, 'query_string': consulta.encode(), 'headers': [(b'host', b'testserver')],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        }
+        with warnings.catch_warnings():
+            # Django advierte cuando debe consumir un iterador síncrono completo con sync_to_async(list).
+            warnings.simplefilter('error')
+            async_to_sync(ASGIHandler())(alcance, recibir, enviar)
+        return mensajes
+
+    def test_bloques_con_iterador_asincrono(self):
+        crear_datos(5)
+        self.leidas = []
+        filas_exportacion = PacienteViewSet.filas_exportacion
+
+        def contar_filas(vista, queryset):
+            for fila in filas_exportacion(vista, queryset):
+                self.leidas.append(fila)
+                yield fila
+
+        with mock.patch.object(PacienteViewSet, 'export_chunk_size', 2), \
+                mock.patch.object(PacienteViewSet, 'filas_exportacion', contar_filas):
+            mensajes = self.llamar_asgi(f'{API}pacientes/export/', 'format=csv')
+        self.assertEqual(mensajes[0][0]['status'], 200)
+        cuerpos = [(mensaje['body'], leidas) for mensaje, leidas in mensajes[1:] if mensaje.get('body')]
+        # El primer bloque (encabezado + 1 fila) se envía antes de leer el resto de las filas.
+        self.assertEqual(cuerpos[0][1], 1)
+        self.assertEqual(cuerpos[-1][1], 5)
+        filas = list(csv.DictReader(io.StringIO(b''.join(cuerpo for cuerpo, _ in cuerpos).decode())))
+        self.assertEqual(len(filas), 5)
+
+    def test_streaming_content_asincrono(self):
+        crear_datos(2)
+        respuesta = async_to_sync(self.async_client.get)(f'{API}consultas-medicas/export/')
+        self.assertTrue(respuesta.streaming and respuesta.is_async)
+
+        async def leer():
+            return b''.join([parte async for parte in respuesta.streaming_content])
+
+        self.assertEqual(len(async_to_sync(leer)().decode().splitlines()), 2)
+        # Bajo WSGI el iterador sigue siendo síncrono.
+        self.assertFalse(self.client.get(f'{API}consultas-medicas/export/').is_async)
+
+
+class CargaMasivaTests(VitalTestCase):
+    '''La acción bulk/ valida en lote, informa errores por fila y escribe con bulk_create/bulk_update.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.especialidad = Especialidad.objects.create(nombre='Pediatría')
+
+    def paciente(self, i, **extra):
+        return {'rut': f'{30000000 + i}-1', 'nombre': f'Carga{i}', 'apellido': 'Masiva',
+                'fecha_nacimiento': '1990-01-01', 'sexo': 'M', **extra}
+
+    def test_upsert_pacientes_con_errores_por_fila(self):
+        Paciente.objects.create(rut='30000000-1', nombre='Antiguo', apellido='X',
+                                fecha_nacimiento=date(1980, 1, 1), sexo='F')
+        filas = [self.paciente(i) for i in range(5)] + [self.paciente(1), {'rut': 'sin-datos'}]
+        respuesta = self.client.post(f'{API}pacientes/bulk/', filas, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.data['creados'], respuesta.data['actualizados']), (4, 1))
+        self.assertEqual([error['fila'] for error in respuesta.data['errores']], [5, 6])
+        self.assertEqual(Paciente.objects.get(rut='30000000-1').nombre, 'Carga0')
+
+    def test_modo_create_y_update(self):
+        self.client.post(f'{API}medicamentos/bulk/?modo=create', [{
+            'nombre_comercial': 'Aspirina', 'principio_activo': 'AAS', 'concentracion': '100 mg',
+            'presentacion': 'Comprimido', 'stock': 10,
+        }], format='json')
+        fila = {'nombre_comercial': 'Aspirina', 'principio_activo': 'AAS', 'concentracion': '100 mg',
+                'presentacion': 'Comprimido', 'stock': 25}
+        self.assertEqual(self.client.post(f'{API}medicamentos/bulk/?modo=create', [fila], format='json').status_code, 400)
+        Medicamento.objects.filter(nombre_comercial='Aspirina').update(stock=7)
+        fila['concentracion'] = '500 mg'
+        self.client.post(f'{API}medicamentos/bulk/?modo=update', [fila], format='json')
+        # El stock es de solo lectura en la carga masiva: el ajuste concurrente no se pisa.
+        medicamento = Medicamento.objects.get(nombre_comercial='Aspirina')
+        self.assertEqual((medicamento.concentracion, medicamento.stock), ('500 mg', 7))
+
+    def test_medico_email_unico_y_fk_en_lote(self):
+        Medico.objects.create(rut='1-9', nombre='A', apellido='B', especialidad=self.especialidad,
+                              telefono='1', email='ocupado@vital.cl')
+        filas = [
+            {'rut': '2-7', 'nombre': 'C', 'apellido': 'D', 'especialidad': self.especialidad.pk,
+             'telefono': '1', 'email': 'ocupado@vital.cl'},
+            {'rut': '3-5', 'nombre': 'E', 'apellido': 'F', 'especialidad': 999,
+             'telefono': '1', 'email': 'libre@vital.cl'},
+            {'rut': '4-3', 'nombre': 'G', 'apellido': 'H', 'especialidad': self.especialidad.pk,
+             'telefono': '1', 'email': 'nuevo@vital.cl'},
+        ]
+        respuesta = self.client.post(f'{API}medicos/bulk/', filas, format='json')
+        self.assertEqual(respuesta.data['creados'], 1)
+        self.assertEqual([list(error['errores']) for error in respuesta.data['errores']], [['email'], ['especialidad']])
+
+    def test_consultas_por_lote_y_no_por_fila(self):
+        def cargar(filas):
+            with CaptureQueriesContext(connection) as contexto:
+                self.client.post(f'{API}pacientes/bulk/', filas, format='json')
+            return len(contexto.captured_queries)
+        self.assertLessEqual(cargar([self.paciente(i) for i in range(3)]), 6)
+        # SQLite divide los IN/INSERT en lotes por su límite de parámetros; nunca una consulta por fila.
+        self.assertLess(cargar([self.paciente(i) for i in range(3, 600)]), 20)
+
+
+class BusquedaTextoCompletoTests(VitalTestCase):
+    '''consultas-medicas/buscar/ busca en diagnóstico y motivo, ordenando por relevancia.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(3)
+        consultas = list(ConsultaMedica.objects.order_by('id'))
+        consultas[0].motivo_consulta = 'Dolor de cabeza intenso'
+        consultas[0].save()
+        consultas[1].diagnostico = 'Cefalea tensional con dolores cervicales'
+        consultas[1].motivo_consulta = 'Dolor cervical'
+        consultas[1].save()
+        self.consultas = consultas
+
+    def test_requiere_q(self):
+        self.assertEqual(self.client.get(f'{API}consultas-medicas/buscar/').status_code, 400)
+
+    def test_busqueda_por_palabra(self):
+        respuesta = self.client.get(f'{API}consultas-medicas/buscar/', {'q': 'cervical'})
+        self.assertEqual([fila['id'] for fila in respuesta.data['results']], [self.consultas[1].pk])
+        self.assertNotIn('busqueda', respuesta.data['results'][0])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requiere text search de PostgreSQL.')
+    def test_stemming_y_ranking_en_espanol(self):
+        # 'dolores' y 'dolor' comparten raíz; el diagnóstico (peso A) pesa más que el motivo (peso B).
+        respuesta = self.client.get(f'{API}consultas-medicas/buscar/', {'q': 'dolores'})
+        ids = [fila['id'] for fila in respuesta.data['results']]
+        self.assertEqual(ids, [self.consultas[1].pk, self.consultas[0].pk])
+        self.assertGreater(respuesta.data['results'][0]['relevancia'], respuesta.data['results'][1]['relevancia'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requiere índice GIN de PostgreSQL.')
+    def test_usa_indice_gin(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = buscar_consultas(ConsultaMedica.objects.all(), 'dolor').explain()
+        self.assertIn('consulta_busqueda_gin', plan)
+
+
+class BusquedaDifusaTests(VitalTestCase):
+    '''pacientes/buscar/ y medicos/buscar/ toleran errores de tipeo y limitan resultados.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(3)
+        Paciente.objects.filter(nombre='Paciente1').update(nombre='Gonzalo', apellido='González Díaz')
+
+    def test_busqueda_parcial_y_por_rut(self):
+        respuesta = self.client.get(f'{API}pacientes/buscar/', {'q': 'Gonz'})
+        self.assertEqual([fila['nombre'] for fila in respuesta.data['results']], ['Gonzalo'])
+        respuesta = self.client.get(f'{API}medicos/buscar/', {'q': '20000002'})
+        self.assertEqual([fila['nombre'] for fila in respuesta.data['results']], ['Medico2'])
+
+    def test_limite(self):
+        respuesta = self.client.get(f'{API}pacientes/buscar/', {'q': 'Prueba', 'limite': 2})
+        self.assertEqual(len(respuesta.data['results']), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requiere PostgreSQL.')
+    def test_tolera_errores_de_tipeo(self):
+        if not trigramas_disponibles():
+            self.skipTest('La extensión pg_trgm no está disponible.')
+        respuesta = self.client.get(f'{API}pacientes/buscar/', {'q': 'Gonsalez'})
+        self.assertEqual(respuesta.data['results'][0]['nombre'], 'Gonzalo')
+        self.assertGreater(respuesta.data['results'][0]['similitud'], 0)
+
+
+def sembrar_consultas(medicos=20, pacientes=200, consultas=6000):
+    '''Siembra rápida (bulk_create) de consultas repartidas entre médicos, pacientes, fechas y estados.'''
+    especialidad, _ = Especialidad.objects.get_or_create(nombre='Medicina General')
+    lista_medicos = Medico.objects.bulk_create([
+        Medico(rut=f'{40000000 + i}-1', nombre=f'M{i}', apellido='Siembra', especialidad=especialidad,
+               telefono='1', email=f'siembra{i}@vital.cl')
+        for i in range(medicos)
+    ])
+    lista_pacientes = Paciente.objects.bulk_create([
+        Paciente(rut=f'{60000000 + i}-1', nombre=f'P{i}', apellido='Siembra',
+                 fecha_nacimiento=date(1980, 1, 1), sexo='O')
+        for i in range(pacientes)
+    ])
+    estados = ['REALIZADA'] * 8 + ['CANCELADA', 'PENDIENTE']
+    inicio = timezone.now() - timedelta(days=365)
+    ConsultaMedica.objects.bulk_create([
+        ConsultaMedica(
+            paciente=lista_pacientes[i % pacientes], medico=lista_medicos[i % medicos],
+            fecha_hora=inicio + timedelta(hours=2 * i), motivo_consulta='Control',
+            estado=estados[i % len(estados)] if i < consultas * 0.97 else 'PENDIENTE',
+        )
+        for i in range(consultas)
+    ], batch_size=1000)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return lista_medicos, lista_pacientes
+
+
+class IndicesConsultaMedicaTests(VitalTestCase):
+    '''EXPLAIN confirma que los accesos frecuentes a ConsultaMedica usan sus índices.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medicos, cls.pacientes = sembrar_consultas()
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(indice, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_agenda_de_medico(self):
+        desde = timezone.now() - timedelta(days=30)
+        self.assertUsaIndice(
+            ConsultaMedica.objects.filter(medico=self.medicos[3], fecha_hora__range=(desde, desde + timedelta(days=7)))
+            .order_by('fecha_hora'),
+            'consulta_medico_fecha_idx',
+        )
+
+    def test_historial_de_paciente(self):
+        self.assertUsaIndice(
+            ConsultaMedica.objects.filter(paciente=self.pacientes[7]).order_by('-fecha_hora'),
+            'consulta_paciente_fecha_idx',
+        )
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'SQLite no usa índices parciales cuando la condición llega como parámetros enlazados.')
+    def test_citas_abiertas_desde_hoy(self):
+        self.assertUsaIndice(
+            ConsultaMedica.objects.filter(estado__in=ESTADOS_ABIERTOS, fecha_hora__gte=timezone.now())
+            .order_by('fecha_hora'),
+            'consulta_abiertas_fecha_idx',
+        )
+
+
+class CacheRespuestasTests(VitalTestCase):
+    '''Los datos de referencia se sirven desde cache y se invalidan con post_save/post_delete.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.medicamento = Medicamento.objects.create(
+            nombre_comercial='Ibuprofeno', principio_activo='Ibuprofeno', concentracion='400 mg',
+            presentacion='Comprimido', stock=5,
+        )
+
+    def test_acierto_sin_consultas_e_invalidacion(self):
+        url = f'{API}medicamentos/'
+        primera = self.client.get(url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url)
+        self.assertEqual(segunda.content, primera.content)
+
+        self.medicamento.stock = 9
+        self.medicamento.save()
+        self.assertEqual(self.client.get(url).json()[0]['stock'], 9)
+        self.medicamento.delete()
+        self.assertEqual(self.client.get(url).json(), [])
+
+    def test_clave_incluye_parametros_ordenados(self):
+        self.client.get(f'{API}medicamentos/?search=ibu&ordering=stock')
+        with self.assertNumQueries(0):
+            self.client.get(f'{API}medicamentos/?ordering=stock&search=ibu')
+        # Versiones de tabla (ETag) + listado.
+        with self.assertNumQueries(2):
+            self.client.get(f'{API}medicamentos/?search=para')
+
+    def test_listview_de_gestion(self):
+        self.client.get('/gestion/medicamentos/')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get('/gestion/medicamentos/'), 'Ibuprofeno')
+        Medicamento.objects.get().delete()
+        self.assertNotContains(self.client.get('/gestion/medicamentos/'), 'Ibuprofeno')
+
+    def test_carga_masiva_invalida(self):
+        self.client.get(f'{API}medicamentos/')
+        self.client.post(f'{API}medicamentos/bulk/', [{
+            'nombre_comercial': 'Ibuprofeno', 'principio_activo': 'Ibuprofeno', 'concentracion': '600 mg',
+            'presentacion': 'Comprimido', 'stock': 50,
+        }], format='json')
+        self.assertEqual(self.client.get(f'{API}medicamentos/').json()[0]['concentracion'], '600 mg')
+
+
+class GetCondicionalTests(VitalTestCase):
+    '''ETag / Last-Modified desde los contadores de versión: 304 sin serializar y nuevo ETag tras cada cambio.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(3)
+
+    def test_304_con_if_none_match_y_cambio_de_etag(self):
+        url = f'{API}consultas-medicas/'
+        primera = self.client.get(url)
+        etag = primera['ETag']
+        self.assertTrue(primera.has_header('Last-Modified'))
+        # Solo se leen las versiones de las tablas: nada de consultas ni serialización.
+        with self.assertNumQueries(1):
+            no_modificada = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertEqual(no_modificada.content, b'')
+        self.assertEqual(no_modificada['ETag'], etag)
+
+        # Un cambio en una tabla relacionada (el médico aparece en __str__) renueva el ETag.
+        with self.captureOnCommitCallbacks(execute=True):
+            medico = Medico.objects.first()
+            medico.apellido = 'Soto'
+            medico.save()
+        nueva = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], etag)
+
+    def test_if_modified_since_con_escrituras_en_el_mismo_segundo(self):
+        url = f'{API}consultas-medicas/'
+        instante = timezone.make_aware(datetime(2025, 3, 1, 12, 0, 0, 100000))
+        for modelo in ConsultaMedicaViewSet(request=None, format_kwarg=None).modelos_validadores():
+            VersionTabla.objects.update_or_create(tabla=modelo._meta.db_table, defaults={'modificado': instante})
+        siguiente_segundo = 'Sat, 01 Mar 2025 12:00:01 GMT'
+
+        def pedir(despues, **cabeceras):
+            with mock.patch('django.utils.timezone.now', return_value=instante + despues):
+                return self.client.get(url, **cabeceras)
+
+        # Con el cambio de hace 0,2 s no se envía Last-Modified ni se acepta If-Modified-Since.
+        primera = pedir(timedelta(milliseconds=200))
+        self.assertFalse(primera.has_header('Last-Modified'))
+        self.assertEqual(pedir(timedelta(milliseconds=200), HTTP_IF_MODIFIED_SINCE=siguiente_segundo).status_code, 200)
+
+        # Segunda escritura dentro del mismo segundo: el redondeo no la distingue, pero no responde 304.
+        with self.captureOnCommitCallbacks(execute=True):
+            medico = Medico.objects.first()
+            medico.apellido = 'Soto'
+            medico.save()
+        VersionTabla.objects.update(modificado=instante + timedelta(milliseconds=500))
+        segunda = pedir(timedelta(milliseconds=700), HTTP_IF_MODIFIED_SINCE=siguiente_segundo)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertIn('Soto', segunda.content.decode())
+
+        # Un segundo después, Last-Modified (redondeado hacia arriba) valida con If-Modified-Since.
+        tercera = pedir(timedelta(seconds=2))
+        self.assertEqual(tercera['Last-Modified'], siguiente_segundo)
+        self.assertEqual(pedir(timedelta(seconds=2), HTTP_IF_MODIFIED_SINCE=siguiente_segundo).status_code, 304)
+        antes = pedir(timedelta(seconds=2), HTTP_IF_MODIFIED_SINCE='Sat, 01 Mar 2025 12:00:00 GMT')
+        self.assertEqual(antes.status_code, 200)
+
+    def test_etag_depende_de_parametros_y_detalle(self):
+        lista = self.client.get(f'{API}pacientes/')
+        filtrada = self.client.get(f'{API}pacientes/?search=1')
+        self.assertNotEqual(lista['ETag'], filtrada['ETag'])
+        paciente = Paciente.objects.first()
+        detalle = self.client.get(f'{API}pacientes/{paciente.pk}/')
+        respuesta = self.client.get(f'{API}pacientes/{paciente.pk}/', HTTP_IF_NONE_MATCH=detalle['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_cache_responde_304_sin_consultas(self):
+        url = f'{API}medicamentos/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_carga_masiva_incrementa_version(self):
+        url = f'{API}medicamentos/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{API}medicamentos/bulk/', [{
+                'nombre_comercial': 'Medicamento0', 'principio_activo': 'Paracetamol',
+                'concentracion': '400 mg', 'presentacion': 'Comprimido', 'stock': 1,
+            }], format='json')
+        self.assertEqual(VersionTabla.objects.get(tabla=Medicamento._meta.db_table).version, 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReservaStockTests(VitalTestCase):
+    '''Emitir un detalle de receta descuenta stock con un UPDATE condicional; borrarlo lo devuelve.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(2)
+        self.receta = RecetaMedica.objects.get(consulta__paciente__nombre='Paciente1')
+        self.medicamento = Medicamento.objects.create(
+            nombre_comercial='Amoxicilina', principio_activo='Amoxicilina', concentracion='500 mg',
+            presentacion='Cápsula', stock=10,
+        )
+
+    def stock(self):
+        return Medicamento.objects.get(pk=self.medicamento.pk).stock
+
+    def crear_detalle(self, cantidad):
+        return self.client.post(f'{API}detalles-receta/', {
+            'receta': self.receta.pk, 'medicamento': self.medicamento.pk, 'cantidad': cantidad,
+            'dosis': '1', 'frecuencia': '8 h', 'duracion': '7 días',
+        }, format='json')
+
+    def test_reserva_rechazo_ajuste_y_liberacion(self):
+        self.assertEqual(self.crear_detalle(4).status_code, 201)
+        self.assertEqual(self.stock(), 6)
+
+        detalle = DetalleReceta.objects.get(medicamento=self.medicamento)
+        respuesta = self.client.patch(f'{API}detalles-receta/{detalle.pk}/', {'cantidad': 20}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('cantidad', respuesta.json())
+        self.assertEqual(self.stock(), 6)
+
+        self.client.patch(f'{API}detalles-receta/{detalle.pk}/', {'cantidad': 1}, format='json')
+        self.assertEqual(self.stock(), 9)
+        # El borrado en cascada (receta -> detalles) también libera el stock.
+        self.receta.delete()
+        self.assertEqual(self.stock(), 10)
+
+    def test_sin_stock_no_crea_detalle(self):
+        respuesta = self.crear_detalle(11)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(DetalleReceta.objects.filter(medicamento=self.medicamento).exists())
+        self.assertEqual(self.stock(), 10)
+
+    def test_ajustar_stock(self):
+        url = f'{API}medicamentos/{self.medicamento.pk}/ajustar-stock/'
+        self.assertEqual(self.client.post(url, {'delta': 5}, format='json').json()['stock'], 15)
+        self.assertEqual(self.client.post(url, {'delta': -20}, format='json').status_code, 400)
+        self.assertEqual(self.stock(), 15)
+        for cuerpo in ([5], {'delta': 'x'}, {'delta': True}, {}):
+            with self.subTest(cuerpo=cuerpo):
+                self.assertEqual(self.client.post(url, cuerpo, format='json').status_code, 400)
+        self.assertEqual(self.stock(), 15)
+
+    def test_stock_de_solo_lectura_fuera_de_ajustar_stock(self):
+        url = f'{API}medicamentos/{self.medicamento.pk}/'
+        respuesta = self.client.patch(url, {'stock': 999, 'concentracion': '875 mg'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.stock(), 10)
+        self.client.post(f'/gestion/medicamentos/editar/{self.medicamento.pk}/', {
+            'nombre_comercial': 'Amoxicilina', 'principio_activo': 'Amoxicilina', 'concentracion': '500 mg',
+            'presentacion': 'Cápsula', 'stock': 999,
+        })
+        self.assertEqual(Medicamento.objects.get(pk=self.medicamento.pk).concentracion, '500 mg')
+        self.assertEqual(self.stock(), 10)
+
+
+    def test_stock_inicial_al_crear(self):
+        fila = {'principio_activo': 'Nuevo', 'concentracion': '500 mg', 'presentacion': 'Comprimido', 'stock': 10}
+        self.assertEqual(self.client.post(f'{API}medicamentos/', {**fila, 'nombre_comercial': 'Uno'},
+                                          format='json').status_code, 201)
+        respuesta = self.client.post(f'{API}medicamentos/bulk/?modo=create', [{**fila, 'nombre_comercial': 'Dos'}],
+                                     format='json')
+        self.assertEqual(respuesta.data['creados'], 1)
+        self.client.post('/gestion/medicamentos/crear/', {**fila, 'nombre_comercial': 'Tres'})
+        self.assertEqual(
+            dict(Medicamento.objects.filter(principio_activo='Nuevo').values_list('nombre_comercial', 'stock')),
+            {'Uno': 10, 'Dos': 10, 'Tres': 10},
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requiere conexiones concurrentes reales (PostgreSQL).')
+class ReservaStockConcurrenteTests(TransactionTestCase):
+    '''Muchas reservas en paralelo sobre un mismo medicamento: nunca se sobrevende ni se pierden unidades.'''
+
+    def test_reservas_paralelas(self):
+        crear_datos(24)
+        medicamento = Medicamento.objects.create(
+            nombre_comercial='Escaso', principio_activo='Escaso', concentracion='1 mg',
+            presentacion='Comprimido', stock=10,
+        )
+        recetas = list(RecetaMedica.objects.values_list('pk', flat=True))
+        barrera = threading.Barrier(len(recetas))
+        resultados = []
+
+        def reservar(receta_id):
+            try:
+                barrera.wait()
+                DetalleReceta.objects.create(
+                    receta_id=receta_id, medicamento=medicamento, dosis='1', frecuencia='-', duracion='-',
+                )
+                resultados.append(True)
+            except StockInsuficiente:
+                resultados.append(False)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=reservar, args=(pk,)) for pk in recetas]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count(True), 10)
+        self.assertEqual(resultados.count(False), len(recetas) - 10)
+        self.assertEqual(Medicamento.objects.get(pk=medicamento.pk).stock, 0)
+        self.assertEqual(DetalleReceta.objects.filter(medicamento=medicamento).count(), 10)
+
+
+class TimelinePacienteTests(VitalTestCase):
+    '''GET pacientes/<id>/timeline/ entrega el historial anidado en una cantidad fija de consultas SQL.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(1)
+        self.paciente = Paciente.objects.get()
+        self.url = f'{API}pacientes/{self.paciente.pk}/timeline/'
+
+    def agregar_consultas(self, cantidad):
+        # Consultas extra del mismo paciente, cada una con tratamiento y receta de dos medicamentos.
+        medico, tipo = Medico.objects.get(), TipoTratamiento.objects.get()
+        medicamentos = [
+            Medicamento.objects.get_or_create(nombre_comercial=nombre, defaults={
+                'principio_activo': nombre, 'concentracion': '1 mg', 'presentacion': 'Comprimido', 'stock': 1000,
+            })[0]
+            for nombre in ('Losartán', 'Metformina')
+        ]
+        base = ConsultaMedica.objects.order_by('-fecha_hora').first().fecha_hora
+        for i in range(1, cantidad + 1):
+            consulta = ConsultaMedica.objects.create(
+                paciente=self.paciente, medico=medico, fecha_hora=base + timedelta(days=i), motivo_consulta='Control',
+            )
+            Tratamiento.objects.create(consulta=consulta, tipo=tipo, nombre='Dieta', descripcion='-',
+                                       fecha_inicio=consulta.fecha_hora.date())
+            receta = RecetaMedica.objects.create(consulta=consulta)
+            for medicamento in medicamentos:
+                DetalleReceta.objects.create(receta=receta, medicamento=medicamento, dosis='1',
+                                             frecuencia='24 h', duracion='30 días')
+
+    def test_consultas_constantes_y_anidado(self):
+        self.agregar_consultas(1)
+        with self.assertNumQueries(4):
+            datos = self.client.get(self.url).json()
+        self.agregar_consultas(5)
+        with self.assertNumQueries(4):
+            datos = self.client.get(self.url).json()
+        self.assertEqual(datos['paciente']['rut'], self.paciente.rut)
+        self.assertEqual(len(datos['consultas']), 7)
+        reciente = datos['consultas'][0]
+        self.assertEqual(reciente['tratamientos'][0]['tipo_nombre'], 'Farmacológico')
+        self.assertEqual([d['medicamento_nombre'] for d in reciente['receta']['detalles']], ['Losartán', 'Metformina'])
+        fechas = [consulta['fecha_hora'] for consulta in datos['consultas']]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_ventana_de_fechas_y_limite(self):
+        self.agregar_consultas(5)
+        datos = self.client.get(self.url, {'limite': 2}).json()
+        self.assertEqual(len(datos['consultas']), 2)
+        self.assertTrue(datos['hay_mas'])
+        datos = self.client.get(self.url, {'fecha_desde': '2025-01-08', 'fecha_hasta': '2025-01-09 23:59'}).json()
+        self.assertEqual([c['fecha_hora'][:10] for c in datos['consultas']], ['2025-01-09', '2025-01-08'])
+        self.assertFalse(datos['hay_mas'])
+        self.assertEqual(self.client.get(self.url, {'fecha_desde': 'ayer'}).status_code, 400)
+
+
+class AgendaMedicaTests(VitalTestCase):
+    '''Bloques libres desde los horarios semanales y rechazo de citas superpuestas.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(2)
+        # crear_datos deja a cada médico atendiendo los lunes de 09:00 a 13:00 (citas de 30 minutos: 8 bloques).
+        self.medico_a, self.medico_b = Medico.objects.order_by('pk')
+        self.lunes = timezone.make_aware(datetime(2025, 1, 13))
+        self.paciente = Paciente.objects.first()
+
+    def citar(self, medico, hora, minuto=0, estado='PENDIENTE'):
+        return self.client.post(f'{API}consultas-medicas/', {
+            'paciente': self.paciente.pk, 'medico': medico.pk, 'motivo_consulta': 'Control', 'estado': estado,
+            'fecha_hora': (self.lunes + timedelta(hours=hora, minutes=minuto)).isoformat(),
+        }, format='json')
+
+    def bloques(self, **parametros):
+        parametros.update({'desde': '2025-01-13', 'hasta': '2025-01-19'})
+        datos = self.client.get(f'{API}medicos/disponibilidad/', parametros).json()
+        return {
+            fila['medico']: [timezone.localtime(parse_datetime(b['inicio'])).strftime('%H:%M') for b in fila['bloques']]
+            for fila in datos['medicos']
+        }
+
+    def test_bloques_libres_por_medico_y_especialidad(self):
+        self.assertEqual(self.citar(self.medico_a, 10).status_code, 201)
+        self.assertEqual(self.citar(self.medico_a, 11, estado='CANCELADA').status_code, 201)
+        self.assertEqual(self.bloques(medico=self.medico_a.pk),
+                         {self.medico_a.pk: ['09:00', '09:30', '10:30', '11:00', '11:30', '12:00', '12:30']})
+        # Médicos, horarios y citas: tres consultas sin importar médicos ni días.
+        with self.assertNumQueries(3):
+            agenda = self.bloques(especialidad=self.medico_a.especialidad_id)
+        self.assertEqual(len(agenda[self.medico_b.pk]), 8)
+
+    def test_cita_fuera_de_grilla_desplaza_los_bloques(self):
+        self.citar(self.medico_a, 9, 10)
+        self.assertEqual(self.bloques(medico=self.medico_a.pk)[self.medico_a.pk], ['09:40', '10:10', '10:40', '11:10', '11:40', '12:10'])
+
+    def test_rechaza_citas_superpuestas(self):
+        self.assertEqual(self.citar(self.medico_a, 10).status_code, 201)
+        respuesta = self.citar(self.medico_a, 10, 15)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('fecha_hora', respuesta.json())
+        self.assertEqual(self.citar(self.medico_b, 10, 15).status_code, 201)
+        self.assertEqual(self.citar(self.medico_a, 10, 30).status_code, 201)
+        # Editar una cita sin moverla no choca consigo misma.
+        consulta = ConsultaMedica.objects.get(medico=self.medico_a, fecha_hora=self.lunes + timedelta(hours=10))
+        respuesta = self.client.patch(f'{API}consultas-medicas/{consulta.pk}/', {'diagnostico': 'Sano'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_validaciones(self):
+        respuesta = self.client.post(f'{API}horarios-atencion/', {
+            'medico': self.medico_a.pk, 'dia_semana': 0, 'hora_inicio': '11:00', 'hora_fin': '14:00',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        url = f'{API}medicos/disponibilidad/'
+        self.assertEqual(self.client.get(url, {'medico': self.medico_a.pk, 'desde': '2025-02-01', 'hasta': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class ResumenesEstadisticasTests(VitalTestCase):
+    '''Los resúmenes se mantienen en cada alta, cambio y baja, y coinciden con una reconstrucción completa.'''
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        crear_datos(3)
+
+    def resumen(self):
+        return {
+            (fecha.isoformat(), especialidad, estado): cantidad
+            for fecha, especialidad, estado, cantidad in ResumenConsultaDiaria.objects.filter(cantidad__gt=0)
+            .values_list('fecha', 'especialidad_id', 'estado', 'cantidad')
+        }
+
+    def assertIgualAReconstruido(self):
+        incremental = (self.resumen(), dict(ResumenTratamientoTipo.objects.values_list('tipo_id', 'cantidad')))
+        call_command('reconstruir_resumenes', stdout=io.StringIO())
+        self.assertEqual(incremental, (self.resumen(), dict(ResumenTratamientoTipo.objects.values_list('tipo_id', 'cantidad'))))
+
+    def test_transiciones_de_estado_fecha_y_bajas(self):
+        cardiologia = Especialidad.objects.get()
+        self.assertEqual(self.resumen()[('2025-01-06', cardiologia.pk, 'PENDIENTE')], 1)
+        consulta = ConsultaMedica.objects.get(fecha_hora__date=date(2025, 1, 6))
+        self.client.patch(f'{API}consultas-medicas/{consulta.pk}/', {'estado': 'REALIZADA'}, format='json')
+        self.client.patch(f'{API}consultas-medicas/{consulta.pk}/', {'fecha_hora': '2025-01-07T15:00:00Z'}, format='json')
+        self.assertEqual(self.resumen()[('2025-01-07', cardiologia.pk, 'REALIZADA')], 1)
+        self.assertNotIn(('2025-01-06', cardiologia.pk, 'PENDIENTE'), self.resumen())
+        self.assertIgualAReconstruido()
+
+        # Borrar la consulta descuenta también sus tratamientos (cascada).
+        ConsultaMedica.objects.get(fecha_hora__date=date(2025, 1, 8)).delete()
+        self.assertEqual(ResumenTratamientoTipo.objects.get().cantidad, 2)
+        self.assertIgualAReconstruido()
+
+    def test_cambio_de_especialidad_del_medico(self):
+        pediatria = Especialidad.objects.create(nombre='Pediatría')
+        medico = ConsultaMedica.objects.get(fecha_hora__date=date(2025, 1, 6)).medico
+        medico.especialidad = pediatria
+        medico.save()
+        self.assertEqual(self.resumen()[('2025-01-06', pediatria.pk, 'PENDIENTE')], 1)
+        self.assertIgualAReconstruido()
+
+    def test_cambio_de_especialidad_en_carga_masiva(self):
+        pediatria = Especialidad.objects.create(nombre='Pediatría')
+        medicos = list(Medico.objects.order_by('rut'))
+        filas = [
+            {'rut': medico.rut, 'nombre': medico.nombre, 'apellido': medico.apellido, 'telefono': medico.telefono,
+             'email': medico.email, 'especialidad': pediatria.pk if indice < 2 else medico.especialidad_id}
+            for indice, medico in enumerate(medicos)
+        ]
+        # update: los dos primeros pasan a Pediatría; upsert: vuelven y el tercero pasa a Pediatría.
+        for modo, en_pediatria in (('update', 2), ('upsert', 1)):
+            with self.subTest(modo=modo):
+                respuesta = self.client.post(f'{API}medicos/bulk/?modo={modo}', filas, format='json')
+                self.assertEqual(respuesta.json()['actualizados'], 3)
+                self.assertEqual(sum(cantidad for (_, especialidad, _), cantidad in self.resumen().items()
+                                     if especialidad == pediatria.pk), en_pediatria)
+                self.assertIgualAReconstruido()
+                for fila in filas:
+                    fila['especialidad'] = medicos[0].especialidad_id if fila['especialidad'] == pediatria.pk else pediatria.pk
+
+    def test_endpoint_con_costo_independiente_del_historial(self):
+        url = f'{API}estadisticas/consultas/'
+        ventana = {'desde': '2025-01-06', 'hasta': '2025-01-07'}
+        with self.assertNumQueries(2):
+            filas = self.client.get(url, ventana).json()
+        self.assertEqual([(f['fecha'], f['estado'], f['cantidad']) for f in filas],
+                         [('2025-01-07', 'PENDIENTE', 1), ('2025-01-06', 'PENDIENTE', 1)])
+        self.assertEqual(filas[0]['especialidad_nombre'], 'Cardiología')
+        totales = self.client.get(f'{url}totales/', {'desde': '2025-01-01', 'hasta': '2025-01-31'}).json()
+        self.assertEqual([(t['estado'], t['cantidad']) for t in totales['totales']], [('PENDIENTE', 3)])
+        self.assertEqual(self.client.get(url, {'desde': '2024-01-01', 'hasta': '2025-12-31'}).status_code, 400)
+        tratamientos = self.client.get(f'{API}estadisticas/tratamientos/').json()
+        self.assertEqual([(t['tipo_nombre'], t['cantidad']) for t in tratamientos], [('Farmacológico', 3)])
+
+
+class BenchmarkApiTests(TestCase):
+    '''Comando benchmark_api: siembra, mide y compara contra una línea base.'''
+
+    def ejecutar(self, directorio, *extra):
+        salida = f'{directorio}/reporte.json'
+        call_command('benchmark_api', '--base-actual', '--escala', '0.0001', '--repeticiones', '2',
+                     '--calentamiento', '0', '--filtro', 'paciente', '--salida', salida, *extra, stdout=io.StringIO())
+        with open(salida, encoding='utf-8') as archivo:
+            return json.load(archivo)
+
+    def test_reporte_y_regresiones(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            reporte = self.ejecutar(directorio)
+            self.assertEqual(reporte['meta']['volumen']['Paciente'], 10)
+            resultados = reporte['resultados']
+            self.assertIn('api:pacientes:list', resultados)
+            self.assertIn('gestion:paciente_list', resultados)
+            self.assertNotIn('api:medicos:list', resultados)
+            for caso in resultados.values():
+                self.assertEqual(caso['estado'], 200)
+                self.assertLessEqual(caso['p50_ms'], caso['p95_ms'])
+                self.assertLessEqual(caso['p95_ms'], caso['p99_ms'])
+                self.assertGreater(caso['bytes'], 0)
+            self.assertEqual(resultados['api:pacientes:list']['consultas_sql'], 2)
+
+            # Una línea base más rápida y con menos consultas hace fallar la comparación.
+            base = {'resultados': {'api:pacientes:list': {**resultados['api:pacientes:list'],
+                                                          'p95_ms': 0, 'consultas_sql': 1}}}
+            with open(f'{directorio}/base.json', 'w', encoding='utf-8') as archivo:
+                json.dump(base, archivo)
+            with self.assertRaisesMessage(CommandError, 'api:pacientes:list: 2 consultas SQL (base 1)'):
+                self.ejecutar(directorio, '--linea-base', f'{directorio}/base.json')
+
+
+class GeneradorDatosTests(VitalTestCase):
+    '''Comando generar_datos: datos coherentes, RUT válidos, agenda sin choques y reproducibles.'''
+
+    def generar(self, semilla=5):
+        call_command('generar_datos', '--especialidades', '3', '--tipos-tratamiento', '2', '--medicamentos', '6',
+                     '--medicos', '4', '--pacientes', '30', '--consultas', '300', '--lote', '70',
+                     '--semilla', str(semilla), stdout=io.StringIO())
+
+    def test_digito_verificador(self):
+        self.assertEqual(formatear_rut(12345678), '12.345.678-5')
+        self.assertEqual(formatear_rut(11111111), '11.111.111-1')
+        self.assertEqual(formatear_rut(6247520), '6.247.520-K')
+        self.assertEqual(digito_verificador(14), '0')
+
+    def test_datos_coherentes(self):
+        Especialidad.objects.create(nombre='Cardiología')
+        self.generar()
+        self.assertEqual(Paciente.objects.count(), 30)
+        self.assertEqual(ConsultaMedica.objects.count(), 300)
+        self.assertTrue(Tratamiento.objects.exists() and DetalleReceta.objects.exists())
+        # Los nombres únicos que ya existían reciben un sufijo.
+        self.assertEqual(Especialidad.objects.filter(nombre__startswith='Cardiología').count(), 2)
+
+        for rut in Paciente.objects.values_list('rut', flat=True):
+            numero, digito = rut.split('-')
+            self.assertEqual(digito_verificador(int(numero.replace('.', ''))), digito)
+
+        # Cada cita cae dentro del horario de su médico y ninguna se superpone.
+        horarios = {(h.medico_id, h.dia_semana): (h.hora_inicio, h.hora_fin) for h in HorarioAtencion.objects.all()}
+        citas = sorted(ConsultaMedica.objects.values_list('medico_id', 'fecha_hora'))
+        for medico_id, fecha_hora in citas:
+            local = timezone.localtime(fecha_hora)
+            inicio, fin = horarios[medico_id, local.weekday()]
+            self.assertTrue(inicio <= local.time() and (local + timedelta(minutes=30)).time() <= fin)
+        for (medico_a, hora_a), (medico_b, hora_b) in zip(citas, citas[1:]):
+            self.assertTrue(medico_a != medico_b or hora_b - hora_a >= timedelta(minutes=30))
+
+        # Los resúmenes quedan al día y las secuencias continúan después de las claves asignadas.
+        resumen = list(ResumenConsultaDiaria.objects.values_list('fecha', 'especialidad_id', 'estado', 'cantidad'))
+        call_command('reconstruir_resumenes', stdout=io.StringIO())
+        self.assertCountEqual(resumen, ResumenConsultaDiaria.objects.values_list(
+            'fecha', 'especialidad_id', 'estado', 'cantidad'))
+        nuevo = Paciente.objects.create(rut='1-9', nombre='Ana', apellido='Soto', fecha_nacimiento=date(1990, 1, 1),
+                                        sexo='F')
+        self.assertGreater(nuevo.pk, Paciente.objects.exclude(pk=nuevo.pk).order_by('-pk').first().pk)
+        if connection.vendor == 'postgresql':
+            self.assertEqual(buscar_consultas(ConsultaMedica.objects.all(), 'dolor').count(),
+                             ConsultaMedica.objects.filter(motivo_consulta__icontains='dolor').count())
+
+    def test_reproducible_con_la_misma_semilla(self):
+        def contenido():
+            return (list(Paciente.objects.order_by('pk').values_list('rut', 'nombre', 'fecha_nacimiento')),
+                    list(ConsultaMedica.objects.order_by('pk').values_list('paciente_id', 'fecha_hora', 'estado')),
+                    list(DetalleReceta.objects.order_by('pk').values_list('receta_id', 'medicamento_id')))
+
+        with transaction.atomic():
+            self.generar()
+            primera = contenido()
+            transaction.set_rollback(True)
+        self.generar()
+        self.assertEqual(contenido(), primera)
+
+
+class MetricasTests(VitalTestCase):
+    '''Middleware de métricas y endpoint /metrics en formato Prometheus.'''
+
+    def setUp(self):
+        super().setUp()
+        REGISTRO.reiniciar()
+        crear_datos(2)
+
+    def metricas(self):
+        respuesta = self.client.get('/metrics')
+        self.assertEqual(respuesta['Content-Type'], TIPO_CONTENIDO)
+        valores = {}
+        for linea in respuesta.content.decode().splitlines():
+            if not linea.startswith('#'):
+                serie, valor = linea.rsplit(' ', 1)
+                valores[serie] = float(valor)
+        return valores
+
+    def test_metricas_por_ruta_y_metodo(self):
+        self.client.get(f'{API}pacientes/')
+        self.client.get(f'{API}pacientes/')
+        bytes_gestion = len(self.client.get('/gestion/pacientes/').content)
+        self.client.post(f'{API}pacientes/', {}, format='json')
+        valores = self.metricas()
+
+        ruta = 'view="paciente-list",method="GET"'
+        self.assertEqual(valores[f'saludvital_http_requests_total{{{ruta},status="200"}}'], 2)
+        self.assertEqual(valores['saludvital_http_requests_total{view="paciente-list",method="POST",status="400"}'], 1)
+        self.assertEqual(valores[f'saludvital_http_request_duration_seconds_count{{{ruta}}}'], 2)
+        # Paginación por cursor sin COUNT: la página y la versión de la tabla (ETag).
+        self.assertEqual(valores[f'saludvital_http_request_db_queries_sum{{{ruta}}}'], 4)
+        self.assertEqual(valores[f'saludvital_http_request_db_queries_bucket{{{ruta},le="2"}}'], 2)
+        self.assertEqual(valores[f'saludvital_http_request_db_queries_bucket{{{ruta},le="1"}}'], 0)
+        self.assertEqual(valores[f'saludvital_http_response_render_duration_seconds_count{{{ruta}}}'], 2)
+        self.assertGreater(valores[f'saludvital_http_request_db_duration_seconds_sum{{{ruta}}}'], 0)
+
+        gestion = 'view="paciente_list",method="GET"'
+        self.assertEqual(valores[f'saludvital_http_response_size_bytes_sum{{{gestion}}}'], bytes_gestion)
+        self.assertEqual(valores[f'saludvital_http_response_size_bytes_bucket{{{gestion},le="+Inf"}}'], 1)
+
+    def test_primero_en_middleware(self):
+        # La latencia incluye al resto de los middleware (p. ej. el registro de consultas lentas).
+        self.assertEqual(settings.MIDDLEWARE[0], 'api_vital.metricas.MetricasMiddleware')
+
+    def test_token_opcional(self):
+        with self.settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            respuesta = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+            self.assertEqual(respuesta.status_code, 200)
+
+
+@override_settings(CONSULTAS_LENTAS_UMBRAL_MS=0, CONSULTAS_LENTAS_MUESTREO_EXPLAIN=1, CONSULTAS_LENTAS_MAXIMO=3)
+class ConsultasLentasTests(VitalTestCase):
+    '''Registro de consultas lentas: origen, plan muestreado, buffer circular y acceso solo staff.'''
+
+    def setUp(self):
+        super().setUp()
+        crear_datos(2)
+
+    def test_registro_con_origen_y_plan(self):
+        self.client.get(f'{API}pacientes/')
+        registradas = list(ConsultaLenta.objects.all())
+        self.assertTrue(registradas)
+        consulta = next(c for c in registradas if 'api_vital_paciente' in c.sql)
+        self.assertEqual((consulta.metodo, consulta.vista, consulta.accion), ('GET', 'paciente-list', 'list'))
+        self.assertEqual(consulta.ruta, f'{API}pacientes/')
+        self.assertGreaterEqual(consulta.duracion_ms, 0)
+        if connection.vendor == 'postgresql':
+            self.assertIn('actual time', consulta.plan)
+            self.assertIn('Buffers', consulta.plan)
+        else:
+            self.assertIsNone(consulta.plan)
+
+    def test_plan_despues_de_enviar_la_respuesta(self):
+        def vista(request):
+            list(Paciente.objects.all())
+            return HttpResponse('ok')
+
+        response = ConsultasLentasMiddleware(vista)(RequestFactory().get('/'))
+        # La respuesta sale sin haber ejecutado EXPLAIN ni guardado nada; request_finished (al cerrarla) lo hace.
+        self.assertFalse(ConsultaLenta.objects.exists())
+        # Como el cliente de pruebas: close_old_connections cerraría la conexión de la transacción de la prueba.
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+        self.assertEqual(ConsultaLenta.objects.count(), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN solo en PostgreSQL.')
+    def test_select_for_update_sin_analyze(self):
+        with transaction.atomic():
+            sql, params = Paciente.objects.select_for_update().query.sql_with_params()
+            plan = explicar('default', sql, params)
+        self.assertIn('LockRows', plan)
+        self.assertNotIn('actual time', plan)
+
+    def test_buffer_circular(self):
+        for _ in range(3):
+            self.client.get(f'{API}pacientes/')
+            self.client.get('/gestion/pacientes/')
+        self.assertLessEqual(ConsultaLenta.objects.count(), 3)
+        self.assertEqual(ConsultaLenta.objects.first().vista, 'paciente_list')
+        self.assertEqual(ConsultaLenta.objects.first().accion, 'PacienteListView')
+
+    def test_desactivado_sin_umbral(self):
+        with self.settings(CONSULTAS_LENTAS_UMBRAL_MS=None):
+            self.client.get(f'{API}pacientes/')
+        self.assertFalse(ConsultaLenta.objects.exists())
+
+    def test_limite_por_solicitud(self):
+        crear_datos(20, inicio=2)
+        with self.settings(CONSULTAS_LENTAS_MAXIMO=1000):
+            self.client.get('/gestion/tratamientos/')
+        self.assertLessEqual(ConsultaLenta.objects.count(), MAXIMO_POR_SOLICITUD)
+
+    def test_endpoint_solo_staff_y_comando(self):
+        self.client.get(f'{API}pacientes/')
+        url = f'{API}diagnostico/consultas-lentas/'
+        with self.settings(CONSULTAS_LENTAS_UMBRAL_MS=None):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.client.force_login(User.objects.create_user('staff', is_staff=True))
+            respuesta = self.client.get(url, {'vista': 'paciente-list'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.json())
+
+        salida = io.StringIO()
+        call_command('consultas_lentas', '--vista', 'paciente-list', '--limite', '1', stdout=salida)
+        self.assertIn('GET /api/v1/endpoints/pacientes/', salida.getvalue())
+        self.assertIn('paciente-list:list', salida.getvalue())
+        call_command('consultas_lentas', '--limpiar', stdout=io.StringIO())
+        self.assertFalse(ConsultaLenta.objects.exists())
+
+
+@override_settings(LECTURA_ASINCRONA=True)
+class LecturaAsincronaTests(VitalTestCase):
+    '''Vistas asíncronas de list/retrieve: mismas respuestas que las síncronas y delegación del resto.'''
+
+    def setUp(self):
+        super().setUp()
+        crear_datos(3)
+        self.factory = APIRequestFactory()
+        self.viewsets = {prefijo: viewset for prefijo, viewset, _ in router.registry
+                         if issubclass(viewset, LecturaAsincronaMixin)}
+
+    def pedir(self, prefijo, accion, url, metodo='get', **extra):
+        # Como el router: la ruta de list también atiende POST (create).
+        acciones = {'get': 'list', 'post': 'create'} if accion == 'list' else {'get': 'retrieve'}
+        vista = self.viewsets[prefijo].as_view(acciones)
+        self.assertTrue(iscoroutinefunction(vista))
+        kwargs = {'pk': url.rstrip('/').rsplit('/', 1)[-1]} if accion == 'retrieve' else {}
+        response = async_to_sync(vista)(getattr(self.factory, metodo)(url, **extra), **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_mismas_respuestas_que_la_vista_sincrona(self):
+        self.assertEqual(set(self.viewsets), {'pacientes', 'medicos', 'consultas-medicas', 'medicamentos'})
+        for prefijo, viewset in self.viewsets.items():
+            primero = viewset.queryset.order_by('pk').first().pk
+            for accion, url in (('list', f'{API}{prefijo}/'), ('retrieve', f'{API}{prefijo}/{primero}/')):
+                with self.subTest(prefijo=prefijo, accion=accion):
+                    esperada = self.client.get(url)
+                    caches['respuestas'].clear()
+                    response = self.pedir(prefijo, accion, url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(json.loads(response.content), esperada.json())
+                    self.assertEqual(response['ETag'], esperada['ETag'])
+
+    def test_filtros_paginacion_y_errores(self):
+        medico = Medico.objects.order_by('pk').first()
+        url = f'{API}consultas-medicas/?medico={medico.pk}&page_size=1'
+        self.assertEqual(json.loads(self.pedir('consultas-medicas', 'list', url).content), self.client.get(url).json())
+        self.assertEqual(self.pedir('pacientes', 'retrieve', f'{API}pacientes/999999/').status_code, 404)
+        self.assertEqual(self.pedir('pacientes', 'retrieve', f'{API}pacientes/abc/').status_code, 404)
+        self.assertEqual(self.pedir('consultas-medicas', 'list', f'{API}consultas-medicas/?medico=0').status_code, 400)
+
+    def test_get_condicional_y_cache(self):
+        url = f'{API}medicamentos/'
+        etag = self.pedir('medicamentos', 'list', url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.pedir('medicamentos', 'list', url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        url = f'{API}pacientes/'
+        etag = self.pedir('pacientes', 'list', url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.pedir('pacientes', 'list', url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_escrituras_y_html_se_delegan(self):
+        response = self.pedir('medicamentos', 'list', f'{API}medicamentos/', metodo='post', format='json', data={
+            'nombre_comercial': 'Ibuprofeno', 'principio_activo': 'Ibuprofeno', 'concentracion': '400 mg',
+            'presentacion': 'Comprimido', 'stock': 10,
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.pedir('pacientes', 'list', f'{API}pacientes/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response['Content-Type'])
+
+
+@override_settings(LECTURA_ASINCRONA=True, CONSULTAS_LENTAS_UMBRAL_MS=0, CONSULTAS_LENTAS_MUESTREO_EXPLAIN=0)
+class MiddlewareAsincronoTests(TransactionTestCase):
+    '''Métricas y consultas lentas en modo asíncrono. TransactionTestCase: el cliente asíncrono cierra la
+    respuesta (request_finished, donde se guardan las consultas lentas) en otro hilo, con otra conexión.'''
+
+    def test_middleware_en_modo_asincrono(self):
+        crear_datos(3)
+        REGISTRO.reiniciar()
+        response = async_to_sync(self.async_client.get)(f'{API}pacientes/')
+        self.assertEqual(response.status_code, 200)
+        exportado = REGISTRO.exportar()
+        self.assertIn('saludvital_http_request_db_queries_sum{view="paciente-list",method="GET"} 2', exportado)
+        self.assertEqual(set(ConsultaLenta.objects.values_list('vista', 'accion')), {('paciente-list', 'list')})
+
+
+@override_settings(REPLICAS_LECTURA=['replica1', 'replica2'])
+class RouterReplicasTests(SimpleTestCase):
+    '''Decisiones del router de réplicas (sin consultar las réplicas).'''
+
+    def solicitud(self, url, metodo='get', escribir=False, **extra):
+        '''Pasa una solicitud por el middleware y devuelve (base de lectura de Paciente, de User, respuesta).'''
+        bases = {}
+
+        def vista(request):
+            middleware.process_view(request, resolve(url).func, (), {})
+            if escribir:
+                router_bd.db_for_write(Paciente)
+            bases['paciente'] = router_bd.db_for_read(Paciente)
+            bases['usuario'] = router_bd.db_for_read(User)
+            return HttpResponse()
+
+        middleware = ReplicasMiddleware(vista)
+        response = middleware(getattr(RequestFactory(), metodo)(url, **extra))
+        return bases['paciente'], bases['usuario'], response
+
+    def test_lecturas_en_ronda_solo_para_api_vital(self):
+        elegidas = {self.solicitud(f'{API}pacientes/')[0] for _ in range(4)}
+        self.assertEqual(elegidas, {'replica1', 'replica2'})
+        self.assertEqual(self.solicitud('/gestion/pacientes/')[0][:7], 'replica')
+        self.assertEqual(self.solicitud(f'{API}pacientes/')[1], 'default')
+        # Fuera de una solicitud, en vistas de edición y en respuestas que se guardan en cache: primaria.
+        self.assertEqual(router_bd.db_for_read(Paciente), 'default')
+        self.assertEqual(self.solicitud('/gestion/pacientes/editar/1/')[0], 'default')
+        self.assertEqual(self.solicitud(f'{API}especialidades/')[0], 'default')
+
+    def test_leer_lo_propio(self):
+        base, _, response = self.solicitud(f'{API}pacientes/', metodo='post', escribir=True)
+        self.assertEqual(base, 'default')
+        self.assertEqual(response.cookies[COOKIE_PIN]['max-age'], 5)
+        # Una lectura que escribe pasa a la primaria desde ese momento.
+        base, _, response = self.solicitud(f'{API}pacientes/', escribir=True)
+        self.assertEqual(base, 'default')
+        self.assertIn(COOKIE_PIN, response.cookies)
+
+        base, _, response = self.solicitud(f'{API}pacientes/', HTTP_COOKIE=f'{COOKIE_PIN}=1')
+        self.assertEqual(base, 'default')
+        self.assertNotIn(COOKIE_PIN, response.cookies)
+
+    @override_settings(REPLICAS_LECTURA=[])
+    def test_sin_replicas(self):
+        base, _, response = self.solicitud(f'{API}pacientes/', metodo='post', escribir=True)
+        self.assertEqual(base, 'default')
+        self.assertNotIn(COOKIE_PIN, response.cookies)
+
+
+@skipUnless(settings.REPLICAS_LECTURA, 'Requiere una réplica configurada (DB_REPLICAS).')
+class ReplicasLecturaTests(TransactionTestCase):
+    '''Con una réplica real (espejo de la base de prueba): lecturas a la réplica y leer lo propio.'''
+    databases = '__all__'
+
+    def setUp(self):
+        caches['respuestas'].clear()
+        crear_datos(1)
+        self.replica = settings.REPLICAS_LECTURA[0]
+        self.client = APIClient()
+
+    def test_lecturas_a_la_replica_y_primaria_tras_escribir(self):
+        with override_settings(REPLICAS_LECTURA=[self.replica]):
+            with CaptureQueriesContext(connections[self.replica]) as replica:
+                self.assertEqual(len(self.client.get(f'{API}pacientes/').json()), 1)
+            self.assertTrue(replica.captured_queries)
+
+            response = self.client.post(f'{API}pacientes/', {
+                'rut': '30000000-1', 'nombre': 'Nueva', 'apellido': 'Paciente',
+                'fecha_nacimiento': '1990-01-01', 'sexo': 'F',
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertIn(COOKIE_PIN, response.cookies)
+            with CaptureQueriesContext(connections[self.replica]) as replica:
+                self.assertEqual(len(self.client.get(f'{API}pacientes/').json()), 2)
+            self.assertFalse(replica.captured_queries)
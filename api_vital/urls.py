@@ -11,7 +11,8 @@ from django.urls import path, include
 from .views import (
     EspecialidadViewSet, PacienteViewSet, MedicoViewSet, ConsultaMedicaViewSet, 
     TratamientoViewSet, MedicamentoViewSet, RecetaMedicaViewSet, 
-    DetalleRecetaViewSet, TipoTratamientoViewSet
+    DetalleRecetaViewSet, TipoTratamientoViewSet, HorarioAtencionViewSet,
+    EstadisticaConsultaViewSet, EstadisticaTratamientoViewSet, ConsultaLentaViewSet
 )
 
 router = DefaultRouter()
@@ -26,6 +27,10 @@ router.register(r'consultas-medicas', ConsultaMedicaViewSet) # CRUD consulta_med
 router.register(r'tratamientos', TratamientoViewSet) # CRUD tratamiento
 router.register(r'recetas-medicas', RecetaMedicaViewSet) # CRUD receta_medica
 router.register(r'detalles-receta', DetalleRecetaViewSet) # CRUD DetalleReceta
+router.register(r'horarios-atencion', HorarioAtencionViewSet) # CRUD HorarioAtencion
+router.register(r'estadisticas/consultas', EstadisticaConsultaViewSet) # Resumen (solo lectura)
+router.register(r'estadisticas/tratamientos', EstadisticaTratamientoViewSet) # Resumen (solo lectura)
+router.register(r'diagnostico/consultas-lentas', ConsultaLentaViewSet) # Consultas lentas (solo staff)
 
 urlpatterns = [
     # Incluye todas las rutas generadas por el router (GET, POST, PUT, DELETE)
@@ -45,8 +50,10 @@ from django.urls import path, include
 from .views import (
     EspecialidadViewSet, PacienteViewSet, MedicoViewSet, ConsultaMedicaViewSet, 
     TratamientoViewSet, MedicamentoViewSet, RecetaMedicaViewSet, 
-    DetalleRecetaViewSet, TipoTratamientoViewSet
+    DetalleRecetaViewSet, TipoTratamientoViewSet, HorarioAtencionViewSet,
+    EstadisticaConsultaViewSet, EstadisticaTratamientoViewSet, ConsultaLentaViewSet
 )
+from .autocompletar import FUENTES, AutocompletarView
 from .template_views import (
     EspecialidadListView, EspecialidadCreateView, EspecialidadUpdateView, EspecialidadDeleteView,
     PacienteListView, PacienteCreateView, PacienteUpdateView, PacienteDeleteView,
@@ -72,6 +79,10 @@ router.register(r'consultas-medicas', ConsultaMedicaViewSet)
 router.register(r'tratamientos', TratamientoViewSet)
 router.register(r'recetas-medicas', RecetaMedicaViewSet)
 router.register(r'detalles-receta', DetalleRecetaViewSet)
+router.register(r'horarios-atencion', HorarioAtencionViewSet)
+router.register(r'estadisticas/consultas', EstadisticaConsultaViewSet)
+router.register(r'estadisticas/tratamientos', EstadisticaTratamientoViewSet)
+router.register(r'diagnostico/consultas-lentas', ConsultaLentaViewSet)
 
 
 urlpatterns = [
@@ -136,4 +147,10 @@ urlpatterns = [
     path('gestion/tipos-tratamiento/crear/', TipoTratamientoCreateView.as_view(), name='tipotratamiento_create'),
     path('gestion/tipos-tratamiento/editar/<int:pk>/', TipoTratamientoUpdateView.as_view(), name='tipotratamiento_update'),
     path('gestion/tipos-tratamiento/eliminar/<int:pk>/', TipoTratamientoDeleteView.as_view(), name='tipotratamiento_delete'),
+
+    # Autocompletado de los formularios de gestión (una ruta por fuente)
+    *[
+        path(f'gestion/autocompletar/{fuente}/', AutocompletarView.as_view(fuente=fuente), name=f'autocompletar_{fuente}')
+        for fuente in FUENTES
+    ],
 ]
\ No newline at end of file
@@ -6,23 +6,87 @@ from django.shortcuts import render
 '''Bloque de Comentarios:
 Módulo de Vistas (ViewSets) para la API Salud Vital Ltda.
 Implementa el CRUD para cada modelo utilizando ModelViewSet.
+Cada ViewSet aplica el planificador de consultas (select_related/prefetch_related)
+según los campos de su serializer, evitando el problema N+1 en los listados,
+y responde GET condicionales (ETag / Last-Modified, 304 Not Modified).
 Incluye la implementación de filtros avanzados (django-filter)
 para campos clave, como médicos por especialidad y consultas por estado.
 '''
 
-from rest_framework import viewsets
+from datetime import timedelta
+
+import django_filters
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
 from .models import (
     Especialidad, Paciente, Medico, ConsultaMedica, Tratamiento,
-    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento
+    Medicamento, RecetaMedica, DetalleReceta, TipoTratamiento, HorarioAtencion,
+    ResumenConsultaDiaria, ResumenTratamientoTipo, ConsultaLenta
 )
 from .serializers import (
     EspecialidadSerializer, PacienteSerializer, MedicoSerializer, 
     ConsultaMedicaSerializer, TratamientoSerializer, MedicamentoSerializer, 
-    RecetaMedicaSerializer, DetalleRecetaSerializer, TipoTratamientoSerializer
+    RecetaMedicaSerializer, DetalleRecetaSerializer, TipoTratamientoSerializer,
+    ConsultaTimelineSerializer, HorarioAtencionSerializer,
+    ResumenConsultaDiariaSerializer, ResumenTratamientoTipoSerializer, ConsultaLentaSerializer,
+    AjusteStockSerializer
 )
+from .query_planner import QueryPlannerMixin
+from .asincrono import LecturaAsincronaMixin
+from .lectura_rapida import LecturaRapidaMixin
+from .pagination import ConsultaMedicaPagination, TratamientoPagination, RecetaMedicaPagination
+from .export import ExportMixin
+from .bulk import BulkUpsertMixin
+from .search import buscar_consultas, leer_limite, TrigramSearchMixin
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .stock import StockInsuficiente, reservar_stock, liberar_stock
+from .resumenes import mover_especialidad
+from .agenda import bloques_libres
+
+# Rango máximo (en días) de una consulta de disponibilidad.
+MAX_DIAS_DISPONIBILIDAD = 62
+# Ventana por defecto y máxima (en días) de las estadísticas diarias.
+DIAS_ESTADISTICAS = 30
+MAX_DIAS_ESTADISTICAS = 366
+
+
+def _leer_fecha(request, nombre):
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ParseError(f"'{nombre}' inválida: use el formato AAAA-MM-DD.")
+    return fecha
+
+
+def leer_rango_fechas(request, dias, max_dias, hacia_atras=False):
+    '''Lee ?desde= y ?hasta= (AAAA-MM-DD, ambas inclusive). Sin ellas, usa 'dias' días desde hoy
+    (o que terminan hoy, con hacia_atras). Responde 400 si son inválidas o el rango supera 'max_dias'.'''
+    desde, hasta = _leer_fecha(request, 'desde'), _leer_fecha(request, 'hasta')
+    ventana = timedelta(days=dias - 1)
+    if hacia_atras:
+        hasta = hasta or (desde + ventana if desde else timezone.localdate())
+        desde = desde or hasta - ventana
+    else:
+        desde = desde or (hasta - ventana if hasta else timezone.localdate())
+        hasta = hasta or desde + ventana
+    if not 0 <= (hasta - desde).days < max_dias:
+        raise ParseError(f'El rango debe tener entre 1 y {max_dias} días.')
+    return desde, hasta
 
 
 # --- Filtros Personalizados ---
@@ -39,76 +103,278 @@ class ConsultaFilter(DjangoFilterBackend):
     search_fields = ['motivo_consulta', 'paciente__rut', 'medico__apellido']
 
 
+class ConsultaMedicaFilterSet(django_filters.FilterSet):
+    '''Filtros de consultas: ?medico=, ?paciente=, ?estado= y rango ?fecha_desde= / ?fecha_hasta=.'''
+    fecha_desde = django_filters.DateTimeFilter(field_name='fecha_hora', lookup_expr='gte')
+    fecha_hasta = django_filters.DateTimeFilter(field_name='fecha_hora', lookup_expr='lte')
+
+    class Meta:
+        model = ConsultaMedica
+        fields = ['medico', 'paciente', 'estado']
+
+
 # --- Vistas (ViewSets) ---
 
-class EspecialidadViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Especialidades.'''
+class EspecialidadViewSet(CachedResponseMixin, ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
+    '''CRUD y listado de Especialidades. Lecturas en cache (datos de referencia).'''
     queryset = Especialidad.objects.all()
     serializer_class = EspecialidadSerializer
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['nombre', 'descripcion']
 
 
-class TipoTratamientoViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Tipos de Tratamiento (Nueva entidad de mejora).'''
+class TipoTratamientoViewSet(CachedResponseMixin, ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
+    '''CRUD y listado de Tipos de Tratamiento (Nueva entidad de mejora). Lecturas en cache.'''
     queryset = TipoTratamiento.objects.all()
     serializer_class = TipoTratamientoSerializer
 
 
-class PacienteViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Pacientes. Permite filtrar por RUT y buscar por nombre/apellido.'''
+class PacienteViewSet(TrigramSearchMixin, BulkUpsertMixin, ConditionalGetMixin, LecturaRapidaMixin, ExportMixin,
+                      LecturaAsincronaMixin, QueryPlannerMixin, viewsets.ModelViewSet):
+    '''CRUD y listado de Pacientes. Permite filtrar por RUT y buscar por nombre/apellido.
+    Búsqueda difusa para autocompletar: GET pacientes/buscar/?q=&limite=.
+    Exportación masiva en streaming: GET pacientes/export/?format=ndjson|csv.
+    Carga masiva: POST pacientes/bulk/?modo=create|update|upsert (clave natural: rut).
+    Historial completo en una llamada: GET pacientes/<id>/timeline/.
+    Con LECTURA_RAPIDA, list y export leen con values_list() sin instanciar modelos (ver api_vital/lectura_rapida.py).
+    list y retrieve son asíncronos bajo ASGI (ver api_vital/asincrono.py).'''
     queryset = Paciente.objects.all()
     serializer_class = PacienteSerializer
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['rut', 'nombre', 'apellido']
+    trigram_fields = ('nombre', 'apellido')
+    trigram_contains_fields = ('rut',)
+    bulk_lookup_field = 'rut'
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        '''Consultas del paciente (más recientes primero) con tratamientos, receta y detalles anidados.
+        Acepta los filtros de consultas (?fecha_desde=, ?fecha_hasta=, ?estado=, ?medico=) y ?limite= (máx. 100).
+        Siempre 4 consultas SQL: paciente, consultas (+ médico y receta), tratamientos y detalles.'''
+        paciente = self.get_object()
+        filtros = ConsultaMedicaFilterSet(
+            request.query_params,
+            queryset=ConsultaMedica.objects.filter(paciente=paciente).order_by('-fecha_hora', '-id'),
+        )
+        if not filtros.is_valid():
+            return Response(filtros.errors, status=status.HTTP_400_BAD_REQUEST)
+        consultas = filtros.qs.select_related('medico__especialidad', 'recetamedica').prefetch_related(
+            Prefetch('tratamiento_set', queryset=Tratamiento.objects.select_related('tipo').order_by('fecha_inicio', 'id')),
+            Prefetch('recetamedica__detallereceta_set', queryset=DetalleReceta.objects.select_related('medicamento').order_by('id')),
+        )
+        limite = leer_limite(request)
+        # Se pide una fila extra para saber si hay consultas más antiguas que las devueltas.
+        consultas = list(consultas[:limite + 1])
+        return Response({
+            'paciente': self.get_serializer(paciente).data,
+            'consultas': ConsultaTimelineSerializer(consultas[:limite], many=True).data,
+            'hay_mas': len(consultas) > limite,
+        })
 
 
-class MedicoViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Médicos. Permite filtrar por especialidad.'''
+class MedicoViewSet(TrigramSearchMixin, BulkUpsertMixin, ConditionalGetMixin, LecturaAsincronaMixin, QueryPlannerMixin,
+                    viewsets.ModelViewSet):
+    '''CRUD y listado de Médicos. Permite filtrar por especialidad.
+    Búsqueda difusa para autocompletar: GET medicos/buscar/?q=&limite=.
+    Carga masiva: POST medicos/bulk/?modo=create|update|upsert (clave natural: rut; email también es único).
+    Agenda libre: GET medicos/disponibilidad/?medico=<id>|especialidad=<id>&desde=&hasta=.
+    list y retrieve son asíncronos bajo ASGI (ver api_vital/asincrono.py).'''
     queryset = Medico.objects.all()
     serializer_class = MedicoSerializer
     filter_backends = [MedicoFilter, SearchFilter, OrderingFilter]
     # Filtro aplicado: Se puede filtrar usando ?especialidad=<id>
     # Búsqueda: Se puede buscar por ?search=<termino> en rut, nombre o apellido.
     search_fields = ['rut', 'nombre', 'apellido']
+    trigram_fields = ('nombre', 'apellido')
+    trigram_contains_fields = ('rut',)
+    bulk_lookup_field = 'rut'
+
+    def antes_de_bulk(self, actualizados):
+        # Especialidad anterior de cada médico actualizado; la fila queda bloqueada hasta el fin de la carga.
+        filas = Medico.objects.select_for_update().filter(rut__in=[medico.rut for medico in actualizados])
+        return {rut: (pk, especialidad) for rut, pk, especialidad in filas.values_list('rut', 'pk', 'especialidad_id')}
+
+    def despues_de_bulk(self, actualizados, anteriores):
+        # Lo mismo que resumir_especialidad (post_save de Medico, api_vital/signals.py) para la carga masiva.
+        for medico in actualizados:
+            pk, especialidad = anteriores[medico.rut]
+            if especialidad != medico.especialidad_id:
+                mover_especialidad(pk, especialidad, medico.especialidad_id)
 
+    @action(detail=False, methods=['get'])
+    def disponibilidad(self, request):
+        '''Bloques libres de un médico (?medico=) o de toda una especialidad (?especialidad=)
+        entre ?desde= y ?hasta= (fechas AAAA-MM-DD, ambas inclusive; por defecto, los próximos 7 días).'''
+        parametros = request.query_params
+        if parametros.get('medico', '').isdigit():
+            medicos = Medico.objects.filter(pk=parametros['medico'])
+        elif parametros.get('especialidad', '').isdigit():
+            medicos = Medico.objects.filter(especialidad=parametros['especialidad'])
+        else:
+            return Response({'detail': "Debe indicar 'medico' o 'especialidad' (id numérico)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        desde, hasta = leer_rango_fechas(request, dias=7, max_dias=MAX_DIAS_DISPONIBILIDAD)
+        agenda = bloques_libres(medicos, desde, hasta)
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'medicos': [
+                {
+                    'medico': medico.pk,
+                    'medico_nombre': str(medico),
+                    'duracion_consulta': medico.duracion_consulta,
+                    'bloques': [{'inicio': inicio, 'fin': fin} for inicio, fin in libres],
+                }
+                for medico, libres in agenda
+            ],
+        })
 
-class MedicamentoViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Medicamentos.'''
+
+class MedicamentoViewSet(CachedResponseMixin, BulkUpsertMixin, ConditionalGetMixin, LecturaAsincronaMixin, QueryPlannerMixin,
+                         viewsets.ModelViewSet):
+    '''CRUD y listado de Medicamentos. Lecturas en cache (datos de referencia).
+    Carga masiva: POST medicamentos/bulk/?modo=create|update|upsert (clave natural: nombre_comercial).
+    Ajuste atómico de stock: POST medicamentos/<id>/ajustar-stock/ con {"delta": n}. El stock inicial se
+    fija al crear (POST o carga masiva); después ajustar-stock es la única forma de cambiarlo por la API.
+    list y retrieve son asíncronos bajo ASGI (ver api_vital/asincrono.py).'''
     queryset = Medicamento.objects.all()
     serializer_class = MedicamentoSerializer
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['nombre_comercial', 'principio_activo']
+    bulk_lookup_field = 'nombre_comercial'
+    bulk_campos_solo_creacion = ('stock',)
+
+    @action(detail=True, methods=['post'], url_path='ajustar-stock')
+    def ajustar_stock(self, request, pk=None):
+        '''Suma (delta > 0) o descuenta (delta < 0) stock sin leer-modificar-escribir: no pisa reservas concurrentes.'''
+        ajuste = AjusteStockSerializer(data=request.data)
+        ajuste.is_valid(raise_exception=True)
+        delta = ajuste.validated_data['delta']
+        medicamento = self.get_object()
+        try:
+            if delta >= 0:
+                liberar_stock(medicamento.pk, delta)
+            else:
+                reservar_stock(medicamento.pk, -delta)
+        except StockInsuficiente as error:
+            return Response({'delta': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        medicamento.refresh_from_db(fields=['stock', 'updated_at'])
+        return Response(self.get_serializer(medicamento).data)
 
 
-class ConsultaMedicaViewSet(viewsets.ModelViewSet):
-    '''CRUD y listado de Consultas Médicas. Permite filtrar por médico, paciente y estado (CHOICES).'''
+class ConsultaMedicaViewSet(ConditionalGetMixin, LecturaRapidaMixin, ExportMixin, LecturaAsincronaMixin, QueryPlannerMixin,
+                            viewsets.ModelViewSet):
+    '''CRUD y listado de Consultas Médicas. Permite filtrar por médico, paciente y estado (CHOICES).
+    Exportación masiva en streaming: GET consultas-medicas/export/?format=ndjson|csv.
+    Con LECTURA_RAPIDA, list y export leen con values_list() sin instanciar modelos (ver api_vital/lectura_rapida.py).
+    list y retrieve son asíncronos bajo ASGI (ver api_vital/asincrono.py).'''
     queryset = ConsultaMedica.objects.all()
     serializer_class = ConsultaMedicaSerializer
     filter_backends = [ConsultaFilter, SearchFilter, OrderingFilter]
+    filterset_class = ConsultaMedicaFilterSet
     # Filtros aplicados: Se puede filtrar usando ?medico=<id>, ?paciente=<id> o ?estado=<PENDIENTE|REALIZADA>
     search_fields = ['diagnostico', 'motivo_consulta']
+    # Paginación por cursor: el orden debe ser estable (fecha_hora + id) y sobre columnas indexadas.
+    pagination_class = ConsultaMedicaPagination
+    ordering = ConsultaMedicaPagination.ordering
+    ordering_fields = ['fecha_hora', 'id']
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        '''Búsqueda de texto completo (?q=) en diagnóstico y motivo, ordenada por relevancia. ?limite= (máx. 100).'''
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({'detail': "Debe indicar el parámetro 'q'."}, status=status.HTTP_400_BAD_REQUEST)
+        consultas = list(buscar_consultas(self.filter_queryset(self.get_queryset()), texto)[:leer_limite(request)])
+        datos = self.get_serializer(consultas, many=True).data
+        for consulta, fila in zip(consultas, datos):
+            fila['relevancia'] = consulta.relevancia
+        return Response({'results': datos})
 
 
-class TratamientoViewSet(viewsets.ModelViewSet):
+class TratamientoViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
     '''CRUD y listado de Tratamientos.'''
     queryset = Tratamiento.objects.all()
     serializer_class = TratamientoSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consulta', 'tipo'] # Filtrar tratamientos por consulta o tipo
+    pagination_class = TratamientoPagination
 
 
-class RecetaMedicaViewSet(viewsets.ModelViewSet):
+class RecetaMedicaViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
     '''CRUD y listado de Recetas Médicas.'''
     queryset = RecetaMedica.objects.all()
     serializer_class = RecetaMedicaSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consulta'] # Filtrar recetas por consulta
+    pagination_class = RecetaMedicaPagination
 
 
-class DetalleRecetaViewSet(viewsets.ModelViewSet):
+class DetalleRecetaViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
     '''CRUD y listado de Detalles de Receta.'''
     queryset = DetalleReceta.objects.all()
     serializer_class = DetalleRecetaSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['receta', 'medicamento']
\ No newline at end of file
+    filterset_fields = ['receta', 'medicamento']
+
+class HorarioAtencionViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ModelViewSet):
+    '''CRUD y listado de Horarios de Atención (plantilla semanal de cada médico).'''
+    queryset = HorarioAtencion.objects.all()
+    serializer_class = HorarioAtencionSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['medico', 'dia_semana'] # Filtrar horarios por médico o día
+
+
+# --- Estadísticas (resúmenes incrementales, solo lectura) ---
+
+class EstadisticaConsultaViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ReadOnlyModelViewSet):
+    '''Consultas por día, especialidad y estado, leídas del resumen incremental (no de ConsultaMedica).
+    Ventana ?desde= / ?hasta= (por defecto, los últimos 30 días; máx. 366). Filtros: ?especialidad=, ?estado=.
+    Totales de la ventana por especialidad y estado: GET estadisticas/consultas/totales/.'''
+    queryset = ResumenConsultaDiaria.objects.filter(cantidad__gt=0)
+    serializer_class = ResumenConsultaDiariaSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['especialidad', 'estado']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'totales'):
+            # El costo depende del tamaño de la ventana, no del historial.
+            queryset = queryset.filter(fecha__range=self.ventana())
+        return queryset
+
+    def ventana(self):
+        return leer_rango_fechas(self.request, dias=DIAS_ESTADISTICAS, max_dias=MAX_DIAS_ESTADISTICAS, hacia_atras=True)
+
+    @action(detail=False, methods=['get'])
+    def totales(self, request):
+        '''Suma de la ventana agrupada por especialidad y estado.'''
+        desde, hasta = self.ventana()
+        filas = (
+            self.filter_queryset(self.get_queryset()).order_by('especialidad_id', 'estado')
+            .values('especialidad', 'especialidad__nombre', 'estado').annotate(total=Sum('cantidad'))
+        )
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'totales': [
+                {'especialidad': fila['especialidad'], 'especialidad_nombre': fila['especialidad__nombre'],
+                 'estado': fila['estado'], 'cantidad': fila['total']}
+                for fila in filas
+            ],
+        })
+
+
+class EstadisticaTratamientoViewSet(ConditionalGetMixin, QueryPlannerMixin, viewsets.ReadOnlyModelViewSet):
+    '''Tratamientos por tipo, leídos del resumen incremental (solo lectura).'''
+    queryset = ResumenTratamientoTipo.objects.all()
+    serializer_class = ResumenTratamientoTipoSerializer
+
+
+class ConsultaLentaViewSet(viewsets.ReadOnlyModelViewSet):
+    '''Buffer de consultas lentas con su plan de ejecución (solo staff). Filtros: ?vista=, ?accion=, ?metodo=.'''
+    queryset = ConsultaLenta.objects.all()
+    serializer_class = ConsultaLentaSerializer
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['vista', 'accion', 'metodo']